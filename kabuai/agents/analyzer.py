@@ -1,3 +1,4 @@
+import asyncio
 import json
 import logging
 import os
@@ -5,6 +6,7 @@ from pprint import pprint
 from typing import Literal, cast
 
 from langchain_core.messages import AIMessage, HumanMessage
+from langchain_core.prompt_values import PromptValue
 from langgraph.graph import END, StateGraph
 from langgraph.prebuilt import ToolNode
 from langgraph.types import Command
@@ -14,7 +16,10 @@ from ai_models.llm import llm, llm_heavy, llm_light  # noqa: F401
 from constants.agents import ANALYZER_AGENT_NAME, SUPERVISOR_NAME
 from graph.analyzer_state import AnalyzerAgentState
 from prompts.analyzer import analysis_prompt_template
-from tools.search import search_web
+from prompts.layout import prompt_layout
+from tools.search import search_recent_news
+from utils.digest import build_price_digest
+from utils.indicators import format_indicators, get_indicators
 from utils.search import calculate_overall_sentiment_score
 
 DEBUG = os.getenv("DEBUG", "0") == "1"
@@ -24,7 +29,35 @@ logger = logging.getLogger(__name__)
 logger.info(f"ANALYSIS_LENGTH set to {ANALYSIS_LENGTH}")
 
 
-def perform_analysis_node(state: AnalyzerAgentState) -> dict | Command:
+def build_analysis_prompt(state: AnalyzerAgentState) -> PromptValue:
+    """
+    Renders the analysis prompt, for a state perform_analysis_node has checked has all the data.
+    """
+
+    sentiment_score = calculate_overall_sentiment_score(state["search_results"])
+    stock_data = state["stock_data"]
+    indicators = get_indicators(stock_data.metadata.symbol, stock_data.prices)
+    return prompt_layout.render(
+        "analysis",
+        analysis_prompt_template,
+        {
+            "messages": state["messages"],
+            "ticker": state["ticker"],
+            "stock_data": stock_data.model_dump_json(exclude={"news", "prices"}),
+            "price_history": build_price_digest(
+                stock_data.metadata.symbol, stock_data.prices, timezone=stock_data.metadata.exchange_timezone
+            ).text,
+            "indicators": format_indicators(indicators),
+            "stock_summary": state["stock_summary"],
+            "search_results": json.dumps([res.model_dump_json(exclude={"link"}) for res in state["search_results"]]),
+            "sentiment_score": sentiment_score,
+            "search_summary": state["search_summary"],
+            "analysis_length": ANALYSIS_LENGTH,
+        },
+    )
+
+
+async def perform_analysis_node(state: AnalyzerAgentState) -> dict | Command:
     """
     Performs stock analysis based on the provided data and using web search tools
     """
@@ -50,23 +83,10 @@ def perform_analysis_node(state: AnalyzerAgentState) -> dict | Command:
                 graph=Command.PARENT,
             )
 
-        sentiment_score = calculate_overall_sentiment_score(state["search_results"])
-        messages = analysis_prompt_template.invoke(
-            {
-                "messages": state["messages"],
-                "ticker": state["ticker"],
-                "stock_data": state["stock_data"].model_dump_json(exclude={"news"}),
-                "stock_summary": state["stock_summary"],
-                "search_results": json.dumps(
-                    [res.model_dump_json(exclude={"link"}) for res in state["search_results"]]
-                ),
-                "sentiment_score": sentiment_score,
-                "search_summary": state["search_summary"],
-                "analysis_length": ANALYSIS_LENGTH,
-            }
-        )
+        # the digest and indicators are numpy work on the whole history, kept off the event loop
+        messages = await asyncio.to_thread(build_analysis_prompt, state)
 
-        analysis_response = chat_model.bind_tools([search_web]).invoke(messages)
+        analysis_response = await chat_model.bind_tools([search_recent_news]).ainvoke(messages)
         logger.debug(f"Analysis Response: {analysis_response}")
         logger.debug("Leaving perform_analysis_node")
 
@@ -119,7 +139,7 @@ analyzer_agent = (
         perform_analysis_node,
         destinations=("tools", "process_analysis_node"),
     )
-    .add_node("tools", ToolNode([search_web]), destinations=("perform_analysis_node",))
+    .add_node("tools", ToolNode([search_recent_news]), destinations=("perform_analysis_node",))
     .add_node("process_analysis_node", process_analysis_node, destinations=(END,))
     .add_conditional_edges("perform_analysis_node", routing_condition)
     .add_edge("tools", "perform_analysis_node")
@@ -156,6 +176,6 @@ if __name__ == "__main__":
         query = input(f"{ANALYZER_AGENT_NAME}> ").strip()
         state["messages"].append(HumanMessage(query))
 
-        result = cast(AnalyzerAgentState, analyzer_agent.invoke(state))
+        result = cast(AnalyzerAgentState, asyncio.run(analyzer_agent.ainvoke(state)))
 
         state.update(result)
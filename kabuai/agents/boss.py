@@ -1,11 +1,10 @@
+import asyncio
 import logging
 import os
-from datetime import datetime
 from pprint import pprint
 from typing import cast
 
 from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
-from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 from langchain_core.runnables import RunnableConfig
 from langgraph.checkpoint.memory import InMemorySaver
 from langgraph.config import get_stream_writer
@@ -17,11 +16,11 @@ from agents.analyzer import analyzer_agent
 from agents.search import search_agent
 from agents.stock import stock_agent
 from ai_models.chat import chat_model, chat_model_heavy, chat_model_light  # noqa: F401
+from ai_models.limits import PRIORITY_HIGH, priority
 from ai_models.llm import llm, llm_heavy, llm_light  # noqa: F401
 from constants.agents import (
     ANALYZER_AGENT_NAME,
     MEMBERS,
-    MEMBERS_DESCRIPTIONS,
     SEARCH_AGENT_NAME,
     STOCK_AGENT_NAME,
     SUPERVISOR_NAME,
@@ -30,7 +29,9 @@ from graph.analyzer_state import AnalyzerAgentState
 from graph.boss_state import PlanStep, StockBossState
 from graph.search_state import SearchAgentState
 from graph.stock_state import StockAgentState
-from prompts.boss import DONE_PROMPT, supervisor_prompt_template
+from prompts.boss import done_prompt_template, supervisor_prompt_template
+from prompts.layout import prompt_layout, today
+from utils.plans import plan_cache
 
 DEBUG = os.getenv("DEBUG", "0") == "1"
 checkpointer = InMemorySaver()
@@ -43,7 +44,7 @@ class Router(BaseModel):
     plan: list[PlanStep]
 
 
-def boss_node(state: StockBossState) -> Command | dict:
+async def boss_node(state: StockBossState) -> Command | dict:
     logger.debug("Entering boss_node in supervisor")
     writer = get_stream_writer()
 
@@ -58,13 +59,9 @@ def boss_node(state: StockBossState) -> Command | dict:
                     "No more steps, should have routed to end already. Routing to end. Leaving boss_node in supervisor."
                 )
                 writer({"handoff": {"next": END}})
-                prompt = ChatPromptTemplate.from_messages(
-                    [
-                        ("system", DONE_PROMPT),
-                        MessagesPlaceholder(variable_name="messages"),
-                    ]
-                )
-                supervisor_response = chat_model_light.invoke(prompt.invoke({"messages": state["messages"]}))
+                prompt = prompt_layout.render("supervisor_done", done_prompt_template, {"messages": state["messages"]})
+                with priority(PRIORITY_HIGH):
+                    supervisor_response = await chat_model_light.ainvoke(prompt)
 
                 return {
                     "messages": [
@@ -86,13 +83,9 @@ def boss_node(state: StockBossState) -> Command | dict:
                 )
                 writer({"handoff": {"next": END, "message": next_step.message}})
 
-                prompt = ChatPromptTemplate.from_messages(
-                    [
-                        ("system", DONE_PROMPT),
-                        MessagesPlaceholder(variable_name="messages"),
-                    ]
-                )
-                supervisor_response = chat_model_light.invoke(prompt.invoke({"messages": state["messages"]}))
+                prompt = prompt_layout.render("supervisor_done", done_prompt_template, {"messages": state["messages"]})
+                with priority(PRIORITY_HIGH):
+                    supervisor_response = await chat_model_light.ainvoke(prompt)
 
                 return {
                     "messages": [
@@ -135,18 +128,24 @@ def boss_node(state: StockBossState) -> Command | dict:
                 },
             )
 
-        # no plan. create one.
-        messages = supervisor_prompt_template.invoke(
-            {
-                "messages": state["messages"],
-                "options": ", ".join(OPTIONS),
-                "members": ", ".join(MEMBERS),
-                "members_descriptions": "\n".join([f"{k} - {v}" for k, v in MEMBERS_DESCRIPTIONS.items()]),
-                "today": datetime.today().isoformat(),
-            }
-        )
+        # no plan. create one, or reuse the one made for the same request about another stock
+        loaded_ticker = state.get("ticker") if state.get("stock_data") else None
+
+        if cached_plan := plan_cache.get(state["messages"], loaded_ticker):
+            response = Router(plan=cached_plan)
+        else:
+            messages = prompt_layout.render(
+                "supervisor",
+                supervisor_prompt_template,
+                # the date changes once a day, and comes after the conversation, not in the static prefix
+                {"messages": state["messages"], "today": today()},
+            )
 
-        response = cast(Router, chat_model_heavy.with_structured_output(Router).invoke(messages))
+            # the supervisor decides what everything else does, it does not queue behind summaries
+            with priority(PRIORITY_HIGH):
+                response = cast(Router, await chat_model_heavy.with_structured_output(Router).ainvoke(messages))
+            if response and response.plan:
+                plan_cache.put(state["messages"], response.plan, loaded_ticker)
         logger.debug(f"Got router response {response}")
 
         if not response or not response.plan:
@@ -205,7 +204,7 @@ def boss_node(state: StockBossState) -> Command | dict:
         }
 
 
-def call_stock_agent(state: StockBossState) -> dict:
+async def call_stock_agent(state: StockBossState) -> dict:
     logger.debug("Entering call_stock_agent in supervisor")
 
     try:
@@ -215,9 +214,10 @@ def call_stock_agent(state: StockBossState) -> dict:
             "stock_data": state["stock_data"],
             "stock_summary": state["stock_summary"],
             "ticker": state["ticker"],
+            "compared_stocks": [],
         }
 
-        stock_result: StockAgentState = cast(StockAgentState, stock_agent.invoke(stock_state))
+        stock_result: StockAgentState = cast(StockAgentState, await stock_agent.ainvoke(stock_state))
 
         summary = stock_result["stock_summary"]
         if stock_result.get("stock_data") is None or summary is None:
@@ -247,7 +247,7 @@ def call_stock_agent(state: StockBossState) -> dict:
         }
 
 
-def call_search_agent(state: StockBossState) -> dict:
+async def call_search_agent(state: StockBossState) -> dict:
     logger.debug("Entering call_search_agent in supervisor")
     try:
         send: Send = cast(Send, state["next"])
@@ -260,7 +260,7 @@ def call_search_agent(state: StockBossState) -> dict:
             "search_summary": state["search_summary"],
         }
 
-        search_result: SearchAgentState = cast(SearchAgentState, search_agent.invoke(search_state))
+        search_result: SearchAgentState = cast(SearchAgentState, await search_agent.ainvoke(search_state))
 
         results = search_result["search_results"]
         summary = search_result["search_summary"]
@@ -291,7 +291,7 @@ def call_search_agent(state: StockBossState) -> dict:
         }
 
 
-def call_analyzer_agent(state: StockBossState) -> dict:
+async def call_analyzer_agent(state: StockBossState) -> dict:
     logger.debug("Entering analyzer_agent in supervisor")
     try:
         send: Send = cast(Send, state["next"])
@@ -306,7 +306,9 @@ def call_analyzer_agent(state: StockBossState) -> dict:
             "analysis_score": state["analysis_score"],
         }
 
-        analysis_result: AnalyzerAgentState = cast(AnalyzerAgentState, analyzer_agent.invoke(analyzer_state))
+        analysis_result: AnalyzerAgentState = cast(
+            AnalyzerAgentState, await analyzer_agent.ainvoke(analyzer_state)
+        )
 
         analysis = analysis_result["analysis_result"]
         if not analysis:
@@ -413,5 +415,5 @@ if __name__ == "__main__":
         query = input("Boss> ").strip()
         state["messages"].append(HumanMessage(query))
 
-        result = cast(StockBossState, boss.invoke(state, config=config))
+        result = cast(StockBossState, asyncio.run(boss.ainvoke(state, config=config)))
         state.update(result)
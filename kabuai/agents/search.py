@@ -1,3 +1,5 @@
+import asyncio
+import hashlib
 import json
 import logging
 import os
@@ -9,42 +11,66 @@ from langgraph.graph import END, StateGraph
 from langgraph.types import Command
 from pydantic import BaseModel, Field
 
-from ai_models.chat import chat_model, chat_model_heavy, chat_model_light  # noqa: F401
+from ai_models.chat import CHAT_MODEL_LIGHT, chat_model, chat_model_heavy, chat_model_light  # noqa: F401
+from ai_models.limits import PRIORITY_LOW, priority
 from ai_models.llm import llm, llm_heavy, llm_light  # noqa: F401
 from constants.agents import SEARCH_AGENT_NAME, SUPERVISOR_NAME
 from graph.search_state import SearchAgentState
+from models.search import SearchResult
+from prompts.layout import prompt_layout
 from prompts.search import search_prompt, sentiment_prompt, summary_prompt_template
-from tools.search import search_web
+from tools.search import SEARCH_MAX_QUERIES, asearch_many
+from utils.news_index import news_index
+from utils.sentiment import (
+    SENTIMENT_CONFIDENCE_THRESHOLD,
+    SENTIMENT_MODE,
+    article_key,
+    score_sentiment,
+    sentiment_store,
+)
+from utils.symbols import symbol_index
 
 DEBUG = os.getenv("DEBUG", "0") == "1"
+# stored scores are only reused while the model and the prompt that made them are the same
+SENTIMENT_MODEL_ID = f"{CHAT_MODEL_LIGHT}#{hashlib.sha256(sentiment_prompt.encode()).hexdigest()[:12]}"
 
 logger = logging.getLogger(__name__)
 
 
 class SearchQueryResponseFormat(BaseModel):
-    query: str = Field(description="Query to search for. Must be 3-5 words")
+    queries: list[str] = Field(
+        description=f"1 to {SEARCH_MAX_QUERIES} queries to search for, each covering a different angle. "
+        "Must be 3-5 words each"
+    )
 
 
-def search_news_node(state: SearchAgentState) -> dict | Command:
+async def search_news_node(state: SearchAgentState) -> dict | Command:
     """
     Searches the web based on the system instruction and user's query
     """
 
     logger.debug("Entering search_news_node in search agent")
     try:
+        prompt = search_prompt.format(
+            ticker=state["ticker"],
+            stock_summary=state["stock_summary"],
+            max_queries=SEARCH_MAX_QUERIES,
+        )
+        prompt_layout.record("search_queries", prompt)
         messages = [
-            SystemMessage(search_prompt.format(ticker=state["ticker"], stock_summary=state["stock_summary"])),
+            SystemMessage(prompt),
             *state["messages"],
         ]
 
         query_response = cast(
-            SearchQueryResponseFormat, chat_model.with_structured_output(SearchQueryResponseFormat).invoke(messages)
+            SearchQueryResponseFormat,
+            await chat_model.with_structured_output(SearchQueryResponseFormat).ainvoke(messages),
         )
 
         logger.debug(f"Query Response: {query_response}")
 
         # return to supervisor
-        if not query_response or not query_response.query:
+        if not query_response or not any(query.strip() for query in query_response.queries):
             err = "I was unable to generate a search query"
             logger.error(err)
             return Command(
@@ -57,10 +83,14 @@ def search_news_node(state: SearchAgentState) -> dict | Command:
                 graph=Command.PARENT,
             )
 
-        response = search_web.invoke({"query": query_response.query, "what": "news"})
+        queries = [query.strip() for query in query_response.queries if query.strip()][:SEARCH_MAX_QUERIES]
+        response = await asearch_many(queries, what="news")
+        if state["ticker"]:
+            ticker = symbol_index.resolve(state["ticker"]) or state["ticker"]
+            await asyncio.to_thread(news_index.ingest, response, ticker=ticker)
 
         logger.debug("Leaving search_news_node")
-        return {"search_query": query_response.query, "search_results": response}
+        return {"search_query": " | ".join(queries), "search_results": response}
 
     except Exception as e:
         err = "I'm sorry, but I encountered an error while searching for news"
@@ -81,9 +111,54 @@ class SentimentResultsResponseFormat(BaseModel):
     confidence_scores: list[float] = Field(description="Confidence scores for each sentiment score, in order")
 
 
-def sentiment_news_node(state: SearchAgentState) -> dict | Command:
+async def score_with_llm(results: list[SearchResult]) -> list[tuple[float, float]] | None:
     """
-    Performs Sentiment Analysis on the search results
+    Asks the light chat model for the sentiment and confidence scores of the results, in order.
+    Returns None if the response is unusable.
+    """
+
+    prompt_layout.record("sentiment", sentiment_prompt)
+    messages = [
+        SystemMessage(sentiment_prompt),
+        HumanMessage(
+            content=json.dumps(
+                [
+                    {"title": res.title, "snippet": res.snippet, "date": res.date.isoformat(), "source": res.source}
+                    for res in results
+                ]
+            )
+        ),
+    ]
+
+    logger.debug(f"Asking for sentiment scores with messages: {messages}")
+
+    response = cast(
+        SentimentResultsResponseFormat,
+        await chat_model_light.with_structured_output(SentimentResultsResponseFormat).ainvoke(messages),
+    )
+
+    logger.debug(f"GOT response in sentiment_news NODE: {response}")
+
+    # if there is any kind of mistake in the response, empty or lengths do not match, or values out of range
+    if (
+        not response
+        or not response.sentiment_scores
+        or not response.confidence_scores
+        or len(response.sentiment_scores) != len(response.confidence_scores)
+        or not len(response.sentiment_scores) == len(results)
+        or any([x > 1 or x < -1 for x in response.sentiment_scores])
+        or any([x > 1 or x < 0 for x in response.confidence_scores])
+    ):
+        return None
+
+    return list(zip(response.sentiment_scores, response.confidence_scores))
+
+
+async def sentiment_news_node(state: SearchAgentState) -> dict | Command:
+    """
+    Performs Sentiment Analysis on the search results.
+    Articles already scored before are taken from the sentiment store. Depending on SENTIMENT_MODE the rest
+    are scored by the local lexicon, by the model, or by the lexicon with only the unsure ones going to the model.
     """
 
     logger.debug("Entering sentiment_news_node in search agent")
@@ -92,54 +167,53 @@ def sentiment_news_node(state: SearchAgentState) -> dict | Command:
             logger.debug("Leaving sentiment_news_node since no search results")
             return {}
 
-        messages = [
-            SystemMessage(sentiment_prompt),
-            HumanMessage(
-                content=json.dumps(
-                    [
-                        {"title": res.title, "snippet": res.snippet, "date": res.date.isoformat(), "source": res.source}
-                        for res in state["search_results"]
-                    ]
-                )
-            ),
-        ]
+        keys = [article_key(res) for res in state["search_results"]]
+        stored = await asyncio.to_thread(sentiment_store.get_many, keys, SENTIMENT_MODEL_ID)
+        scores: dict[str, tuple[float, float]] = {
+            key: (sentiment.sentiment_score, sentiment.confidence) for key, sentiment in stored.items()
+        }
 
-        logger.debug(f"Asking for sentiment scores with messages: {messages}")
+        unseen = {key: res for key, res in zip(keys, state["search_results"]) if key not in scores}
+        local = await asyncio.to_thread(
+            lambda: {key: score_sentiment(res.title, res.snippet) for key, res in unseen.items()}
+        )
 
-        response = cast(
-            SentimentResultsResponseFormat,
-            chat_model_light.with_structured_output(SentimentResultsResponseFormat).invoke(messages),
+        if SENTIMENT_MODE == "local":
+            to_llm = []
+        elif SENTIMENT_MODE == "hybrid":
+            to_llm = [key for key, (_, confidence) in local.items() if confidence < SENTIMENT_CONFIDENCE_THRESHOLD]
+        else:
+            to_llm = list(unseen)
+
+        logger.debug(
+            f"Found {len(stored)} stored sentiment scores, scoring {len(unseen) - len(to_llm)} search results "
+            f"locally and {len(to_llm)} with the model ({SENTIMENT_MODE} mode)"
         )
 
-        logger.debug(f"GOT response in sentiment_news NODE: {response}")
-
-        # if there is any kind of mistake in the response, empty or lengths do not match, or values out of range
-        if (
-            not response
-            or not response.sentiment_scores
-            or not response.confidence_scores
-            or len(response.sentiment_scores) != len(response.confidence_scores)
-            or not len(response.sentiment_scores) == len(state["search_results"])
-            or any([x > 1 or x < -1 for x in response.sentiment_scores])
-            or any([x > 1 or x < 0 for x in response.confidence_scores])
-        ):
-            err = "I was unable to generate sentiment scores"
-            logger.error(err)
-            return Command(
-                goto=SUPERVISOR_NAME,
-                update={
-                    "messages": [AIMessage(content=err, name=SEARCH_AGENT_NAME)],
-                },
-                graph=Command.PARENT,
-            )
+        if to_llm:
+            llm_scores = await score_with_llm([unseen[key] for key in to_llm])
+            if llm_scores is None:
+                # the local scores are a better answer than no scores at all
+                logger.warning("Unusable sentiment scores from the model, falling back to the local scores")
+            else:
+                llm_scored = dict(zip(to_llm, llm_scores))
+                local.update(llm_scored)
+                await asyncio.to_thread(
+                    sentiment_store.put_many,
+                    [
+                        unseen[key].model_copy(update={"sentiment_score": score, "confidence": confidence})
+                        for key, (score, confidence) in llm_scored.items()
+                    ],
+                    model=SENTIMENT_MODEL_ID,
+                )
+
+        scores.update(local)
 
         updated_search_results = []
 
-        for i, res in enumerate(state["search_results"]):
+        for key, res in zip(keys, state["search_results"]):
             mod_result = res.model_copy()
-            mod_result.sentiment_score = response.sentiment_scores[i]
-            mod_result.confidence = response.confidence_scores[i]
-
+            mod_result.sentiment_score, mod_result.confidence = scores[key]
             updated_search_results.append(mod_result)
 
         logger.debug("Leaving sentiment_news_node")
@@ -157,7 +231,7 @@ def sentiment_news_node(state: SearchAgentState) -> dict | Command:
         )
 
 
-def news_summary_node(state: SearchAgentState) -> dict | Command:
+async def news_summary_node(state: SearchAgentState) -> dict | Command:
     """
     Summarizes the search results to answer user's initial query.
     """
@@ -168,25 +242,37 @@ def news_summary_node(state: SearchAgentState) -> dict | Command:
             logger.debug("Leaving news_summary_node since no search results")
             return {}
 
-        messages = summary_prompt_template.invoke(
+        messages = prompt_layout.render(
+            "search_summary",
+            summary_prompt_template,
             {
                 "messages": state["messages"],
                 "data": json.dumps(
                     [
-                        {"title": res.title, "snippet": res.snippet, "date": res.date.isoformat(), "source": res.source}
+                        {
+                            "title": res.title,
+                            "snippet": res.snippet,
+                            "date": res.date.isoformat(),
+                            "source": ", ".join(res.sources) if res.sources else res.source,
+                        }
                         for res in state["search_results"]
                     ]
                 ),
-            }
+            },
         )
 
         logger.debug(f"Asking for news summary with messages: {messages}")
 
-        response = llm.invoke(messages)
+        # a chat model streams its tokens to /chat under the search agent while the summary is generated,
+        # the whole summary is only in the state update once it is done
+        with priority(PRIORITY_LOW):
+            response = await chat_model.ainvoke(messages)
 
         logger.debug(f"GOT response in news_summary NODE: {response}")
 
-        if not response:  # or not response.content:
+        # the content can be a list of parts, e.g. with thinking models, text() joins only the text ones
+        summary = response.text() if response else ""
+        if not summary.strip():
             err = "I was unable to generate the answer."
             logger.error(err)
             return Command(
@@ -199,7 +285,7 @@ def news_summary_node(state: SearchAgentState) -> dict | Command:
             )
 
         logger.debug("Leaving news_summary_node in search agent")
-        return {"search_summary": response}
+        return {"search_summary": summary}
 
     except Exception as e:
         err = "I'm sorry, but I encountered an error while summarizing news"
@@ -273,6 +359,6 @@ if __name__ == "__main__":
         query = input(f"{SEARCH_AGENT_NAME}> ").strip()
         state["messages"].append(HumanMessage(query))
 
-        result = cast(SearchAgentState, search_agent.invoke(state))
+        result = cast(SearchAgentState, asyncio.run(search_agent.ainvoke(state)))
 
         state.update(result)
@@ -1,20 +1,28 @@
+import asyncio
 import logging
 import os
 from pprint import pprint
 from typing import Literal, cast
 
 from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+from langgraph.config import get_stream_writer
 from langgraph.graph import END, StateGraph
 from langgraph.types import Command
 from pydantic import BaseModel, Field
 
 from ai_models.chat import chat_model, chat_model_heavy, chat_model_light  # noqa: F401
+from ai_models.limits import PRIORITY_LOW, priority
 from ai_models.llm import llm, llm_heavy, llm_light  # noqa: F401
 from constants.agents import STOCK_AGENT_NAME, SUPERVISOR_NAME
 from graph.stock_state import StockAgentState
-from models.stock import StockData
+from models.stock import StockBatch, StockData
+from prompts.layout import prompt_layout
 from prompts.stock import fetch_prompt, summary_prompt
-from tools.stock import fetch_stock_details
+from tools.stock import fetch_multiple_stock_details, fetch_stock_details
+from utils.digest import build_price_digest
+from utils.indicators import format_indicators, get_indicators
+from utils.symbols import symbol_index
+from utils.tickers import TICKER_CONFIDENCE_THRESHOLD, extract_ticker, extract_tickers
 
 DEBUG = os.getenv("DEBUG", "0") == "1"
 SUMMARY_LENGTH: Literal["short", "medium", "long"] = "medium"
@@ -25,29 +33,67 @@ logger.info(f"SUMMARY_LENGTH set to {SUMMARY_LENGTH}")
 
 class StockDetailsResponseFormat(BaseModel):
     ticker_or_name: str | None = Field(description="Ticker symbol of the stock or the company name.")
+    other_tickers_or_names: list[str] = Field(
+        default=[],
+        description="Ticker symbols or company names of the other stocks the user asks about, e.g. to compare. "
+        "Empty if the user asks about one stock.",
+    )
 
 
-def stock_details_node(state: StockAgentState) -> dict | Command:
+async def stock_details_node(state: StockAgentState) -> dict | Command:
     """
     Process stock details request.
     """
 
     logger.debug("Entering stock_details_node in stock agent")
     try:
-        messages = [
-            SystemMessage(fetch_prompt),
-            *state["messages"],
-        ]
+        # most requests name the stock plainly, the model is only asked when the local extractor is unsure
+        request = next((m.content for m in reversed(state["messages"]) if isinstance(m, HumanMessage)), "")
+        match = extract_ticker(request) if isinstance(request, str) else None
+        matches = extract_tickers(request) if isinstance(request, str) else []
 
-        ticker_response = cast(
-            StockDetailsResponseFormat,
-            chat_model_heavy.with_structured_output(StockDetailsResponseFormat).invoke(messages),
-        )
+        ticker_or_name: str | None
+        others: list[str] = []
+        extracted = True
+        if len(matches) > 1:
+            logger.debug(f"Extracted {[m.symbol for m in matches]} from {[m.text for m in matches]}")
+            ticker_or_name, others = matches[0].symbol, [m.symbol for m in matches[1:]]
+        elif match and match.confidence >= TICKER_CONFIDENCE_THRESHOLD:
+            logger.debug(f"Extracted {match.symbol} from {match.text!r} ({match.source}, {match.confidence:.2f})")
+            ticker_or_name = match.symbol
+        else:
+            logger.debug(f"Unsure about the ticker ({match}), asking the model")
+            extracted = False
+            prompt_layout.record("stock_fetch", fetch_prompt)
+            messages = [
+                SystemMessage(fetch_prompt),
+                *state["messages"],
+            ]
+
+            ticker_response = cast(
+                StockDetailsResponseFormat,
+                await chat_model_heavy.with_structured_output(StockDetailsResponseFormat).ainvoke(messages),
+            )
+            ticker_or_name = ticker_response.ticker_or_name if ticker_response else None
+            others = ticker_response.other_tickers_or_names if ticker_response and ticker_or_name else []
+
+        if extracted:
+            # without the model call there is no function call token to derive the tool event from
+            get_stream_writer()(
+                {
+                    "tool": {
+                        "name": "fetch_stock_details",
+                        "arguments": StockDetailsResponseFormat(
+                            ticker_or_name=ticker_or_name, other_tickers_or_names=others
+                        ).model_dump(),
+                    }
+                }
+            )
 
-        logger.debug(f"TickerResponse:, {ticker_response.ticker_or_name}")
+        logger.debug(f"TickerResponse:, {ticker_or_name} {others}")
 
-        if not ticker_response or not ticker_response.ticker_or_name:
-            err = f"Did not get a valid ticker response: {ticker_response}"
+        if not ticker_or_name:
+            err = f"Did not get a valid ticker response: {ticker_or_name}"
             logger.error(f"ERROR: {err}")
             return Command(
                 goto=SUPERVISOR_NAME,
@@ -59,15 +105,19 @@ def stock_details_node(state: StockAgentState) -> dict | Command:
                 graph=Command.PARENT,
             )
 
+        if others:
+            return await fetch_comparison([ticker_or_name, *others])
+
         if state["stock_data"] and (
-            state["ticker"] == ticker_response.ticker_or_name
-            or ticker_response.ticker_or_name in state["stock_data"].company.longName
+            state["ticker"] in (ticker_or_name, symbol_index.resolve(ticker_or_name))
+            or ticker_or_name in state["stock_data"].company.longName
         ):
             # same ticker, we already have that data, no need to fetch
             logger.debug("Leaving stock_details_node since ticker is the same")
             return {}
 
-        response: StockData | None = fetch_stock_details.invoke(ticker_response.ticker_or_name)
+        # the tool blocks on Yahoo, langchain runs it in a worker thread
+        response: StockData | None = await fetch_stock_details.ainvoke(ticker_or_name)
         if not response:
             err = "Unable to fetch stock data. Please try again"
             logger.error(f"ERROR: {err}")
@@ -75,7 +125,7 @@ def stock_details_node(state: StockAgentState) -> dict | Command:
                 goto=SUPERVISOR_NAME,
                 update={
                     "messages": [AIMessage(content=err, name=STOCK_AGENT_NAME)],
-                    "ticker": ticker_response.ticker_or_name,
+                    "ticker": ticker_or_name,
                     "stock_data": None,
                     "stock_summary": None,
                 },
@@ -86,6 +136,7 @@ def stock_details_node(state: StockAgentState) -> dict | Command:
         return {
             "ticker": response.metadata.symbol,
             "stock_data": response,
+            "compared_stocks": [],
         }
 
     except Exception as e:
@@ -103,7 +154,66 @@ def stock_details_node(state: StockAgentState) -> dict | Command:
         )
 
 
-def stock_summary_node(state: StockAgentState) -> dict | Command:
+async def fetch_comparison(tickers_or_names: list[str]) -> dict | Command:
+    """
+    Fetches every stock of a comparison in one batch. The first one that could be fetched becomes the stock data.
+    """
+
+    # the tool blocks on Yahoo, langchain runs it in a worker thread
+    batch: StockBatch = await fetch_multiple_stock_details.ainvoke({"tickers_or_names": tickers_or_names})
+    if batch.errors:
+        logger.warning(f"Could not fetch {list(batch.errors)} for the comparison")
+
+    if not batch.data:
+        err = "Unable to fetch stock data. Please try again"
+        logger.error(f"ERROR: {err}")
+        return Command(
+            goto=SUPERVISOR_NAME,
+            update={
+                "messages": [AIMessage(content=err, name=STOCK_AGENT_NAME)],
+                "ticker": tickers_or_names[0],
+                "stock_data": None,
+                "stock_summary": None,
+            },
+            graph=Command.PARENT,
+        )
+
+    stock_data, *compared = batch.data.values()
+    logger.debug(f"leaving stock_details_node with data for {list(batch.data)}")
+    return {
+        "ticker": stock_data.metadata.symbol,
+        "stock_data": stock_data,
+        "compared_stocks": compared,
+    }
+
+
+def build_summary_prompt(stock_data: StockData, compared_stocks: list[StockData] | None = None) -> str:
+    stocks = [stock_data, *(compared_stocks or [])]
+    if len(stocks) == 1:
+        return summary_prompt.format(
+            summary_length=SUMMARY_LENGTH,
+            data=stock_data.model_dump_json(exclude={"prices"}),
+            prices=build_price_digest(
+                stock_data.metadata.symbol, stock_data.prices, timezone=stock_data.metadata.exchange_timezone
+            ).text,
+            indicators=format_indicators(get_indicators(stock_data.metadata.symbol, stock_data.prices)),
+        )
+
+    return summary_prompt.format(
+        summary_length=SUMMARY_LENGTH,
+        data="\n\n".join(stock.model_dump_json(exclude={"prices"}) for stock in stocks),
+        prices="\n\n".join(
+            build_price_digest(stock.metadata.symbol, stock.prices, timezone=stock.metadata.exchange_timezone).text
+            for stock in stocks
+        ),
+        indicators="\n\n".join(
+            f"{stock.metadata.symbol}:\n{format_indicators(get_indicators(stock.metadata.symbol, stock.prices))}"
+            for stock in stocks
+        ),
+    )
+
+
+async def stock_summary_node(state: StockAgentState) -> dict | Command:
     """
     Summarize stock data.
     """
@@ -120,17 +230,16 @@ def stock_summary_node(state: StockAgentState) -> dict | Command:
             logger.debug("Leaving stock_summary_node since no stock data")
             return {"stock_summary": f"No stock data available for {state['ticker']}"}
 
+        # the digest and indicators are numpy work on the whole history, kept off the event loop
+        prompt = await asyncio.to_thread(build_summary_prompt, stock_data, state.get("compared_stocks"))
+        prompt_layout.record("stock_summary", prompt)
         messages = [
-            SystemMessage(
-                summary_prompt.format(
-                    summary_length=SUMMARY_LENGTH,
-                    data=stock_data.model_dump_json(),
-                ),
-            ),
+            SystemMessage(prompt),
             *state["messages"],
         ]
 
-        response = chat_model.invoke(messages)
+        with priority(PRIORITY_LOW):
+            response = await chat_model.ainvoke(messages)
         if not response:
             err = "Unable to summarize stock data. Please try again"
             logger.error(f"ERROR: {err}")
@@ -180,7 +289,13 @@ if DEBUG:
         fp.write(stock_agent.get_graph().draw_mermaid_png())
 
 if __name__ == "__main__":
-    state: StockAgentState = {"messages": [], "ticker": None, "stock_data": None, "stock_summary": None}
+    state: StockAgentState = {
+        "messages": [],
+        "ticker": None,
+        "stock_data": None,
+        "stock_summary": None,
+        "compared_stocks": [],
+    }
     while True:
         print("========\n\n")
         pprint(
@@ -196,6 +311,6 @@ if __name__ == "__main__":
         query = input(f"{STOCK_AGENT_NAME}> ").strip()
         state["messages"].append(HumanMessage(query))
 
-        result = cast(StockAgentState, stock_agent.invoke(state))
+        result = cast(StockAgentState, asyncio.run(stock_agent.ainvoke(state)))
 
         state.update(result)
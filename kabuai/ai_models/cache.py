@@ -0,0 +1,227 @@
+import hashlib
+import json
+import logging
+import os
+import pickle
+import threading
+import time
+from typing import Any
+
+from langchain_core.caches import RETURN_VAL_TYPE, BaseCache
+from langchain_core.outputs import ChatGeneration, Generation
+
+from utils.storage import SQLiteStore
+
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH") or "llm_cache.sqlite3"
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES") or 10_000)
+LLM_CACHE_MAX_AGE = float(os.getenv("LLM_CACHE_MAX_AGE") or 7 * 24 * 60 * 60)
+# model names (e.g. chat_model_heavy) or model ids (e.g. google_genai:gemini-2.5-pro) that never use the cache
+LLM_CACHE_EXCLUDE = {name.strip() for name in (os.getenv("LLM_CACHE_EXCLUDE") or "").split(",") if name.strip()}
+
+# eviction runs every this many stored responses, not on every write
+PRUNE_EVERY = 100
+
+# parts of a serialized message that differ between runs for the same rendered message
+VOLATILE_MESSAGE_FIELDS = ("id", "response_metadata", "usage_metadata")
+
+logger = logging.getLogger(__name__)
+
+
+def cache_key(prompt: str, llm_string: str) -> str:
+    """
+    Hash of the model id and parameters (`llm_string`, which includes bound tools and schemas) and the prompt.
+    Chat prompts are serialized messages, their per run ids and metadata are dropped
+    so the key only depends on what the model is actually sent.
+    """
+
+    try:
+        messages = json.loads(prompt)
+    except ValueError:
+        messages = None
+
+    if isinstance(messages, list):
+        for message in messages:
+            kwargs = message.get("kwargs") if isinstance(message, dict) else None
+            if isinstance(kwargs, dict):
+                for name in VOLATILE_MESSAGE_FIELDS:
+                    kwargs.pop(name, None)
+        prompt = json.dumps(messages, sort_keys=True)
+
+    return hashlib.sha256(f"{llm_string}\x00{prompt}".encode()).hexdigest()
+
+
+class ResponseStore(SQLiteStore):
+    """
+    Persistent model responses, keyed by `cache_key`.
+    Responses expire after LLM_CACHE_MAX_AGE seconds, and the least recently used ones are dropped
+    beyond LLM_CACHE_MAX_ENTRIES.
+    """
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS responses (
+        key TEXT PRIMARY KEY,
+        model TEXT NOT NULL,
+        generations BLOB NOT NULL,
+        created_at REAL NOT NULL,
+        accessed_at REAL NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS responses_accessed_at ON responses (accessed_at);
+    """
+
+    def __init__(self, path: str, max_entries: int = LLM_CACHE_MAX_ENTRIES, max_age: float = LLM_CACHE_MAX_AGE):
+        super().__init__(path)
+        self.max_entries = max_entries
+        self.max_age = max_age
+        self._writes = 0
+
+    def get(self, key: str) -> bytes | None:
+        now = time.time()
+        with self.transaction() as conn:
+            row = conn.execute(
+                "SELECT generations FROM responses WHERE key = ? AND created_at > ?", (key, now - self.max_age)
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+        return row[0]
+
+    def put(self, key: str, model: str, generations: bytes):
+        now = time.time()
+        with self.transaction() as conn:
+            conn.execute("INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?)", (key, model, generations, now, now))
+            self._writes += 1
+            if self._writes % PRUNE_EVERY == 0:
+                self._prune(conn, now)
+
+    def _prune(self, conn, now: float):
+        expired = conn.execute("DELETE FROM responses WHERE created_at <= ?", (now - self.max_age,)).rowcount
+        evicted = conn.execute(
+            """
+            DELETE FROM responses WHERE key IN (
+                SELECT key FROM responses ORDER BY accessed_at DESC LIMIT -1 OFFSET ?
+            )
+            """,
+            (self.max_entries,),
+        ).rowcount
+        if expired or evicted:
+            logger.debug(f"Pruned {expired} expired and {evicted} least recently used cached responses")
+
+    def delete(self, key: str):
+        with self.transaction() as conn:
+            conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+
+    def clear(self, model: str | None = None):
+        with self.transaction() as conn:
+            if model is None:
+                conn.execute("DELETE FROM responses")
+            else:
+                conn.execute("DELETE FROM responses WHERE model = ?", (model,))
+
+    def count(self, model: str | None = None) -> int:
+        if model is None:
+            return self.query("SELECT COUNT(*) FROM responses")[0][0]
+        return self.query("SELECT COUNT(*) FROM responses WHERE model = ?", (model,))[0][0]
+
+
+class ModelCache(BaseCache):
+    """
+    LangChain cache of a single model instance, backed by the shared response store.
+    Set as the `cache` of the model, so langchain checks it before every call and stores every response.
+    Streamed responses are stored once merged into a single message, and served back whole
+    with `cached` set in their response metadata.
+    """
+
+    def __init__(self, store: ResponseStore, name: str, model: str):
+        self.store = store
+        self.name = name
+        self.model = model
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, prompt: str, llm_string: str) -> RETURN_VAL_TYPE | None:
+        key = cache_key(prompt, llm_string)
+        value = self.store.get(key)
+
+        generations: list[Generation] | None = None
+        if value is not None:
+            try:
+                generations = pickle.loads(value)
+            except Exception as e:
+                # written by an incompatible langchain version
+                logger.warning(f"Dropping unreadable cached response of {self.name}. Error: {e}")
+                self.store.delete(key)
+
+        with self._lock:
+            if generations is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+
+        for generation in generations:
+            if isinstance(generation, ChatGeneration):
+                # a fresh id, otherwise the graph stream takes a repeated answer for one it already sent
+                generation.message.id = None
+                generation.message.response_metadata = {**generation.message.response_metadata, "cached": True}
+            else:
+                generation.generation_info = {**(generation.generation_info or {}), "cached": True}
+
+        logger.debug(f"Cached response for {self.name}")
+        return generations
+
+    def update(self, prompt: str, llm_string: str, return_val: RETURN_VAL_TYPE):
+        if not return_val or any(is_empty(generation) for generation in return_val):
+            return
+
+        self.store.put(cache_key(prompt, llm_string), self.model, pickle.dumps(list(return_val)))
+
+    def clear(self, **kwargs: Any):
+        self.store.clear(self.model)
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "model": self.model,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "stored": self.store.count(self.model),
+            }
+
+
+def is_empty(generation: Generation) -> bool:
+    """
+    Blank answers (e.g. a stream cut short or a blocked response) are not worth replaying.
+    """
+
+    if isinstance(generation, ChatGeneration):
+        message = generation.message
+        return not message.content and not getattr(message, "tool_calls", None) and not message.additional_kwargs
+    return not generation.text
+
+
+response_store = ResponseStore(LLM_CACHE_PATH)
+model_caches: dict[str, ModelCache] = {}
+
+
+def model_cache(name: str, model: str) -> ModelCache | bool:
+    """
+    The cache for the model instance `name` running `model`, or False if either is in LLM_CACHE_EXCLUDE,
+    which keeps langchain from using any global cache for it.
+    """
+
+    if name in LLM_CACHE_EXCLUDE or model in LLM_CACHE_EXCLUDE:
+        logger.info(f"Response cache disabled for {name} ({model})")
+        return False
+
+    cache = model_caches[name] = ModelCache(response_store, name, model)
+    return cache
+
+
+def llm_cache_stats() -> dict[str, dict[str, Any]]:
+    """
+    Returns the hit/miss counters of the response cache of every model instance.
+    """
+
+    return {name: cache.stats() for name, cache in model_caches.items()}
@@ -1,7 +1,11 @@
 import os
+from typing import Any
 
-from langchain.chat_models import init_chat_model
-from langchain_core.rate_limiters import InMemoryRateLimiter
+from langchain_core.language_models import BaseChatModel
+
+from ai_models.cache import model_cache
+from ai_models.limits import limiters
+from ai_models.registry import lazy_model
 
 CHAT_MODEL = os.getenv("CHAT_MODEL") or ""
 CHAT_MODEL_LIGHT = os.getenv("CHAT_MODEL_LIGHT") or ""
@@ -10,23 +14,30 @@ CHAT_MODEL_HEAVY = os.getenv("CHAT_MODEL_HEAVY") or ""
 TEMPERATURE = float(os.getenv("TEMPERATURE") or 0)
 
 
-rate_limiter = InMemoryRateLimiter(
-    requests_per_second=1,
-    check_every_n_seconds=0.1,
-    max_bucket_size=10,
-)
+def build_chat_model(name: str, model: str, tier: str, **kwargs: Any) -> BaseChatModel:
+    # imports the provider package, which is slow, so only done when the model is first used
+    from langchain.chat_models import init_chat_model
+
+    return init_chat_model(
+        model=model,
+        temperature=TEMPERATURE,
+        cache=model_cache(name, model),
+        rate_limiter=limiters[tier],
+        metadata={"model_tier": tier},
+        callbacks=[limiters[tier].callback],
+        **kwargs,
+    )
+
 
-chat_model_light = init_chat_model(
-    model=CHAT_MODEL_LIGHT,
-    temperature=TEMPERATURE,
+chat_model_light: BaseChatModel = lazy_model(
+    "chat_model_light",
+    lambda: build_chat_model("chat_model_light", CHAT_MODEL_LIGHT, "light"),
 )
-chat_model = init_chat_model(
-    model=CHAT_MODEL,
-    temperature=TEMPERATURE,
-    max_tokens=4096,
+chat_model: BaseChatModel = lazy_model(
+    "chat_model",
+    lambda: build_chat_model("chat_model", CHAT_MODEL, "default", max_tokens=4096),
 )
-chat_model_heavy = init_chat_model(
-    model=CHAT_MODEL_HEAVY,
-    temperature=TEMPERATURE,
-    max_tokens=8192,
+chat_model_heavy: BaseChatModel = lazy_model(
+    "chat_model_heavy",
+    lambda: build_chat_model("chat_model_heavy", CHAT_MODEL_HEAVY, "heavy", max_tokens=8192),
 )
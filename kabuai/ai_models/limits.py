@@ -0,0 +1,360 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import os
+import threading
+import time
+from collections import deque
+from collections.abc import Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.messages import BaseMessage
+from langchain_core.outputs import ChatGeneration, LLMResult
+from langchain_core.rate_limiters import BaseRateLimiter
+
+# per model tier, the chat model and the llm of a tier share one limiter
+RATE_LIMIT_LIGHT_RPS = float(os.getenv("RATE_LIMIT_LIGHT_RPS") or 2)
+RATE_LIMIT_LIGHT_MAX_IN_FLIGHT = int(os.getenv("RATE_LIMIT_LIGHT_MAX_IN_FLIGHT") or 8)
+RATE_LIMIT_LIGHT_TPM = int(os.getenv("RATE_LIMIT_LIGHT_TPM") or 1_000_000)
+RATE_LIMIT_RPS = float(os.getenv("RATE_LIMIT_RPS") or 1)
+RATE_LIMIT_MAX_IN_FLIGHT = int(os.getenv("RATE_LIMIT_MAX_IN_FLIGHT") or 4)
+RATE_LIMIT_TPM = int(os.getenv("RATE_LIMIT_TPM") or 1_000_000)
+RATE_LIMIT_HEAVY_RPS = float(os.getenv("RATE_LIMIT_HEAVY_RPS") or 0.5)
+RATE_LIMIT_HEAVY_MAX_IN_FLIGHT = int(os.getenv("RATE_LIMIT_HEAVY_MAX_IN_FLIGHT") or 2)
+RATE_LIMIT_HEAVY_TPM = int(os.getenv("RATE_LIMIT_HEAVY_TPM") or 1_000_000)
+
+PRIORITY_HIGH = 0
+PRIORITY_NORMAL = 1
+PRIORITY_LOW = 2
+
+TPM_WINDOW = 60
+# starting guess of the tokens a call uses, until some calls reported their usage
+INITIAL_TOKEN_ESTIMATE = 2_000
+CHARS_PER_TOKEN = 4
+
+logger = logging.getLogger(__name__)
+
+request_priority: ContextVar[int] = ContextVar("request_priority", default=PRIORITY_NORMAL)
+
+
+@contextmanager
+def priority(level: int) -> Iterator[None]:
+    """
+    Model calls made within queue at the given priority, lower levels go first.
+    """
+
+    token = request_priority.set(level)
+    try:
+        yield
+    finally:
+        request_priority.reset(token)
+
+
+class ModelLimiter(BaseRateLimiter):
+    """
+    Admission control for the models of one tier: at most `requests_per_second` new calls (with bursts
+    up to `max_in_flight`), at most `max_in_flight` calls running, and calls only start while the tokens
+    used in the last minute plus the estimate for the running calls fit `tokens_per_minute`.
+
+    Waiting callers queue by priority (see `priority`), first come first served within a priority.
+    A slot taken by an async call is given back when the task running the call ends, however it ends,
+    langchain runs every `ainvoke` in a task of its own. Token usage, and the slots of sync calls, are
+    given back by `callback`, which must be set on the models too.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        requests_per_second: float,
+        max_in_flight: int,
+        tokens_per_minute: int,
+        check_every_n_seconds: float = 0.05,
+    ):
+        self.name = name
+        self.requests_per_second = requests_per_second
+        self.max_in_flight = max_in_flight
+        self.tokens_per_minute = tokens_per_minute
+        self.check_every_n_seconds = check_every_n_seconds
+        self.callback = LimiterCallback(self)
+
+        self._cond = threading.Condition()
+        self._queue: list[tuple[int, int]] = []
+        self._cancelled: set[tuple[int, int]] = set()
+        self._sequence = itertools.count()
+        self._bucket = float(max_in_flight)
+        self._refilled_at = time.monotonic()
+        self._usage: deque[tuple[float, int]] = deque()
+        self._tokens_in_window = 0
+        self._token_estimate = float(INITIAL_TOKEN_ESTIMATE)
+        # slots of sync chat model calls, by the thread the call runs in
+        self._thread_slots: dict[int, int] = {}
+
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.peak_queue = 0
+        self.requests = 0
+        self.waits = 0
+        self.wait_seconds = 0.0
+        self.max_wait = 0.0
+        self.tokens = 0
+
+    def _can_start(self, now: float) -> bool:
+        self._bucket = min(
+            float(self.max_in_flight), self._bucket + (now - self._refilled_at) * self.requests_per_second
+        )
+        self._refilled_at = now
+        while self._usage and self._usage[0][0] <= now - TPM_WINDOW:
+            self._tokens_in_window -= self._usage.popleft()[1]
+
+        if self._bucket < 1 or self.in_flight >= self.max_in_flight:
+            return False
+        reserved = (self.in_flight + 1) * self._token_estimate
+        # a single call larger than the budget still runs, alone
+        return self._tokens_in_window + reserved <= self.tokens_per_minute or (
+            self.in_flight == 0 and self._tokens_in_window == 0
+        )
+
+    def _start(self):
+        self._bucket -= 1
+        self.in_flight += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        self.requests += 1
+
+    def _try_start(self, ticket: tuple[int, int]) -> bool:
+        while self._queue and self._queue[0] in self._cancelled:
+            self._cancelled.discard(heapq.heappop(self._queue))
+        if self._queue[0] != ticket or not self._can_start(time.monotonic()):
+            return False
+
+        heapq.heappop(self._queue)
+        self._start()
+        # the next in line may be able to start right away too
+        self._cond.notify_all()
+        return True
+
+    def _enqueue(self) -> tuple[int, int]:
+        ticket = (request_priority.get(), next(self._sequence))
+        heapq.heappush(self._queue, ticket)
+        self.peak_queue = max(self.peak_queue, len(self._queue) - len(self._cancelled))
+        return ticket
+
+    def _waited(self, started: float):
+        waited = time.monotonic() - started
+        self.wait_seconds += waited
+        self.max_wait = max(self.max_wait, waited)
+        if waited >= self.check_every_n_seconds:
+            self.waits += 1
+
+    def acquire(self, *, blocking: bool = True) -> bool:
+        if not self.take(blocking=blocking):
+            return False
+        self._hold()
+        return True
+
+    def take(self, *, blocking: bool = True) -> bool:
+        """
+        Takes a slot the caller gives back with `release`.
+        """
+
+        started = time.monotonic()
+        with self._cond:
+            if not blocking:
+                if self._queue or not self._can_start(started):
+                    return False
+                self._start()
+                return True
+
+            ticket = self._enqueue()
+            try:
+                while not self._try_start(ticket):
+                    self._cond.wait(self.check_every_n_seconds)
+            except BaseException:
+                self._cancelled.add(ticket)
+                raise
+            self._waited(started)
+        return True
+
+    async def aacquire(self, *, blocking: bool = True) -> bool:
+        if not blocking:
+            return self.acquire(blocking=False)
+
+        started = time.monotonic()
+        with self._cond:
+            ticket = self._enqueue()
+        try:
+            while True:
+                with self._cond:
+                    if self._try_start(ticket):
+                        self._waited(started)
+                        self._hold()
+                        return True
+                await asyncio.sleep(self.check_every_n_seconds)
+        except BaseException:
+            with self._cond:
+                self._cancelled.add(ticket)
+            raise
+
+    def _hold(self):
+        """
+        Ties the slot just taken by a chat model to its call. A call cancelled by its caller gets neither
+        its end nor its error callback, but the task running it still ends.
+        """
+
+        try:
+            task = asyncio.current_task()
+        except RuntimeError:
+            task = None
+
+        if task is not None:
+            task.add_done_callback(lambda _: self.release())
+            return
+        with self._cond:
+            thread = threading.get_ident()
+            self._thread_slots[thread] = self._thread_slots.get(thread, 0) + 1
+
+    def release_thread_slot(self):
+        """
+        Gives back a slot a sync chat model call in this thread took, if it took one.
+        """
+
+        with self._cond:
+            thread = threading.get_ident()
+            held = self._thread_slots.get(thread, 0)
+            if not held:
+                return
+            if held == 1:
+                del self._thread_slots[thread]
+            else:
+                self._thread_slots[thread] = held - 1
+        self.release()
+
+    def release(self, tokens: int | None = None):
+        """
+        Gives back the slot of a finished call, and records the tokens it used.
+        """
+
+        with self._cond:
+            self.in_flight = max(self.in_flight - 1, 0)
+            self._record(tokens)
+            self._cond.notify_all()
+
+    def record(self, tokens: int | None):
+        """
+        Records the tokens a call used, its slot is given back on its own.
+        """
+
+        with self._cond:
+            self._record(tokens)
+
+    def _record(self, tokens: int | None):
+        if tokens:
+            self._usage.append((time.monotonic(), tokens))
+            self._tokens_in_window += tokens
+            self._token_estimate = 0.8 * self._token_estimate + 0.2 * tokens
+            self.tokens += tokens
+
+    def stats(self) -> dict[str, Any]:
+        with self._cond:
+            return {
+                "in_flight": self.in_flight,
+                "peak_in_flight": self.peak_in_flight,
+                "queued": len(self._queue) - len(self._cancelled),
+                "peak_queue": self.peak_queue,
+                "requests": self.requests,
+                "waits": self.waits,
+                "mean_wait": self.wait_seconds / self.requests if self.requests else 0.0,
+                "max_wait": self.max_wait,
+                "tokens": self.tokens,
+                "tokens_last_minute": self._tokens_in_window,
+            }
+
+
+class LimiterCallback(BaseCallbackHandler):
+    """
+    Records the token usage of finished calls, and releases the limiter slots the callbacks are responsible for.
+    Chat models take their slot through their `rate_limiter` after the cache lookup, so cached answers take none,
+    and the limiter ties it to the call, only the slots of sync calls are released here.
+    LLMs have no such hook, they take their slot when they start, which langchain only reports for prompts
+    the cache did not answer, and give it back when they end or fail.
+    """
+
+    def __init__(self, limiter: ModelLimiter):
+        self.limiter = limiter
+        self._runs: dict[UUID, tuple[bool, int]] = {}
+
+    def on_chat_model_start(
+        self, serialized: dict[str, Any], messages: list[list[BaseMessage]], *, run_id: UUID, **kwargs: Any
+    ):
+        chars = sum(len(str(message.content)) for batch in messages for message in batch)
+        self._runs[run_id] = (False, chars)
+
+    def on_llm_start(self, serialized: dict[str, Any], prompts: list[str], *, run_id: UUID, **kwargs: Any):
+        self.limiter.take()
+        self._runs[run_id] = (True, sum(len(prompt) for prompt in prompts))
+
+    def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs: Any):
+        is_llm, prompt_chars = self._runs.pop(run_id, (False, 0))
+        tokens = used_tokens(response) or (prompt_chars + completion_chars(response)) // CHARS_PER_TOKEN
+        if is_llm:
+            self.limiter.release(tokens)
+            return
+
+        self.limiter.release_thread_slot()
+        generations = [generation for batch in response.generations for generation in batch]
+        if not generations or not all(is_cached(generation) for generation in generations):
+            self.limiter.record(tokens)
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any):
+        is_llm, _ = self._runs.pop(run_id, (False, 0))
+        if is_llm:
+            self.limiter.release()
+        else:
+            self.limiter.release_thread_slot()
+
+
+def is_cached(generation: Any) -> bool:
+    if isinstance(generation, ChatGeneration):
+        return bool(generation.message.response_metadata.get("cached"))
+    return bool((generation.generation_info or {}).get("cached"))
+
+
+def used_tokens(response: LLMResult) -> int:
+    """
+    Total tokens the provider reported for the response, 0 if it did not.
+    """
+
+    total = 0
+    for batch in response.generations:
+        for generation in batch:
+            if isinstance(generation, ChatGeneration):
+                usage = getattr(generation.message, "usage_metadata", None) or {}
+                total += usage.get("total_tokens", 0)
+    if total:
+        return total
+
+    usage = (response.llm_output or {}).get("token_usage") or (response.llm_output or {}).get("usage_metadata") or {}
+    return int(usage.get("total_tokens", 0) or 0)
+
+
+def completion_chars(response: LLMResult) -> int:
+    return sum(len(generation.text) for batch in response.generations for generation in batch)
+
+
+limiters: dict[str, ModelLimiter] = {
+    "light": ModelLimiter("light", RATE_LIMIT_LIGHT_RPS, RATE_LIMIT_LIGHT_MAX_IN_FLIGHT, RATE_LIMIT_LIGHT_TPM),
+    "default": ModelLimiter("default", RATE_LIMIT_RPS, RATE_LIMIT_MAX_IN_FLIGHT, RATE_LIMIT_TPM),
+    "heavy": ModelLimiter("heavy", RATE_LIMIT_HEAVY_RPS, RATE_LIMIT_HEAVY_MAX_IN_FLIGHT, RATE_LIMIT_HEAVY_TPM),
+}
+
+
+def limiter_stats() -> dict[str, dict[str, Any]]:
+    """
+    Returns the queue depth, wait times and usage of the limiter of every model tier.
+    """
+
+    return {tier: limiter.stats() for tier, limiter in limiters.items()}
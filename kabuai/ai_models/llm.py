@@ -1,8 +1,11 @@
 import os
+from typing import Any
 
 from langchain_core.language_models import BaseLLM
-from langchain_google_genai.llms import GoogleGenerativeAI
-from langchain_ollama.llms import OllamaLLM
+
+from ai_models.cache import model_cache
+from ai_models.limits import limiters
+from ai_models.registry import lazy_model
 
 LLM_MODEL = os.getenv("LLM_MODEL") or ""
 LLM_MODEL_LIGHT = os.getenv("LLM_MODEL_LIGHT") or ""
@@ -10,47 +13,35 @@ LLM_MODEL_HEAVY = os.getenv("LLM_MODEL_HEAVY") or ""
 
 TEMPERATURE = float(os.getenv("TEMPERATURE") or 0)
 
-llm_light: BaseLLM
-llm: BaseLLM
-llm_heavy: BaseLLM
-
-if LLM_MODEL_LIGHT.startswith("google_genai"):
-    llm_light = GoogleGenerativeAI(
-        model=LLM_MODEL_LIGHT.split(":")[1],
-        temperature=TEMPERATURE,
-    )
-elif LLM_MODEL_LIGHT.startswith("ollama"):
-    llm_light = OllamaLLM(
-        model=LLM_MODEL_LIGHT.split(":")[1],
-        temperature=TEMPERATURE,
-    )
-else:
-    raise ValueError(f"Unsupported LLM model: {LLM_MODEL_LIGHT}")
-
-if LLM_MODEL_HEAVY.startswith("google_genai"):
-    llm_heavy = GoogleGenerativeAI(
-        model=LLM_MODEL_HEAVY.split(":")[1],
-        temperature=TEMPERATURE,
-        max_tokens=8192,
-    )
-elif LLM_MODEL_HEAVY.startswith("ollama"):
-    llm_heavy = OllamaLLM(
-        model=LLM_MODEL_HEAVY.split(":")[1],
-        temperature=TEMPERATURE,
-    )
-else:
-    raise ValueError(f"Unsupported LLM model: {LLM_MODEL_HEAVY}")
-
-if LLM_MODEL.startswith("google_genai"):
-    llm = GoogleGenerativeAI(
-        model=LLM_MODEL.split(":")[1],
-        temperature=TEMPERATURE,
-        max_tokens=4096,
-    )
-elif LLM_MODEL.startswith("ollama"):
-    llm = OllamaLLM(
-        model=LLM_MODEL.split(":")[1],
-        temperature=TEMPERATURE,
-    )
-else:
-    raise ValueError(f"Unsupported LLM model: {LLM_MODEL}")
+SUPPORTED_PROVIDERS = ("google_genai", "ollama")
+
+# a misconfigured model still fails at startup, not on the first request that uses it
+for configured in (LLM_MODEL_LIGHT, LLM_MODEL_HEAVY, LLM_MODEL):
+    if not configured.startswith(SUPPORTED_PROVIDERS):
+        raise ValueError(f"Unsupported LLM model: {configured}")
+
+
+def build_llm(name: str, model: str, tier: str, **kwargs: Any) -> BaseLLM:
+    # the provider packages are slow to import, so only the one in use is, when the model is first used
+    common: dict[str, Any] = {
+        "model": model.split(":")[1],
+        "temperature": TEMPERATURE,
+        "cache": model_cache(name, model),
+        "callbacks": [limiters[tier].callback],
+        "metadata": {"model_tier": tier},
+    }
+
+    if model.startswith("google_genai"):
+        from langchain_google_genai.llms import GoogleGenerativeAI
+
+        return GoogleGenerativeAI(**common, **kwargs)
+
+    from langchain_ollama.llms import OllamaLLM
+
+    # the output length limits are only set for Google models
+    return OllamaLLM(**common)
+
+
+llm_light: BaseLLM = lazy_model("llm_light", lambda: build_llm("llm_light", LLM_MODEL_LIGHT, "light"))
+llm_heavy: BaseLLM = lazy_model("llm_heavy", lambda: build_llm("llm_heavy", LLM_MODEL_HEAVY, "heavy", max_tokens=8192))
+llm: BaseLLM = lazy_model("llm", lambda: build_llm("llm", LLM_MODEL, "default", max_tokens=4096))
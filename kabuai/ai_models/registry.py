@@ -0,0 +1,93 @@
+import logging
+import os
+import threading
+import time
+from collections.abc import Callable
+from typing import Any
+
+# model names (e.g. chat_model_heavy,llm) built at startup instead of on first use, "all" for every model
+PREWARM_MODELS = [name.strip() for name in (os.getenv("PREWARM_MODELS") or "").split(",") if name.strip()]
+
+logger = logging.getLogger(__name__)
+
+
+class LazyModel:
+    """
+    Stands in for a model client that is only built, and its provider package imported, on first use.
+    Every attribute is looked up on the real model, so it is used like one:
+    `chat_model.invoke(...)`, `chat_model.with_structured_output(...)`.
+    """
+
+    def __init__(self, name: str, factory: Callable[[], Any]):
+        self.name = name
+        self._factory = factory
+        self._model: Any = None
+        self._lock = threading.Lock()
+        self.build_seconds: float | None = None
+
+    @property
+    def built(self) -> bool:
+        return self._model is not None
+
+    def get(self) -> Any:
+        if self._model is not None:
+            return self._model
+
+        with self._lock:
+            if self._model is None:
+                started = time.perf_counter()
+                self._model = self._factory()
+                self.build_seconds = time.perf_counter() - started
+                logger.info(f"Built {self.name} in {self.build_seconds:.3f}s")
+        return self._model
+
+    def replace(self, model: Any):
+        """
+        Uses `model` instead of building one, e.g. a simulated model in the benchmarks.
+        """
+
+        with self._lock:
+            self._model = model
+
+    def __getattr__(self, name: str) -> Any:
+        # only reached for attributes LazyModel itself does not have
+        if name.startswith("__"):
+            raise AttributeError(name)
+        return getattr(self.get(), name)
+
+    def __repr__(self) -> str:
+        return f"LazyModel({self.name!r}, built={self.built})"
+
+
+models: dict[str, LazyModel] = {}
+
+
+def lazy_model(name: str, factory: Callable[[], Any]) -> Any:
+    """
+    Registers the model `name`, built by `factory` on first use.
+    """
+
+    model = models[name] = LazyModel(name, factory)
+    return model
+
+
+def prewarm(names: list[str] | None = None):
+    """
+    Builds the given models (PREWARM_MODELS by default) now, so the first request using them does not pay for it.
+    Models of modules that are not imported yet are not registered, and skipped.
+    """
+
+    names = PREWARM_MODELS if names is None else names
+    for name in models if "all" in names else names:
+        if name not in models:
+            logger.warning(f"Can not prewarm unknown model {name}")
+            continue
+        models[name].get()
+
+
+def model_stats() -> dict[str, dict[str, Any]]:
+    """
+    Returns whether every registered model has been built, and how long building it took.
+    """
+
+    return {name: {"built": model.built, "build_seconds": model.build_seconds} for name, model in models.items()}
@@ -0,0 +1,188 @@
+"""
+Measures how the graph serves concurrent chat sessions: every session asks for an analysis of a stock
+that is already loaded, so the supervisor plans, the analyzer agent runs and the supervisor answers.
+The models are simulated with a fixed latency and the data is synthetic, so nothing goes over the network
+and the numbers only show how much of the model wait the graph overlaps across sessions.
+
+Run from the kabuai directory:
+    python -m benchmarks.concurrency
+"""
+
+import asyncio
+import os
+import statistics
+import time
+from datetime import UTC, datetime
+from typing import Any
+
+# the model clients are simulated, but the modules still check the configured providers on import
+for variable in ("CHAT_MODEL", "CHAT_MODEL_LIGHT", "CHAT_MODEL_HEAVY"):
+    os.environ.setdefault(variable, "google_genai:gemini-2.5-flash")
+for variable in ("LLM_MODEL", "LLM_MODEL_LIGHT", "LLM_MODEL_HEAVY"):
+    os.environ.setdefault(variable, "google_genai:gemini-2.5-flash")
+
+from langchain_core.language_models import BaseChatModel  # noqa: E402
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage  # noqa: E402
+from langchain_core.outputs import ChatGeneration, ChatResult  # noqa: E402
+from langchain_core.utils.function_calling import convert_to_openai_tool  # noqa: E402
+
+from agents.boss import boss  # noqa: E402
+from ai_models.registry import models  # noqa: E402
+from benchmarks.price_series import make_history  # noqa: E402
+from graph.boss_state import StockBossState  # noqa: E402
+from models.search import SearchResult  # noqa: E402
+from models.stock import CompanyDetails, PriceSeries, StockData, StockMetadata  # noqa: E402
+
+SESSIONS = [1, 10, 50]
+# seconds every simulated model call takes, roughly a short completion
+MODEL_LATENCY = float(os.getenv("BENCHMARK_MODEL_LATENCY") or 0.2)
+
+PLAN = [
+    {
+        "agent": "analyzer_agent",
+        "request": "Analyze the stock",
+        "message": "Analyzing the stock.",
+        "system_instruction": "Analyze the loaded stock.",
+    },
+    {"agent": "FINISH", "request": "", "message": "Done.", "system_instruction": ""},
+]
+
+
+class SimulatedChatModel(BaseChatModel):
+    """
+    Answers every prompt with `reply` after `latency` seconds, or with the plan as a Router tool call.
+    Sleeps on the event loop when awaited, and blocks the calling thread when invoked.
+    """
+
+    latency: float
+    reply: str = ""
+    plan: list[dict[str, Any]] | None = None
+
+    @property
+    def _llm_type(self) -> str:
+        return "simulated"
+
+    def bind_tools(self, tools: Any, **kwargs: Any) -> Any:
+        return self.bind(tools=[convert_to_openai_tool(tool) for tool in tools], **kwargs)
+
+    def _result(self) -> ChatResult:
+        if self.plan is not None:
+            message = AIMessage("", tool_calls=[{"name": "Router", "args": {"plan": self.plan}, "id": "plan"}])
+        else:
+            message = AIMessage(self.reply)
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _generate(self, messages: list[BaseMessage], stop: Any = None, run_manager: Any = None, **kwargs: Any):
+        time.sleep(self.latency)
+        return self._result()
+
+    async def _agenerate(self, messages: list[BaseMessage], stop: Any = None, run_manager: Any = None, **kwargs: Any):
+        await asyncio.sleep(self.latency)
+        return self._result()
+
+
+def make_stock_data() -> StockData:
+    company = CompanyDetails.model_validate(
+        {
+            "longName": "Example Corp",
+            "symbol": "EXMP",
+            "address1": "1 Example Way",
+            "city": "Springfield",
+            "state": "CA",
+            "zip": "00000",
+            "country": "United States",
+            "phone": "000-000-0000",
+            "website": "https://example.com",
+            "industry": "Software",
+            "sector": "Technology",
+            "longBusinessSummary": "Makes example software.",
+            "fullTimeEmployees": 1000,
+            "companyOfficers": [],
+            "currentPrice": 100.0,
+            "marketCap": 10_000_000_000,
+            "sharesOutstanding": 100_000_000,
+            "profitMargins": 0.2,
+            "returnOnEquity": 0.15,
+            "totalRevenue": 2_000_000_000,
+            "grossProfits": 1_000_000_000,
+            "totalCash": 500_000_000,
+            "totalDebt": 200_000_000,
+            "revenueGrowth": 0.1,
+        }
+    )
+    return StockData(
+        company=company,
+        metadata=StockMetadata(symbol="EXMP", company_name="Example Corp", sector="Technology"),
+        prices=PriceSeries.from_dataframe(make_history(1260, "B")),
+        news=[],
+    )
+
+
+def make_state(stock_data: StockData, search_results: list[SearchResult]) -> StockBossState:
+    return {
+        "messages": [HumanMessage("How does it look?")],
+        "stock_data": stock_data,
+        "stock_summary": "Example Corp is a software company.",
+        "ticker": "EXMP",
+        "plan": [],
+        "next": "",
+        "step": -1,
+        "search_query": "Example Corp news",
+        "search_results": search_results,
+        "search_summary": "The news about Example Corp is mostly positive.",
+        "analysis_result": None,
+        "analysis_score": None,
+    }
+
+
+def simulate_models():
+    models["chat_model_heavy"].replace(SimulatedChatModel(latency=MODEL_LATENCY, plan=PLAN))
+    models["chat_model"].replace(SimulatedChatModel(latency=MODEL_LATENCY, reply="Example Corp looks fine."))
+    models["chat_model_light"].replace(SimulatedChatModel(latency=MODEL_LATENCY, reply="Anything else?"))
+
+
+async def run_session(state: StockBossState, thread_id: str) -> float:
+    started = time.perf_counter()
+    result = await boss.ainvoke(state, config={"configurable": {"thread_id": thread_id}})
+    if not result.get("analysis_result"):
+        raise RuntimeError(f"Session {thread_id} did not complete the analysis")
+    return time.perf_counter() - started
+
+
+async def run(sessions: int, state: StockBossState) -> tuple[float, list[float]]:
+    started = time.perf_counter()
+    latencies = await asyncio.gather(*(run_session(state, f"{sessions}-{i}") for i in range(sessions)))
+    return time.perf_counter() - started, sorted(latencies)
+
+
+def main():
+    simulate_models()
+    search_results = [
+        SearchResult(
+            snippet=f"Example Corp news {i}",
+            title=f"Example Corp headline {i}",
+            link=f"https://example.com/{i}",
+            date=datetime.now(UTC),
+            source="example.com",
+            sentiment_score=0.5,
+            confidence=0.8,
+        )
+        for i in range(10)
+    ]
+    state = make_state(make_stock_data(), search_results)
+
+    # three model calls per session, this is the floor of the latency
+    print(f"model latency {MODEL_LATENCY * 1000:.0f}ms, {3 * MODEL_LATENCY * 1000:.0f}ms of model time per session")
+    print(f"{'sessions':<10}{'wall (s)':>10}{'sessions/s':>12}{'p50 (ms)':>10}{'p99 (ms)':>10}")
+    asyncio.run(run(1, state))  # warm up
+    for sessions in SESSIONS:
+        wall, latencies = asyncio.run(run(sessions, state))
+        p99 = latencies[min(len(latencies) - 1, round(0.99 * (len(latencies) - 1)))]
+        print(
+            f"{sessions:<10}{wall:>10.2f}{sessions / wall:>12.1f}"
+            f"{statistics.median(latencies) * 1000:>10.0f}{p99 * 1000:>10.0f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+Compares the old list of StockPrice models with the columnar PriceSeries,
+for building from a yfinance history DataFrame and serializing to JSON.
+
+Run from the kabuai directory:
+    python -m benchmarks.price_series
+"""
+
+import timeit
+import tracemalloc
+from collections.abc import Callable
+from typing import cast
+
+import numpy as np
+import pandas as pd
+from pandas import Timestamp
+from pydantic import TypeAdapter
+
+from models.stock import PriceSeries, StockPrice
+
+SIZES: dict[str, tuple[int, str]] = {
+    "6mo daily": (126, "B"),
+    "5y daily": (1260, "B"),
+    "60d 5m intraday": (60 * 78, "5min"),
+}
+
+prices_adapter = TypeAdapter(list[StockPrice])
+
+
+def make_history(rows: int, freq: str) -> pd.DataFrame:
+    rng = np.random.default_rng(42)
+    index = pd.date_range(end=Timestamp.now(tz="America/New_York").normalize(), periods=rows, freq=freq)
+    close = 100 + rng.standard_normal(rows).cumsum()
+    return pd.DataFrame(
+        {
+            "Open": close + rng.standard_normal(rows),
+            "High": close + 1,
+            "Low": close - 1,
+            "Close": close,
+            "Volume": rng.integers(1_000_000, 5_000_000, rows),
+            "Dividends": 0.0,
+            "Stock Splits": 0.0,
+        },
+        index=index,
+    )
+
+
+def build_models(hist: pd.DataFrame) -> list[StockPrice]:
+    # the previous fetch_stock_details implementation
+    return [
+        StockPrice(
+            date=cast(Timestamp, index).to_pydatetime(),
+            open=cast(float, row.get("Open", 0)),
+            high=cast(float, row.get("High", 0)),
+            low=cast(float, row.get("Low", 0)),
+            close=cast(float, row.get("Close", 0)),
+            adjusted_close=cast(float, row.get("Adj Close", row.get("Close", 0))),
+            volume=cast(int, row.get("Volume", 0)),
+        )
+        for index, row in hist.iterrows()
+    ]
+
+
+def measure(fn: Callable[[], object], number: int) -> tuple[float, float]:
+    """
+    Returns the mean time in milliseconds and the peak allocated memory in KiB of one call.
+    """
+
+    seconds = timeit.timeit(fn, number=number) / number
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return seconds * 1000, peak / 1024
+
+
+def main():
+    print(f"{'size':<18}{'path':<28}{'time (ms)':>12}{'peak (KiB)':>12}{'payload (KiB)':>15}")
+    for label, (rows, freq) in SIZES.items():
+        hist = make_history(rows, freq)
+        number = max(3, 2000 // rows)
+
+        models = build_models(hist)
+        series = PriceSeries.from_dataframe(hist)
+
+        results = {
+            "models: build": (measure(lambda: build_models(hist), number), None),
+            "models: dump json": (
+                measure(lambda: prices_adapter.dump_json(models), number),
+                len(prices_adapter.dump_json(models)),
+            ),
+            "series: build": (measure(lambda: PriceSeries.from_dataframe(hist), number), None),
+            "series: dump json": (measure(series.to_json, number), len(series.to_json())),
+            "series: dump bytes": (measure(series.to_bytes, number), len(series.to_bytes())),
+            "series: slice last 20": (measure(lambda: series[-20:], number), None),
+        }
+
+        for path, ((ms, peak), payload) in results.items():
+            payload_text = f"{payload / 1024:.1f}" if payload is not None else "-"
+            print(f"{label:<18}{path:<28}{ms:>12.3f}{peak:>12.1f}{payload_text:>15}")
+        print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""
+Compares the local lexicon sentiment scorer with the model scores kept in the sentiment store.
+Reports agreement on the whole corpus and, per confidence threshold, how many articles hybrid mode
+would keep local and how well those agree with the model.
+
+Run from the kabuai directory, with SENTIMENT_STORE_PATH pointing at a populated store:
+    python -m benchmarks.sentiment_eval
+"""
+
+import math
+import timeit
+
+from utils.sentiment import SENTIMENT_STORE_PATH, score_sentiment, sentiment_store
+
+THRESHOLDS = [0.3, 0.4, 0.5, 0.6, 0.7, 0.8]
+# scores closer to zero than this count as neutral when comparing labels
+NEUTRAL_BAND = 0.15
+
+
+def label(score: float) -> int:
+    return 0 if abs(score) < NEUTRAL_BAND else (1 if score > 0 else -1)
+
+
+def correlation(xs: list[float], ys: list[float]) -> float:
+    n = len(xs)
+    mean_x, mean_y = sum(xs) / n, sum(ys) / n
+    cov = sum((x - mean_x) * (y - mean_y) for x, y in zip(xs, ys))
+    var_x = sum((x - mean_x) ** 2 for x in xs)
+    var_y = sum((y - mean_y) ** 2 for y in ys)
+    return cov / math.sqrt(var_x * var_y) if var_x and var_y else 0.0
+
+
+def main():
+    corpus = sentiment_store.labelled()
+    if not corpus:
+        print(f"No scored articles in {SENTIMENT_STORE_PATH}, run some searches first")
+        return
+
+    models = sorted({model for *_, model in corpus})
+    local = [score_sentiment(title or "", snippet or "") for title, snippet, *_ in corpus]
+    reference = [score for _, _, score, _, _ in corpus]
+
+    seconds = timeit.timeit(lambda: [score_sentiment(t or "", s or "") for t, s, *_ in corpus], number=3) / 3
+
+    local_scores = [score for score, _ in local]
+    agreement = sum(label(a) == label(b) for a, b in zip(local_scores, reference)) / len(corpus)
+    error = sum(abs(a - b) for a, b in zip(local_scores, reference)) / len(corpus)
+
+    print(f"corpus: {len(corpus)} articles scored by {', '.join(models)}")
+    print(f"local scorer: {seconds / len(corpus) * 1e6:.1f}us per article")
+    print(f"label agreement: {agreement:.1%}, mean absolute error: {error:.3f}")
+    print(f"correlation: {correlation(local_scores, reference):.3f}")
+    print()
+
+    print(f"{'threshold':>10}{'kept local':>12}{'agreement':>12}{'mae':>8}")
+    for threshold in THRESHOLDS:
+        kept = [(s, r) for (s, confidence), r in zip(local, reference) if confidence >= threshold]
+        if not kept:
+            print(f"{threshold:>10.2f}{'0.0%':>12}{'-':>12}{'-':>8}")
+            continue
+
+        kept_agreement = sum(label(s) == label(r) for s, r in kept) / len(kept)
+        kept_error = sum(abs(s - r) for s, r in kept) / len(kept)
+        print(f"{threshold:>10.2f}{len(kept) / len(corpus):>12.1%}{kept_agreement:>12.1%}{kept_error:>8.3f}")
+
+
+if __name__ == "__main__":
+    main()
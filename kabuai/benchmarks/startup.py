@@ -0,0 +1,94 @@
+"""
+Measures the cold start of the backend: import time and resident memory of a fresh interpreter
+importing the graph and the API, against the same with the deferred packages (yfinance, pandas,
+DuckDuckGo and the model providers) imported up front, as before models were built lazily.
+Every case runs in its own process, the median of the runs is reported.
+
+Run from the kabuai directory, with the model env vars set:
+    python -m benchmarks.startup
+"""
+
+import json
+import statistics
+import subprocess
+import sys
+
+RUNS = 5
+
+# what building the models and fetching the first stock used to import at startup
+DEFERRED = [
+    "yfinance",
+    "pandas",
+    "duckduckgo_search",
+    "langchain.chat_models",
+    "langchain_google_genai",
+    "langchain_ollama",
+]
+
+CASES: dict[str, tuple[list[str], bool]] = {
+    "agents.boss": (["agents.boss"], False),
+    "agents.boss, eager": (["agents.boss", *DEFERRED], False),
+    "main": (["main"], False),
+    "main, eager": (["main", *DEFERRED], False),
+    "main, prewarm all": (["main"], True),
+}
+
+PROBE = """
+import importlib, json, resource, sys, time
+started = time.perf_counter()
+skipped = []
+for module in {modules!r}:
+    try:
+        importlib.import_module(module)
+    except ImportError:
+        skipped.append(module)
+imported = time.perf_counter() - started
+if {prewarm!r}:
+    from ai_models.registry import prewarm
+    prewarm(["all"])
+total = time.perf_counter() - started
+with open("/proc/self/statm") as f:
+    rss = int(f.read().split()[1]) * resource.getpagesize()
+print(json.dumps({{"import": imported, "total": total, "rss": rss, "modules": len(sys.modules), "skipped": skipped}}))
+"""
+
+
+def measure(modules: list[str], prewarm: bool) -> dict:
+    runs = []
+    for _ in range(RUNS):
+        result = subprocess.run(
+            [sys.executable, "-c", PROBE.format(modules=modules, prewarm=prewarm)],
+            capture_output=True,
+            text=True,
+        )
+        if result.returncode != 0:
+            return {"error": result.stderr.strip().splitlines()[-1]}
+        runs.append(json.loads(result.stdout.strip().splitlines()[-1]))
+
+    return {
+        "import": statistics.median(run["import"] for run in runs),
+        "total": statistics.median(run["total"] for run in runs),
+        "rss": statistics.median(run["rss"] for run in runs),
+        "modules": runs[0]["modules"],
+        "skipped": runs[0]["skipped"],
+    }
+
+
+def main():
+    print(f"{'case':<22}{'import (ms)':>13}{'total (ms)':>12}{'rss (MiB)':>11}{'modules':>9}")
+    for label, (modules, prewarm) in CASES.items():
+        result = measure(modules, prewarm)
+        if "error" in result:
+            print(f"{label:<22} failed: {result['error']}")
+            continue
+
+        print(
+            f"{label:<22}{result['import'] * 1000:>13.0f}{result['total'] * 1000:>12.0f}"
+            f"{result['rss'] / 2**20:>11.1f}{result['modules']:>9}"
+        )
+        if result["skipped"]:
+            print(f"{'':<22}not installed: {', '.join(result['skipped'])}")
+
+
+if __name__ == "__main__":
+    main()
@@ -7,3 +7,5 @@ class StockAgentState(MessagesState):
     ticker: str | None
     stock_data: StockData | None
     stock_summary: str | None
+    # the other stocks of a comparison, the first stock asked about is stock_data
+    compared_stocks: list[StockData]
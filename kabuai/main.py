@@ -1,6 +1,8 @@
+import asyncio
 import json
 import logging
 import os
+from contextlib import asynccontextmanager
 from pprint import pprint
 from typing import Any, cast
 
@@ -11,23 +13,42 @@ from langchain_core.messages import AnyMessage, BaseMessage, BaseMessageChunk, H
 from langgraph.types import Send
 
 from agents.boss import boss
+from ai_models.cache import llm_cache_stats
+from ai_models.limits import limiter_stats
+from ai_models.registry import model_stats, prewarm
 from constants.agents import ANALYZER_AGENT_NAME, SEARCH_AGENT_NAME, STOCK_AGENT_NAME, SUPERVISOR_NAME
 from graph.boss_state import StockBossState
 from models.api import Request, Response
+from prompts.layout import prompt_report
+from tools.search import search_cache_stats
+from tools.stock import stock_cache_stats
 from utils.logger import setup_logging
+from utils.metrics import UsageCallback, usage_stats
+from utils.plans import plan_cache
 
 DEBUG = os.getenv("DEBUG", "0") == "1"
 
 
-def invoke_agent(state: StockBossState, callables: list) -> StockBossState:
-    return cast(StockBossState, boss.invoke(state, config={"callbacks": callables, "configurable": {"thread_id": "1"}}))
+async def invoke_agent(state: StockBossState, callables: list) -> StockBossState:
+    return cast(
+        StockBossState,
+        await boss.ainvoke(state, config={"callbacks": callables, "configurable": {"thread_id": "1"}}),
+    )
 
 
 setup_logging()
 logger = logging.getLogger(__name__)
 logger.info(f"Starting with DEBUG: {DEBUG}")
 
-app = FastAPI()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # models are built on first use, PREWARM_MODELS are built before the worker takes requests
+    await asyncio.to_thread(prewarm)
+    yield
+
+
+app = FastAPI(lifespan=lifespan)
 
 origin_env = os.getenv("ALLOWED_ORIGINS", "")
 origins = [origin.strip() for origin in origin_env.split(",") if origin_env.strip()]
@@ -58,6 +79,20 @@ async def health():
     return {"message": "Health Check!"}
 
 
+@app.get("/metrics")
+async def metrics():
+    return {
+        "usage": usage_stats(),
+        "models": model_stats(),
+        "llm_cache": llm_cache_stats(),
+        "rate_limits": limiter_stats(),
+        "plan_cache": plan_cache.stats(),
+        "stock_cache": stock_cache_stats(),
+        "search_cache": search_cache_stats(),
+        "prompts": prompt_report(),
+    }
+
+
 @app.post("/chat")
 async def chat(request: Request) -> StreamingResponse:
     state: StockBossState = {
@@ -80,9 +115,13 @@ async def chat(request: Request) -> StreamingResponse:
         # messages -> to get chunk by chunk streaming messages
         # updates -> for tool calls and state updates
         # tasks -> for context changes
+        usage = UsageCallback()
 
         async for namespace, mode, data in boss.astream(
-            state, stream_mode=["messages", "updates", "tasks", "custom"], subgraphs=True
+            state,
+            config={"callbacks": [usage]},
+            stream_mode=["messages", "updates", "tasks", "custom"],
+            subgraphs=True,
         ):
             logger.debug(namespace)
             logger.debug(mode)
@@ -353,12 +392,24 @@ async def chat(request: Request) -> StreamingResponse:
                             arguments=handoff,
                         )
                     )
+                elif tool := data.get("tool"):
+                    # tool calls made without a model call, e.g. when the stock agent extracted the ticker itself
+                    yield sse_format(
+                        Response(
+                            type="tool",
+                            name=tool["name"],
+                            arguments=tool["arguments"],
+                        )
+                    )
                 else:
                     logger.warning("Unknown custom event detected.")
 
             else:
                 logger.warning(f"Unknown mode detected {mode}")
 
+        # tokens, latency and cost of every model and tool call made for this request
+        yield sse_format(Response(type="usage", usage=usage.summary()))
+
     return StreamingResponse(stream_generator(), media_type="text/event-stream")
 
 
@@ -398,5 +449,5 @@ if __name__ == "__main__":
 
         query = input("You> ").strip()
         state["messages"].append(HumanMessage(query))
-        result = invoke_agent(state, [])
+        result = asyncio.run(invoke_agent(state, []))
         state.update(result)
@@ -31,7 +31,7 @@ class Request(BaseModel):
 
 
 class Response(BaseModel):
-    type: Literal["handoff", "tool", "chunk", "update", "task"]
+    type: Literal["handoff", "tool", "chunk", "update", "task", "usage"]
     # type = "handoff" | "tool"
     arguments: dict[str, Any] | None = Field(default=None)
     # type = "tool" | "task"
@@ -42,3 +42,5 @@ class Response(BaseModel):
     state: dict[str, Any] | None = Field(default=None)
     # type = "task"
     direction: Literal["enter", "leave"] | None = Field(default=None)
+    # type = "usage"
+    usage: dict[str, Any] | None = Field(default=None)
@@ -1,6 +1,15 @@
-from datetime import datetime
+import struct
+from collections.abc import Iterable, Iterator
+from datetime import UTC, datetime
+from typing import TYPE_CHECKING, Any, Self, overload
 
-from pydantic import BaseModel, Field
+import numpy as np
+from numpy.typing import NDArray
+from pydantic import BaseModel, Field, GetCoreSchemaHandler
+from pydantic_core import core_schema, to_json
+
+if TYPE_CHECKING:
+    from pandas import DataFrame
 
 
 class CompanyOfficer(BaseModel):
@@ -52,6 +61,7 @@ class StockMetadata(BaseModel):
     pe_ratio: float | None = Field(None, description="Price to earnings ratio")
     dividend_yield: float | None = Field(None, description="Annual dividend yield percentage")
     beta: float | None = Field(None, description="Measure of stock volatility relative to market")
+    exchange_timezone: str | None = Field(None, description="Timezone of the exchange, e.g. America/New_York")
 
 
 class StockPrice(BaseModel):
@@ -64,6 +74,204 @@ class StockPrice(BaseModel):
     volume: int = Field(description="Number of shares traded")
 
 
+class PriceSeries:
+    """
+    Columnar price history backed by NumPy arrays, one array per field.
+    Dates are stored as UTC epoch seconds. Slicing returns views, not copies.
+    Serializes to compact columnar JSON or to a flat binary buffer.
+    """
+
+    FLOAT_FIELDS = ("open", "high", "low", "close", "adjusted_close")
+    BINARY_MAGIC = b"KPS1"
+
+    def __init__(
+        self,
+        date: NDArray[np.int64],
+        open: NDArray[np.float64],
+        high: NDArray[np.float64],
+        low: NDArray[np.float64],
+        close: NDArray[np.float64],
+        adjusted_close: NDArray[np.float64],
+        volume: NDArray[np.int64],
+    ):
+        self.date = date
+        self.open = open
+        self.high = high
+        self.low = low
+        self.close = close
+        self.adjusted_close = adjusted_close
+        self.volume = volume
+
+    @classmethod
+    def empty(cls) -> Self:
+        return cls.from_columns({})
+
+    @classmethod
+    def from_dataframe(cls, df: "DataFrame") -> Self:
+        """
+        Builds the series straight from a yfinance history DataFrame, without iterating rows.
+        """
+
+        # yfinance leaves NaN in bars without trades, which would serialize as null. bars without a close
+        # are dropped, missing open, high, low and adjusted close fall back to the close
+        df = df.dropna(subset=["Close"])
+        if df.empty:
+            return cls.empty()
+
+        index = df.index.tz_localize("UTC") if df.index.tz is None else df.index.tz_convert("UTC")
+        close = df["Close"]
+        return cls(
+            date=index.as_unit("s").asi8,
+            open=df["Open"].fillna(close).to_numpy(dtype=np.float64),
+            high=df["High"].fillna(close).to_numpy(dtype=np.float64),
+            low=df["Low"].fillna(close).to_numpy(dtype=np.float64),
+            close=close.to_numpy(dtype=np.float64),
+            adjusted_close=(df["Adj Close"].fillna(close) if "Adj Close" in df else close).to_numpy(dtype=np.float64),
+            volume=df["Volume"].fillna(0).to_numpy(dtype=np.int64),
+        )
+
+    @classmethod
+    def from_columns(cls, columns: dict[str, Any]) -> Self:
+        close = np.asarray(columns.get("close", []), dtype=np.float64)
+        return cls(
+            date=np.asarray(columns.get("date", []), dtype=np.int64),
+            open=np.asarray(columns.get("open", []), dtype=np.float64),
+            high=np.asarray(columns.get("high", []), dtype=np.float64),
+            low=np.asarray(columns.get("low", []), dtype=np.float64),
+            close=close,
+            adjusted_close=np.asarray(columns.get("adjusted_close", close), dtype=np.float64),
+            volume=np.asarray(columns.get("volume", []), dtype=np.int64),
+        )
+
+    @classmethod
+    def from_rows(cls, rows: Iterable["StockPrice | dict"]) -> Self:
+        prices = [row if isinstance(row, StockPrice) else StockPrice.model_validate(row) for row in rows]
+        return cls.from_columns(
+            {
+                "date": [int(p.date.timestamp()) for p in prices],
+                **{field: [getattr(p, field) for p in prices] for field in (*cls.FLOAT_FIELDS, "volume")},
+            }
+        )
+
+    @classmethod
+    def from_bytes(cls, buffer: bytes) -> Self:
+        """
+        Reads a buffer written by `to_bytes`. The arrays are views into the buffer.
+        """
+
+        if buffer[:4] != cls.BINARY_MAGIC:
+            raise ValueError("Not a price series buffer")
+
+        (n,) = struct.unpack_from("<I", buffer, 4)
+        offset = 8
+        arrays = []
+        for dtype in (np.int64, *(np.float64,) * len(cls.FLOAT_FIELDS), np.int64):
+            arrays.append(np.frombuffer(buffer, dtype=dtype, count=n, offset=offset))
+            offset += n * 8
+
+        return cls(*arrays)
+
+    def to_columns(self, decimals: int | None = None) -> dict[str, list]:
+        columns: dict[str, list] = {"date": self.date.tolist()}
+        for field in self.FLOAT_FIELDS:
+            values = getattr(self, field)
+            columns[field] = (np.round(values, decimals) if decimals is not None else values).tolist()
+        columns["volume"] = self.volume.tolist()
+        return columns
+
+    def to_json(self, decimals: int | None = 4) -> str:
+        return to_json(self.to_columns(decimals)).decode()
+
+    def to_bytes(self) -> bytes:
+        arrays = [self.date.astype("<i8")]
+        arrays += [getattr(self, field).astype("<f8") for field in self.FLOAT_FIELDS]
+        arrays += [self.volume.astype("<i8")]
+        return b"".join([self.BINARY_MAGIC, struct.pack("<I", len(self)), *(a.tobytes() for a in arrays)])
+
+    def row(self, i: int) -> "StockPrice":
+        return StockPrice(
+            date=datetime.fromtimestamp(int(self.date[i]), tz=UTC),
+            open=float(self.open[i]),
+            high=float(self.high[i]),
+            low=float(self.low[i]),
+            close=float(self.close[i]),
+            adjusted_close=float(self.adjusted_close[i]),
+            volume=int(self.volume[i]),
+        )
+
+    def since(self, when: datetime) -> Self:
+        """
+        Returns the bars on or after the given time, as a view.
+        """
+
+        return self[int(np.searchsorted(self.date, int(when.timestamp()), side="left")) :]
+
+    @property
+    def dates(self) -> NDArray[np.datetime64]:
+        return self.date.astype("datetime64[s]")
+
+    def __len__(self) -> int:
+        return len(self.date)
+
+    @overload
+    def __getitem__(self, key: int) -> "StockPrice": ...
+
+    @overload
+    def __getitem__(self, key: slice) -> Self: ...
+
+    def __getitem__(self, key: int | slice) -> "StockPrice | Self":
+        if isinstance(key, slice):
+            return type(self)(*(getattr(self, field)[key] for field in ("date", *self.FLOAT_FIELDS, "volume")))
+        return self.row(key)
+
+    def __iter__(self) -> Iterator["StockPrice"]:
+        for i in range(len(self)):
+            yield self.row(i)
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, PriceSeries):
+            return NotImplemented
+        return all(
+            np.array_equal(getattr(self, field), getattr(other, field))
+            for field in ("date", *self.FLOAT_FIELDS, "volume")
+        )
+
+    def __repr__(self) -> str:
+        return f"PriceSeries(bars={len(self)})"
+
+    @classmethod
+    def _validate(cls, value: Any) -> "PriceSeries":
+        if isinstance(value, PriceSeries):
+            return value
+        if isinstance(value, dict):
+            return cls.from_columns(value)
+        if isinstance(value, list):
+            # the old list of StockPrice rows
+            return cls.from_rows(value)
+        raise ValueError(f"Cannot build a price series from {type(value).__name__}")
+
+    @classmethod
+    def __get_pydantic_core_schema__(cls, source: Any, handler: GetCoreSchemaHandler) -> core_schema.CoreSchema:
+        columns_schema = core_schema.typed_dict_schema(
+            {
+                "date": core_schema.typed_dict_field(core_schema.list_schema(core_schema.int_schema())),
+                **{
+                    field: core_schema.typed_dict_field(core_schema.list_schema(core_schema.float_schema()))
+                    for field in cls.FLOAT_FIELDS
+                },
+                "volume": core_schema.typed_dict_field(core_schema.list_schema(core_schema.int_schema())),
+            }
+        )
+        return core_schema.no_info_plain_validator_function(
+            cls._validate,
+            json_schema_input_schema=columns_schema,
+            serialization=core_schema.plain_serializer_function_ser_schema(
+                lambda series: series.to_columns(decimals=4),
+                return_schema=columns_schema,
+            ),
+        )
+
+
 class Financials(BaseModel):
     revenue: float | None = Field(None, description="Total revenue from sales")
     gross_profit: float | None = Field(None, description="Revenue minus cost of goods sold")
@@ -78,6 +286,40 @@ class Financials(BaseModel):
     return_on_assets: float | None = Field(None, description="Net income divided by total assets")
 
 
+class TechnicalIndicators(BaseModel):
+    bars: int = Field(description="Number of price bars the indicators were computed over")
+    last_close: float = Field(description="Latest closing price")
+    return_1d: float | None = Field(None, description="Return over the last bar")
+    return_5d: float | None = Field(None, description="Return over the last 5 bars")
+    return_1mo: float | None = Field(None, description="Return over the last 21 bars")
+    return_3mo: float | None = Field(None, description="Return over the last 63 bars")
+    return_period: float = Field(description="Return over the whole price history")
+    sma_20: float | None = Field(None, description="20 bar simple moving average")
+    sma_50: float | None = Field(None, description="50 bar simple moving average")
+    sma_200: float | None = Field(None, description="200 bar simple moving average")
+    price_vs_sma_20: float | None = Field(None, description="Latest close relative to the 20 bar SMA")
+    price_vs_sma_50: float | None = Field(None, description="Latest close relative to the 50 bar SMA")
+    price_vs_sma_200: float | None = Field(None, description="Latest close relative to the 200 bar SMA")
+    ema_12: float = Field(description="12 bar exponential moving average")
+    ema_26: float = Field(description="26 bar exponential moving average")
+    rsi_14: float | None = Field(None, description="14 bar relative strength index (0 to 100)")
+    macd: float = Field(description="MACD line, EMA 12 minus EMA 26")
+    macd_signal: float = Field(description="9 bar EMA of the MACD line")
+    macd_histogram: float = Field(description="MACD line minus the signal line")
+    atr_14: float | None = Field(None, description="14 bar average true range")
+    atr_14_pct: float | None = Field(None, description="Average true range relative to the latest close")
+    volatility_20d: float | None = Field(None, description="Annualized realized volatility over the last 20 bars")
+    volatility_period: float | None = Field(None, description="Annualized realized volatility over the whole history")
+    max_drawdown: float | None = Field(None, description="Largest peak to trough decline over the whole history")
+    range_high: float = Field(description="Highest price over the last 52 weeks (or the available history)")
+    range_low: float = Field(description="Lowest price over the last 52 weeks (or the available history)")
+    range_position: float | None = Field(None, description="Position of the latest close in the 52 week range")
+    range_bars: int = Field(description="Number of bars the 52 week range covers")
+    volume_zscore: float | None = Field(
+        None, description="Latest volume against the previous 20 bars, in standard deviations"
+    )
+
+
 class News(BaseModel):
     date: datetime = Field(description="Date of the news article")
     headline: str = Field(description="News article headline")
@@ -86,11 +328,19 @@ class News(BaseModel):
     # url: str = Field(description="URL of the news article")
     region: str | None = Field(None, description="Region where the news originated")
     provider: str | None = Field(None, description="Provider of the news")
+    sources: list[str] = Field(
+        default=[], description="Providers of every near duplicate copy of this article. Empty if it has none"
+    )
 
 
 class StockData(BaseModel):
     company: CompanyDetails = Field(description="Company details", repr=False)
     metadata: StockMetadata = Field(description="General information about the stock")
-    prices: list[StockPrice] = Field(description="Historical price data", repr=False)
-    financials: Financials = Field(description="Financial metrics and ratios", repr=False)
+    prices: PriceSeries = Field(description="Historical price data", repr=False)
+    financials: Financials | None = Field(None, description="Financial metrics and ratios", repr=False)
     news: list[News] = Field(description="Related news articles", repr=False)
+
+
+class StockBatch(BaseModel):
+    data: dict[str, StockData] = Field(default={}, description="Stock data per symbol")
+    errors: dict[str, str] = Field(default={}, description="Error per ticker or company name that could not be fetched")
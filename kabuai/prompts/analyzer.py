@@ -2,11 +2,15 @@ from typing import Final
 
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 
+from prompts.layout import prompt_layout
+
 ANALYSIS_PROMPT: Final[str] = """
 You are a professional stock analyst. Your task is to analyze a particular stock with the work of previous agents that have already processed user's query.
 You will be provided with
 - ticker: ticker symbol of the stock.
-- stock_data: latest stock data.
+- stock_data: latest stock data, without the raw price history.
+- price_history: digest of the price history, with statistics, older bars aggregated per week or month and the most recent bars in full.
+- indicators: technical indicators computed from the price history (returns, moving averages, RSI, MACD, ATR, volatility, drawdown, 52 week range and volume), percentages where marked.
 - stock_summary: user oriented generated summary of the data.
 - search_results: latest news fetched from internet containing headline, snippet and sentiment scores.
 - sentiment_score: overall sentiment score for the latest news (between -1.0 and 1.0)
@@ -25,12 +29,28 @@ You can use the tool as many times you want to give the user most updated info.
 Always mention the source in your response if you use the search tool. Only use the provided data or the search results as your source of truth. Your own information might be outdated by now.
 DO Not makeup any news or summary. Only use the factual information given to you or information you got from the search results. Your knowledge might be outdated.
 
+---
+**OUTPUT FOMRAT:**
+
+Here is the detailed analysis on...
+
+Final Analysis Score: <the analysis score>
+---
+
+Final line must be present. Start the report as you like. Write the analysis report in a professional manner.
+
 Here is the data:
 
 Ticker: {ticker}
 
 Stock Data: {stock_data}
 
+Price History:
+{price_history}
+
+Technical Indicators:
+{indicators}
+
 Stock Summary: {stock_summary}
 
 Search Results: {search_results}
@@ -40,16 +60,6 @@ Sentiment Score: {sentiment_score}
 Search Summary: {search_summary}
 
 Analysis Length: **{analysis_length}**
-
----
-**OUTPUT FOMRAT:**
-
-Here is the detailed analysis on...
-
-Final Analysis Score: <the analysis score>
----
-
-Final line must be present. Start the report as you like. Write the analysis report in a professional manner.
 """
 
 analysis_prompt_template: Final[ChatPromptTemplate] = ChatPromptTemplate.from_messages(
@@ -62,3 +72,5 @@ analysis_prompt_template: Final[ChatPromptTemplate] = ChatPromptTemplate.from_me
         ),
     ]
 )
+
+prompt_layout.register("analysis", analysis_prompt_template)
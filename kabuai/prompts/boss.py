@@ -2,6 +2,9 @@ from typing import Final
 
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 
+from constants.agents import MEMBERS, MEMBERS_DESCRIPTIONS
+from prompts.layout import prompt_layout
+
 PROMPT: Final[str] = r"""
 You are a task manager sitting between the user and specialized agents. Your job is to create step-by-step plan to achieve the user's goal.
 You will be given user's request and you need to craft a plan that includes one or more steps involving one or more agents.
@@ -137,9 +140,6 @@ USER INTERACTION GUIDELINES:
 - If Search Agent returns an error: Route to FINISH and Ask user to try again with a more specific question
 - If Analyzer Agent returns an error: Route to FINISH and Ask user if they want to get more details on the stock.
 
-GENERAL INFO:
- - Today's date is {today}
-
 Remember: Your role is to coordinate and manage the conversation flow, not to provide any information directly or make any analysis. Do not make up facts or hallucinate information.
 """.strip()
 
@@ -149,6 +149,13 @@ Never add analysis or make up new information - only acknowledge what was alread
 Do NOT try to complete last agent's response, even if incomplete. Do not repeat sentences or phrases. Do not hallucinate.
 """.strip()
 
+done_prompt_template: Final[ChatPromptTemplate] = ChatPromptTemplate.from_messages(
+    [
+        ("system", DONE_PROMPT),
+        MessagesPlaceholder(variable_name="messages"),
+    ]
+)
+
 supervisor_prompt_template: Final[ChatPromptTemplate] = ChatPromptTemplate.from_messages(
     [
         ("system", PROMPT),
@@ -175,7 +182,16 @@ supervisor_prompt_template: Final[ChatPromptTemplate] = ChatPromptTemplate.from_
                - Include an extracted user request
                - Keep instructions brief and specific
                - Exclude any system context/rules
+
+            Today's date is {today}
             """.strip(),
         ),
     ]
+).partial(
+    # the agents never change while running, so they are part of the static prefix of the prompt
+    members=", ".join(MEMBERS),
+    members_descriptions="\n".join([f"{k} - {v}" for k, v in MEMBERS_DESCRIPTIONS.items()]),
 )
+
+prompt_layout.register("supervisor", supervisor_prompt_template)
+prompt_layout.register("supervisor_done", done_prompt_template)
@@ -0,0 +1,141 @@
+import hashlib
+import logging
+import threading
+from datetime import date
+from typing import Any
+
+from langchain_core.messages import BaseMessage, HumanMessage
+from langchain_core.prompt_values import PromptValue, StringPromptValue
+from langchain_core.prompts import BasePromptTemplate, ChatPromptTemplate
+
+# stands in for every variable when finding the static prefix, nothing in a prompt contains it
+SENTINEL = "\x00"
+
+logger = logging.getLogger(__name__)
+
+
+def today() -> str:
+    """
+    Today's date, quantized to the day so prompts that mention it stay byte stable for the whole day.
+    """
+
+    return date.today().isoformat()
+
+
+def prompt_text(rendered: str | PromptValue | list[BaseMessage]) -> str:
+    """
+    The rendered prompt as the model sees it, string prompts as is,
+    chat prompts one line per message role followed by its content.
+    """
+
+    if isinstance(rendered, str):
+        return rendered
+    if isinstance(rendered, StringPromptValue):
+        return rendered.text
+    messages = rendered.to_messages() if isinstance(rendered, PromptValue) else rendered
+    return "".join(f"{message.type}: {message.content}\n" for message in messages)
+
+
+def static_prefix(template: BasePromptTemplate | str) -> str:
+    """
+    The part of the prompt that is the same on every call, everything before the first variable
+    (or the conversation, for chat templates). Partial variables count as static.
+    """
+
+    if isinstance(template, str):
+        return template
+
+    values: dict[str, Any] = {}
+    for name in template.input_variables:
+        if isinstance(template, ChatPromptTemplate) and name in placeholder_names(template):
+            values[name] = [HumanMessage(SENTINEL)]
+        else:
+            values[name] = SENTINEL
+
+    text = prompt_text(template.invoke(values))
+    return text.split(SENTINEL, 1)[0]
+
+
+def placeholder_names(template: ChatPromptTemplate) -> set[str]:
+    return {
+        message.variable_name
+        for message in template.messages
+        if hasattr(message, "variable_name") and not hasattr(message, "prompt")
+    }
+
+
+class PromptLayout:
+    """
+    Keeps the static prefix of every agent prompt, and checks every render against it.
+    Providers (and Ollama's KV cache) reuse the work done on a prompt prefix they have seen before,
+    so prompts put their static instructions first and everything that changes per call last.
+    The prefix hash is logged once, a changed hash between deployments means the provider cache starts cold.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._prompts: dict[str, dict[str, Any]] = {}
+
+    def register(self, name: str, template: BasePromptTemplate | str) -> str:
+        prefix = static_prefix(template)
+        prefix_hash = hashlib.sha256(prefix.encode()).hexdigest()[:12]
+        with self._lock:
+            self._prompts[name] = {
+                "prefix": prefix,
+                "prefix_hash": prefix_hash,
+                "renders": 0,
+                "prefix_chars": 0,
+                "total_chars": 0,
+                "unstable": 0,
+            }
+        logger.debug(f"Prompt {name} has a {len(prefix)} character static prefix {prefix_hash}")
+        return prefix_hash
+
+    def record(self, name: str, rendered: str | PromptValue | list[BaseMessage]):
+        """
+        Records a rendered prompt, and warns if it does not start with the static prefix of the prompt.
+        """
+
+        text = prompt_text(rendered)
+        with self._lock:
+            entry = self._prompts.get(name)
+            if entry is None:
+                return
+            stable = text.startswith(entry["prefix"])
+            entry["renders"] += 1
+            entry["prefix_chars"] += len(entry["prefix"]) if stable else 0
+            entry["total_chars"] += len(text)
+            entry["unstable"] += not stable
+
+        if not stable:
+            logger.warning(f"Prompt {name} was rendered without its static prefix, the provider can not cache it")
+
+    def render(self, name: str, template: BasePromptTemplate, values: dict[str, Any]) -> PromptValue:
+        rendered = template.invoke(values)
+        self.record(name, rendered)
+        return rendered
+
+    def report(self) -> dict[str, dict[str, Any]]:
+        """
+        Per prompt, the static prefix hash and size, and the share of all rendered characters
+        that were part of a cacheable prefix.
+        """
+
+        with self._lock:
+            return {
+                name: {
+                    "prefix_hash": entry["prefix_hash"],
+                    "prefix_chars": len(entry["prefix"]),
+                    "renders": entry["renders"],
+                    "cacheable_ratio": entry["prefix_chars"] / entry["total_chars"] if entry["total_chars"] else 0.0,
+                    "unstable": entry["unstable"],
+                }
+                for name, entry in self._prompts.items()
+            }
+
+
+prompt_layout = PromptLayout()
+
+
+def prompt_report() -> dict[str, dict[str, Any]]:
+    return prompt_layout.report()
@@ -2,16 +2,22 @@ from typing import Final
 
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder, PromptTemplate
 
+from prompts.layout import prompt_layout
+
 search_prompt: Final[PromptTemplate] = PromptTemplate.from_template("""
 You are an expert user of the internet. You excel at web searches, knowing exactly what to search for any given task or purpose.
-You will be tasked to craft the perfect search query for a user query. You just have to think responsibly on what query will provide the best results.
-You do not have to perform any searches, just generate a useful and effective search query of at most 3 to 5 words and return that. That's it.
+You will be tasked to craft the perfect search queries for a user query. You just have to think responsibly on what queries will provide the best results.
+You do not have to perform any searches, just generate useful and effective search queries of at most 3 to 5 words each and return them. That's it.
+
+For a narrow question, a single query is enough. For a broad question, return up to the maximum number of queries given below, each covering a different angle (e.g. earnings, guidance, lawsuits, sector news).
+Do not return queries that are just rewordings of each other, they will find the same results. All the queries are searched at the same time.
 
 You are a part of a team excelling at assisting the user with stock related help and support.
 If the user wants anything about the company or the stock to be searched, you will be asked to do so.
 
 You are also provided with the stock ticker symbol and stock summary, if any. If provided, try to use this info in crafting the search query if relevant.
 
+Maximum number of queries: {max_queries}
 Ticker Symbol: {ticker} (ignore if None)
 Stock Summary: {stock_summary} (ignore if None)
 """)
@@ -54,3 +60,7 @@ summary_prompt_template: Final[ChatPromptTemplate] = ChatPromptTemplate.from_mes
         ("system", "Given the conversation with the user, summarize the search results to answer user's question."),
     ]
 )
+
+prompt_layout.register("search_queries", search_prompt)
+prompt_layout.register("sentiment", sentiment_prompt)
+prompt_layout.register("search_summary", summary_prompt_template)
@@ -2,11 +2,14 @@ from typing import Final
 
 from langchain_core.prompts import PromptTemplate
 
+from prompts.layout import prompt_layout
+
 fetch_prompt: Final[str] = """
 You are a helpful assistant that can extract stock ticker symbols or company names from user queries.
 Analyze the user's message and extract either a stock ticker symbol (e.g., AAPL, TSLA) or a company name (e.g., Apple, Tesla) that the user is asking about.
 
 - If you identify a ticker symbol or company name, return it exactly as it appears.
+- If the user asks about several stocks (e.g. to compare them), return the first one, and the others in the other stocks list.
 - If the user is not asking about any stock ticker or company, return nothing (an empty string).
 - Do not ask user any follow up questions.
 
@@ -19,6 +22,8 @@ Examples:
   Assistant: TSLA
 - User: What is the market cap of Microsoft?
   Assistant: MSFT
+- User: Compare Nvidia with AMD and Intel
+  Assistant: NVDA, other stocks: AMD, INTC
 - User: How are you?
   Assistant:
 - User How is the weather today?
@@ -40,14 +45,14 @@ Instructions:
   - company details (name, location, socials, employee counts, financial details, officers details)
   - metadata (symbol, company name, sector, industry, market cap, P/E ratio, beta, dividend yield)
   - the most recent stock price (open, high, low, close, volume)
+  - technical indicators (recent returns, trend against moving averages, RSI, volatility, 52 week range)
   - financial metrics (revenue, net income, operating income, ROE, etc.)
   - if news is available, briefly note the few most recent headlines
-- If `{summary_length}` is `"short"`, write 2–3 compact sentences summarizing key company and stock metrics.
+- If data for several stocks is given, summarize each of them briefly and compare them on what the user asks about.
+- If the summary length given below is `"short"`, write 2–3 compact sentences summarizing key company and stock metrics.
 - If `"medium"`, write 5–6 informative sentences including company, price and financial highlights.
 - If `"long"`, write 8–10 or more well-structured sentences, preferably in two paragraphs, covering company, metadata, price data, key financials, and news if available.
 
-Summary length: **{summary_length}**
-
 But remember, if user asks for some piece of details specifically, respond with only that in detail, nothing else.
 Write in a professional, neutral tone — like a market terminal summary or financial briefing.
 
@@ -55,6 +60,17 @@ Do NOT replicate the JSON structure. Do NOT comment on missing data. Only summar
 
 Always mention the source of the data or news. The source is Yahoo Finance.
 
+Summary length: **{summary_length}**
+
 Now generate the summary from the following stock data:
 {data}
+
+Price history digest:
+{prices}
+
+Technical indicators computed from the price history:
+{indicators}
 """)
+
+prompt_layout.register("stock_fetch", fetch_prompt)
+prompt_layout.register("stock_summary", summary_prompt)
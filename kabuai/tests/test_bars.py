@@ -0,0 +1,99 @@
+from datetime import datetime
+from typing import Any
+
+import pandas as pd
+import pytest
+
+import tools.stock
+from models.stock import PriceSeries
+from utils.bars import BarStore
+
+
+def make_history(days: list[str], dividends: dict[str, float] | None = None) -> pd.DataFrame:
+    index = pd.DatetimeIndex(days).tz_localize("America/New_York")
+    closes = [100.0 + i for i in range(len(days))]
+    return pd.DataFrame(
+        {
+            "Open": closes,
+            "High": closes,
+            "Low": closes,
+            "Close": closes,
+            "Volume": [1000] * len(days),
+            "Dividends": [(dividends or {}).get(day, 0.0) for day in days],
+            "Stock Splits": [0.0] * len(days),
+        },
+        index=index,
+    )
+
+
+class FakeTicker:
+    def __init__(self, symbol: str, history: pd.DataFrame):
+        self.ticker = symbol
+        self.full = history
+        self.period_fetches = 0
+
+    def history(self, period: str | None = None, start: datetime | None = None, **kwargs: Any) -> pd.DataFrame:
+        if start is None:
+            self.period_fetches += 1
+            return self.full
+        return self.full[self.full.index >= start]
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch: pytest.MonkeyPatch) -> BarStore:
+    store = BarStore(str(tmp_path / "bars.sqlite3"))
+    monkeypatch.setattr(tools.stock, "bar_store", store)
+    return store
+
+
+def test_upsert_load_round_trip(store: BarStore):
+    series = PriceSeries.from_dataframe(make_history(["2024-06-03", "2024-06-04"]))
+    store.upsert("AAPL", "1d", series, covered_from=0)
+
+    assert store.load("AAPL", "1d").close.tolist() == [100.0, 101.0]
+    coverage = store.coverage("AAPL", "1d")
+    assert coverage is not None
+    assert (coverage.start, coverage.end) == (0, int(series.date[-1]))
+
+
+def test_empty_series_leaves_coverage_alone(store: BarStore):
+    store.upsert("AAPL", "1d", PriceSeries.empty(), covered_from=1_700_000_000)
+    assert store.coverage("AAPL", "1d") is None
+
+    series = PriceSeries.from_dataframe(make_history(["2024-06-03", "2024-06-04"]))
+    store.upsert("AAPL", "1d", series)
+    store.upsert("AAPL", "1d", PriceSeries.empty())
+
+    coverage = store.coverage("AAPL", "1d")
+    assert coverage is not None
+    assert (coverage.start, coverage.end) == (int(series.date[0]), int(series.date[-1]))
+
+
+def test_fetch_prices_keeps_the_store_on_an_empty_delta(store: BarStore):
+    days = [str(day.date()) for day in pd.bdate_range(end=pd.Timestamp.now(), periods=3)]
+    ticker = FakeTicker("AAPL", make_history(days))
+    tools.stock.fetch_prices(ticker, period="1mo")
+    coverage = store.coverage("AAPL", "1d")
+    assert coverage is not None
+
+    ticker.full = ticker.full.iloc[:0]
+    assert tools.stock.fetch_prices(ticker, period="1mo").close.tolist() == [100.0, 101.0, 102.0]
+    assert store.coverage("AAPL", "1d") == coverage
+    assert ticker.period_fetches == 1
+
+
+def test_dividend_on_the_last_stored_bar_does_not_refetch(store: BarStore):
+    ticker = FakeTicker("AAPL", make_history(["2024-06-03", "2024-06-04"], dividends={"2024-06-04": 0.25}))
+    tools.stock.fetch_prices(ticker, period="max")
+    tools.stock.fetch_prices(ticker, period="max")
+
+    assert ticker.period_fetches == 1
+
+
+def test_dividend_on_a_new_bar_refetches(store: BarStore):
+    ticker = FakeTicker("AAPL", make_history(["2024-06-03", "2024-06-04"]))
+    tools.stock.fetch_prices(ticker, period="max")
+
+    ticker.full = make_history(["2024-06-03", "2024-06-04", "2024-06-05"], dividends={"2024-06-05": 0.25})
+    assert tools.stock.fetch_prices(ticker, period="max").close.tolist() == [100.0, 101.0, 102.0]
+    assert ticker.period_fetches == 2
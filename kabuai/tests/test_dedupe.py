@@ -0,0 +1,51 @@
+import pytest
+
+from utils.dedupe import cluster_near_duplicates
+
+DUPLICATES = [
+    (
+        "Apple shares fall after weak iPhone sales in China",
+        "Apple shares fall on weak iPhone sales in China",
+    ),
+    (
+        "Tesla recalls 2 million vehicles over Autopilot safety concerns\n"
+        "The recall covers nearly all Tesla vehicles sold in the US.",
+        "Tesla recalls over 2 million vehicles over Autopilot concerns\n"
+        "The recall covers almost all vehicles Tesla sold in the United States.",
+    ),
+    (
+        "Nvidia beats estimates as AI chip demand soars\n"
+        "Nvidia reported quarterly revenue above Wall Street expectations.",
+        "Nvidia tops estimates as demand for AI chips soars\n"
+        "Nvidia reported quarterly revenue above Wall Street expectations on Wednesday.",
+    ),
+    (
+        "Microsoft to acquire Activision Blizzard for $68.7 billion",
+        "Microsoft to buy Activision Blizzard in $68.7 billion deal",
+    ),
+    ("Apple unveils new iPhone", "APPLE UNVEILS NEW IPHONE!"),
+]
+
+DIFFERENT_STORIES = [
+    ("Apple faces EU antitrust fine over App Store", "Apple stock: buy or sell?"),
+    ("Apple hit with lawsuit over Siri privacy", "Is Apple stock a buy now?"),
+    ("Tesla recalls 2 million vehicles over Autopilot", "Tesla stock rises after delivery numbers beat estimates"),
+    ("Nvidia beats estimates as AI chip demand soars", "Nvidia stock falls as AI chip export curbs tighten"),
+    ("Apple shares fall after weak iPhone sales in China", "Apple shares rise after strong iPhone sales in India"),
+]
+
+
+@pytest.mark.parametrize(("a", "b"), DUPLICATES)
+def test_duplicates_are_clustered(a: str, b: str):
+    assert cluster_near_duplicates([a, b], lambda text: text) == [[a, b]]
+
+
+@pytest.mark.parametrize(("a", "b"), DIFFERENT_STORIES)
+def test_different_stories_are_kept(a: str, b: str):
+    assert cluster_near_duplicates([a, b], lambda text: text) == [[a], [b]]
+
+
+def test_clusters_keep_input_order():
+    items = [DUPLICATES[0][0], DIFFERENT_STORIES[0][0], DUPLICATES[0][1]]
+
+    assert cluster_near_duplicates(items, lambda text: text) == [[items[0], items[2]], [items[1]]]
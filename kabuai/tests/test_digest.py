@@ -0,0 +1,43 @@
+import numpy as np
+import pandas as pd
+
+from models.stock import PriceSeries
+from utils.digest import exchange_timezone, is_intraday, render_digest
+
+
+def make_series(index: pd.DatetimeIndex) -> PriceSeries:
+    close = np.linspace(100, 110, len(index))
+    frame = pd.DataFrame(
+        {"Open": close, "High": close + 1, "Low": close - 1, "Close": close, "Volume": 1000}, index=index
+    )
+    return PriceSeries.from_dataframe(frame)
+
+
+def test_us_daily_bars_are_not_intraday():
+    # yfinance stamps daily bars at midnight New York time, 04:00 or 05:00 UTC
+    prices = make_series(pd.date_range("2024-01-02", periods=300, freq="B", tz="America/New_York"))
+
+    assert not is_intraday(prices)
+    digest = render_digest(prices, 5, "week", tz=exchange_timezone("America/New_York"))
+    assert ":00," not in digest
+    assert "2024-01-02" in digest
+
+
+def test_intraday_bars_print_times():
+    prices = make_series(pd.date_range("2024-01-02 09:30", periods=78, freq="5min", tz="America/New_York"))
+
+    assert is_intraday(prices)
+    assert "2024-01-02 09:30" in render_digest(prices, 5, None, tz=exchange_timezone("America/New_York"))
+
+
+def test_asian_daily_bars_keep_their_exchange_date():
+    # midnight in Tokyo is 15:00 UTC of the previous day
+    prices = make_series(pd.date_range("2024-01-04", periods=20, freq="B", tz="Asia/Tokyo"))
+
+    digest = render_digest(prices, 20, None, tz=exchange_timezone("Asia/Tokyo"))
+    assert "bars: 20 from 2024-01-04" in digest
+    assert "2024-01-03" not in digest
+
+
+def test_unknown_timezone_falls_back_to_utc():
+    assert exchange_timezone("Not/AZone") is exchange_timezone(None)
@@ -0,0 +1,46 @@
+import time
+from types import SimpleNamespace
+
+import pytest
+
+import tools.stock
+from tools.stock import FetchPool, fetch_sections
+
+TICKER = SimpleNamespace(ticker="AAPL")
+
+
+def slow(seconds: float, value: str):
+    def fetch() -> str:
+        time.sleep(seconds)
+        return value
+
+    return fetch
+
+
+@pytest.fixture
+def pool(monkeypatch: pytest.MonkeyPatch) -> FetchPool:
+    pool = FetchPool(1)
+    monkeypatch.setattr(tools.stock, "stock_fetch_pool", pool)
+    return pool
+
+
+def test_timeout_starts_when_the_section_runs(pool: FetchPool, monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr(tools.stock, "SECTION_TIMEOUTS", {"first": 0.5, "second": 0.5})
+
+    results = fetch_sections(TICKER, {"first": slow(0.3, "a"), "second": slow(0.3, "b")})
+
+    assert results == {"first": "a", "second": "b"}
+    assert pool.stats()["abandoned"] == 0
+
+
+def test_timed_out_fetches_are_counted_until_they_finish(pool: FetchPool, monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr(tools.stock, "SECTION_TIMEOUTS", {"slow": 0.1, "queued": 0.1})
+
+    results = fetch_sections(TICKER, {"slow": slow(0.5, "a"), "queued": slow(0, "b")})
+
+    assert results == {"slow": None, "queued": None}
+    stats = pool.stats()
+    assert (stats["abandoned"], stats["abandoned_running"], stats["queue_timeouts"]) == (1, 1, 1)
+
+    time.sleep(0.6)
+    assert pool.stats()["abandoned_running"] == 0
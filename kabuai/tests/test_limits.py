@@ -0,0 +1,96 @@
+import asyncio
+from typing import Any
+from uuid import uuid4
+
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+from ai_models.limits import ModelLimiter
+
+
+class SlowChatModel(BaseChatModel):
+    delay: float = 10
+
+    @property
+    def _llm_type(self) -> str:
+        return "slow"
+
+    def _generate(self, messages: list[BaseMessage], stop: Any = None, **kwargs: Any) -> ChatResult:
+        if self.delay:
+            raise RuntimeError("too slow")
+        return ChatResult(generations=[ChatGeneration(message=AIMessage("done"))])
+
+    async def _agenerate(self, messages: list[BaseMessage], stop: Any = None, **kwargs: Any) -> ChatResult:
+        await asyncio.sleep(self.delay)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage("done"))])
+
+
+def limited_model(max_in_flight: int, delay: float = 10) -> tuple[SlowChatModel, ModelLimiter]:
+    limiter = ModelLimiter("test", 1000, max_in_flight, 1_000_000, check_every_n_seconds=0.01)
+    return SlowChatModel(delay=delay, rate_limiter=limiter, callbacks=[limiter.callback]), limiter
+
+
+def test_cancelled_calls_give_back_their_slots():
+    async def run():
+        model, limiter = limited_model(max_in_flight=2)
+        calls = [asyncio.create_task(model.ainvoke("hi")) for _ in range(4)]
+        await asyncio.sleep(0.2)
+        assert limiter.stats()["in_flight"] == 2
+        assert limiter.stats()["queued"] == 2
+
+        for call in calls:
+            call.cancel()
+        await asyncio.gather(*calls, return_exceptions=True)
+        await asyncio.sleep(0)
+        assert limiter.stats()["in_flight"] == 0
+        assert limiter.stats()["queued"] == 0
+
+        model.delay = 0
+        assert (await asyncio.wait_for(model.ainvoke("hi"), 1)).content == "done"
+        assert limiter.stats()["in_flight"] == 0
+
+    asyncio.run(run())
+
+
+def test_finished_calls_give_back_their_slot_once():
+    async def run():
+        model, limiter = limited_model(max_in_flight=2, delay=0)
+        await asyncio.gather(*(model.ainvoke("hi") for _ in range(5)))
+        await asyncio.sleep(0)
+        assert limiter.stats()["in_flight"] == 0
+        assert limiter.stats()["requests"] == 5
+        assert limiter.stats()["tokens"] > 0
+
+    asyncio.run(run())
+
+
+def test_error_of_a_run_without_a_slot_releases_nothing():
+    async def run():
+        model, limiter = limited_model(max_in_flight=2)
+        call = asyncio.create_task(model.ainvoke("hi"))
+        await asyncio.sleep(0.1)
+
+        limiter.callback.on_llm_error(RuntimeError("failed before it took a slot"), run_id=uuid4())
+        assert limiter.stats()["in_flight"] == 1
+
+        call.cancel()
+        await asyncio.gather(call, return_exceptions=True)
+        await asyncio.sleep(0)
+        assert limiter.stats()["in_flight"] == 0
+
+    asyncio.run(run())
+
+
+def test_sync_calls_give_back_their_slot():
+    model, limiter = limited_model(max_in_flight=1, delay=0)
+    assert model.invoke("hi").content == "done"
+    assert limiter.stats()["in_flight"] == 0
+
+    model.delay = 1
+    for _ in range(2):
+        try:
+            model.invoke("hi")
+        except RuntimeError:
+            pass
+    assert limiter.stats()["in_flight"] == 0
@@ -0,0 +1,24 @@
+from datetime import UTC, datetime
+
+from models.search import SearchResult
+from utils.news_index import NewsIndex
+
+
+def make_result(title: str, link: str) -> SearchResult:
+    return SearchResult(snippet=title, title=title, link=link, date=datetime.now(UTC), source="example.com")
+
+
+def test_document_in_general_and_ticker_partition_is_scored_once():
+    # both match the query once, the shorter one ranks higher when each is scored once
+    short = make_result("iPhone sales slump", "https://example.com/short")
+    long = make_result("iPhone sales slump as buyers wait for cheaper models next year", "https://example.com/long")
+
+    index = NewsIndex()
+    index.ingest([short, long], ticker="AAPL")
+    alone, _ = index.search("iphone", ticker="AAPL")
+
+    index.ingest([long])
+    both, _ = index.search("iphone", ticker="AAPL")
+
+    assert [result.link for result in alone] == [short.link, long.link]
+    assert [result.link for result in both] == [short.link, long.link]
@@ -0,0 +1,60 @@
+from langchain_core.messages import AIMessage, HumanMessage
+
+from graph.boss_state import PlanStep
+from utils.plans import PlanCache, query_template
+
+
+def plan_for(symbol: str, name: str) -> list[PlanStep]:
+    return [
+        PlanStep(
+            agent="stock_agent",
+            request=f"Get the current price of {symbol}",
+            message=f"Fetching the price of {name}",
+            system_instruction=f"Fetch the stock details of {symbol}",
+        )
+    ]
+
+
+def test_query_template_masks_the_stock():
+    assert query_template("What's the price of Apple?").key == "whats price of {stock}"
+    assert query_template("whats the price of $MSFT").key == "whats price of {stock}"
+    assert query_template("What's the weather like?") is None
+
+
+def test_put_get_round_trip_fills_in_the_new_stock():
+    cache = PlanCache()
+    assert cache.put([HumanMessage("What's the price of Tesla?")], plan_for("TSLA", "Tesla"))
+
+    plan = cache.get([HumanMessage("whats the price of Nvidia")])
+    assert plan is not None
+    assert plan[0].request == "Get the current price of NVDA"
+    assert plan[0].message == "Fetching the price of Nvidia"
+    assert plan[0].system_instruction == "Fetch the stock details of NVDA"
+
+
+def test_plan_naming_another_stock_is_not_cached():
+    cache = PlanCache()
+    plan = plan_for("TSLA", "Tesla")
+    plan[0].message += ", and comparing it with Microsoft"
+
+    assert not cache.put([HumanMessage("What's the price of Tesla?")], plan)
+    assert cache.get([HumanMessage("What's the price of Nvidia?")]) is None
+
+
+def test_loaded_stock_is_part_of_the_key():
+    cache = PlanCache()
+    cache.put([HumanMessage("What's the price of Tesla?")], plan_for("TSLA", "Tesla"), loaded_ticker="TSLA")
+
+    assert cache.get([HumanMessage("What's the price of Nvidia?")]) is None
+    assert cache.get([HumanMessage("What's the price of Nvidia?")], loaded_ticker="NVDA") is not None
+
+
+def test_follow_ups_are_not_cached_or_replayed():
+    cache = PlanCache()
+    conversation = [HumanMessage("How is Apple doing?"), AIMessage("Apple is up 2% today.")]
+
+    assert not cache.put([*conversation, HumanMessage("What about Tesla?")], plan_for("TSLA", "Tesla"))
+    assert cache.get([HumanMessage("what about nvidia")]) is None
+
+    cache.put([HumanMessage("What about Tesla?")], plan_for("TSLA", "Tesla"))
+    assert cache.get([*conversation, HumanMessage("what about nvidia")]) is None
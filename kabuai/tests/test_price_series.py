@@ -0,0 +1,38 @@
+import json
+
+import numpy as np
+import pandas as pd
+
+from models.stock import PriceSeries
+
+
+def make_history(rows: dict[str, list[float]]) -> pd.DataFrame:
+    index = pd.date_range("2024-01-02", periods=len(rows["Close"]), freq="B", tz="America/New_York")
+    return pd.DataFrame(rows, index=index)
+
+
+def test_from_dataframe_has_no_nan():
+    history = make_history(
+        {
+            "Open": [10.0, np.nan, 12.0, np.nan],
+            "High": [11.0, np.nan, 13.0, 14.0],
+            "Low": [9.0, np.nan, 11.0, np.nan],
+            "Close": [10.5, np.nan, 12.5, 13.5],
+            "Volume": [100, np.nan, 300, np.nan],
+        }
+    )
+
+    series = PriceSeries.from_dataframe(history)
+
+    assert len(series) == 3
+    assert series.close.tolist() == [10.5, 12.5, 13.5]
+    assert series.open.tolist() == [10.0, 12.0, 13.5]
+    assert series.low.tolist() == [9.0, 11.0, 13.5]
+    assert series.volume.tolist() == [100, 300, 0]
+    assert None not in json.loads(series.to_json())["open"]
+
+
+def test_from_dataframe_all_nan_is_empty():
+    history = make_history({"Open": [np.nan], "High": [np.nan], "Low": [np.nan], "Close": [np.nan], "Volume": [0]})
+
+    assert len(PriceSeries.from_dataframe(history)) == 0
@@ -0,0 +1,29 @@
+import pytest
+
+from utils.search import normalize_query
+
+
+@pytest.mark.parametrize(
+    ("query", "key"),
+    [
+        ("Latest Apple news", "AAPL"),
+        ("AAPL news", "AAPL"),
+        ("$aapl news", "AAPL"),
+        ("Bank of America earnings", "BAC earnings"),
+        ("ServiceNow outlook", "NOW outlook"),
+    ],
+)
+def test_names_and_tickers_map_to_the_symbol(query: str, key: str):
+    assert normalize_query(query) == key
+
+
+def test_plain_words_are_not_tickers():
+    assert normalize_query("is now a good time to buy") == "buy good now time"
+    assert normalize_query("IS NOW A GOOD TIME TO BUY") == "buy good now time"
+    assert normalize_query("is now a good time to buy") != normalize_query("NOW outlook")
+
+
+def test_ticker_that_is_a_stop_word_is_kept():
+    assert normalize_query("ON semiconductor outlook") == "ON outlook semiconductor"
+    assert normalize_query("ON semiconductor outlook") != normalize_query("semiconductor outlook")
+    assert normalize_query("$on news") == "ON"
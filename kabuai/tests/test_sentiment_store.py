@@ -0,0 +1,39 @@
+import time
+from datetime import UTC, datetime
+
+from models.search import SearchResult
+from utils.sentiment import SentimentStore, article_key
+
+
+def make_result(title: str) -> SearchResult:
+    return SearchResult(
+        snippet=f"{title} snippet",
+        title=title,
+        link="https://example.com",
+        date=datetime.now(UTC),
+        source="example.com",
+        sentiment_score=0.5,
+        confidence=0.9,
+    )
+
+
+def test_scores_are_only_served_for_the_same_model(tmp_path):
+    store = SentimentStore(str(tmp_path / "sentiment.sqlite3"))
+    result = make_result("Apple beats estimates")
+    store.put_many([result], model="model-a")
+
+    key = article_key(result)
+    assert store.get_many([key], "model-a")[key].sentiment_score == 0.5
+    assert store.get_many([key], "model-b") == {}
+
+
+def test_scores_expire(tmp_path, monkeypatch):
+    store = SentimentStore(str(tmp_path / "sentiment.sqlite3"), max_age=60)
+    result = make_result("Apple beats estimates")
+    store.put_many([result], model="model-a")
+
+    later = time.time() + 120
+    monkeypatch.setattr(time, "time", lambda: later)
+
+    assert store.get_many([article_key(result)], "model-a") == {}
+    assert len(store) == 1
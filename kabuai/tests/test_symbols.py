@@ -0,0 +1,63 @@
+import pytest
+
+import tools.stock
+from utils.symbols import BUNDLED_LISTING_PATH, SymbolIndex, looks_like_ticker
+
+
+@pytest.fixture(scope="module")
+def index() -> SymbolIndex:
+    return SymbolIndex(str(BUNDLED_LISTING_PATH))
+
+
+@pytest.mark.parametrize(
+    ("term", "symbol"),
+    [("AAPL", "AAPL"), ("$msft", "MSFT"), ("brk.b", "BRK-B"), ("Apple Inc.", "AAPL"), ("intel", "INTC")],
+)
+def test_resolve_exact(index: SymbolIndex, term: str, symbol: str):
+    assert index.resolve(term) == symbol
+
+
+@pytest.mark.parametrize("term", ["AMC", "GME", "INTL", "amc", "$GME"])
+def test_unlisted_ticker_is_not_resolved_to_a_near_miss(index: SymbolIndex, term: str):
+    assert index.resolve(term) is None
+    assert index.suggest(term) is None
+
+
+@pytest.mark.parametrize(("term", "symbol"), [("Teslla", "TSLA"), ("Microsft", "MSFT"), ("nvidi", "NVDA")])
+def test_suggest_misspelled_name(index: SymbolIndex, term: str, symbol: str):
+    assert index.resolve(term) is None
+    assert index.suggest(term) == symbol
+
+
+@pytest.mark.parametrize(
+    ("term", "expected"),
+    [("AMC", True), ("$amc", True), ("RELIANCE.NS", True), ("7203.T", True), ("intl", True), ("Appel", False)],
+)
+def test_looks_like_ticker(term: str, expected: bool):
+    assert looks_like_ticker(term) is expected
+
+
+def test_resolve_stock_prefers_upstream_over_suggestion(monkeypatch: pytest.MonkeyPatch):
+    looked_up: list[str] = []
+
+    def resolve_upstream(term: str):
+        looked_up.append(term)
+        return term
+
+    monkeypatch.setattr(tools.stock, "resolve_upstream", resolve_upstream)
+
+    assert tools.stock.resolve_stock("Appel", "AAPL") == "Appel"
+    assert looked_up == ["Appel"]
+
+
+def test_resolve_stock_falls_back_to_suggestion(monkeypatch: pytest.MonkeyPatch):
+    def resolve_upstream(term: str):
+        if term != "AAPL":
+            raise Exception(f"No stock found with the following query {term}")
+        return term
+
+    monkeypatch.setattr(tools.stock, "resolve_upstream", resolve_upstream)
+
+    assert tools.stock.resolve_stock("Appel", "AAPL") == "AAPL"
+    with pytest.raises(Exception, match="No stock found"):
+        tools.stock.resolve_stock("Appel")
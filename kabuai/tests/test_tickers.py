@@ -0,0 +1,19 @@
+import pytest
+
+from utils.tickers import extract_tickers, name_candidates
+
+
+@pytest.mark.parametrize(
+    ("text", "mention", "symbol"),
+    [
+        ("Is Coca-Cola a good buy?", "Coca-Cola", "KO"),
+        ("how is the S&P 500 doing", "S&P 500", "SPY"),
+        ("is Bank of America a buy", "Bank of America", "BAC"),
+    ],
+)
+def test_name_mention_is_trimmed_of_stop_words(text: str, mention: str, symbol: str):
+    assert [(m.text, m.symbol) for m in name_candidates(text)] == [(mention, symbol)]
+
+
+def test_names_around_a_stop_word_are_separate_mentions():
+    assert [m.symbol for m in extract_tickers("Compare Apple and Microsoft")] == ["AAPL", "MSFT"]
@@ -1,15 +1,46 @@
-import json
+import asyncio
 import logging
-from typing import Literal
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FuturesTimeoutError
+from datetime import UTC, datetime
+from typing import Annotated, Any, Literal
+from urllib.parse import urlsplit
 
-from langchain_community.tools import DuckDuckGoSearchResults
 from langchain_core.tools import tool
+from langgraph.prebuilt import InjectedState
 from pydantic import BaseModel, Field
 
 from models.search import SearchResult
+from utils.cache import TTLCache
+from utils.cassette import cassette
+from utils.dedupe import cluster_near_duplicates
+from utils.http import http_stats, search_clients
+from utils.news_index import news_index
+from utils.search import merge_results, normalize_query
+from utils.symbols import symbol_index
+
+SEARCH_CACHE_SIZE = int(os.getenv("SEARCH_CACHE_SIZE") or 512)
+SEARCH_NEWS_TTL = float(os.getenv("SEARCH_NEWS_TTL") or 10 * 60)
+SEARCH_TEXT_TTL = float(os.getenv("SEARCH_TEXT_TTL") or 6 * 60 * 60)
+SEARCH_NUM_RESULTS = int(os.getenv("SEARCH_NUM_RESULTS") or 5)
+SEARCH_MAX_QUERIES = int(os.getenv("SEARCH_MAX_QUERIES") or 4)
+SEARCH_CONCURRENCY = int(os.getenv("SEARCH_CONCURRENCY") or 4)
+SEARCH_QUERY_TIMEOUT = float(os.getenv("SEARCH_QUERY_TIMEOUT") or 8)
+SEARCH_MAX_RESULTS = int(os.getenv("SEARCH_MAX_RESULTS") or 15)
 
 logger = logging.getLogger(__name__)
 
+# news goes stale quickly, plain text results much slower
+search_cache: dict[str, TTLCache[list[SearchResult]]] = {
+    "news": TTLCache(maxsize=SEARCH_CACHE_SIZE, ttl=SEARCH_NEWS_TTL),
+    "text": TTLCache(maxsize=SEARCH_CACHE_SIZE, ttl=SEARCH_TEXT_TTL),
+}
+
+# multi query searches fan out here, bounded so one request can not hammer duckduckgo
+search_pool = ThreadPoolExecutor(max_workers=SEARCH_CONCURRENCY, thread_name_prefix="search")
+
 
 class SearchWebInput(BaseModel):
     query: str = Field(description="The query to search for. Small but to the point and specific")
@@ -33,18 +64,198 @@ def search_web(query: str, what: Literal["news", "text"] = "news") -> list[Searc
     logger.warning("Changing what to news even if text was passed, since text output is... uh..")
     what = "news"
 
-    search = DuckDuckGoSearchResults(output_format="json", backend=what, num_results=5)
-    results = search.invoke(query)
+    return cached_search(query, what)
 
-    try:
-        results = [SearchResult(**x) for x in json.loads(results)]
+
+class SearchRecentNewsInput(SearchWebInput):
+    state: Annotated[dict, InjectedState]
+
+
+@tool("search_web", args_schema=SearchRecentNewsInput)
+def search_recent_news(query: str, state: dict, what: Literal["news", "text"] = "news") -> list[SearchResult]:
+    """
+    Searches the latest news for the given query.
+    Args:
+        query (str): The search query.
+        what (Literal["news", "text"], optional): The type of content to search for. Defaults to "news".
+
+    Returns:
+        list[SearchResult]: A list of search results.
+    """
+
+    # answered from the news already fetched for the stock when that covers the query,
+    # the model sees the same tool as search_web either way
+    stock_data = state.get("stock_data")
+    ticker = stock_data.metadata.symbol if stock_data else state.get("ticker")
+    if ticker and not symbol_index.is_symbol(ticker):
+        ticker = symbol_index.resolve(ticker) or ticker
+
+    if (results := news_index.answer(query, ticker)) is not None:
+        logger.debug(f"Answered {query!r} for {ticker} from the local news index")
         return results
+
+    results = cached_search(query, "news")
+    news_index.ingest(results, ticker=ticker)
+    return results
+
+
+def cached_search(query: str, what: Literal["news", "text"] = "news") -> list[SearchResult]:
+    """
+    Runs the search through the search cache, keyed by the normalized query.
+    Failed searches are not cached.
+    """
+
+    key = normalize_query(query)
+    cache = search_cache[what]
+    if (results := cache.get(key)) is not None:
+        logger.debug(f"Search cache hit for {query!r} ({what}) as {key!r}")
+        return list(results)
+
+    try:
+        response = cassette.call(f"search_{what}", key, lambda: duckduckgo_search(query, what))
+        results = collapse_duplicates(merge_results(response))
     except Exception as e:
         logger.error(f"Failed to call the search_web tool: {e}")
         return []
 
+    cache.set(key, results)
+    # tickers and company names in the query are upper case symbols in the key
+    symbols = [term for term in key.split() if term.isupper() and symbol_index.is_symbol(term)]
+    for symbol in symbols or [None]:
+        news_index.ingest(results, ticker=symbol)
+    logger.debug(f"Search cache miss for {query!r} ({what}) as {key!r}, got {len(results)} results")
+    return results
+
+
+def duckduckgo_search(query: str, what: Literal["news", "text"]) -> list[SearchResult]:
+    """
+    Searches Duck Duck Go with a client from the shared pool.
+    """
+
+    with search_clients.client() as ddgs:
+        if what == "news":
+            return [
+                SearchResult(snippet=r["body"], title=r["title"], link=r["url"], date=r["date"], source=r["source"])
+                for r in ddgs.news(query, max_results=SEARCH_NUM_RESULTS)
+            ]
+
+        # text results carry no date or source, they count as fetched now from their site
+        return [
+            SearchResult(
+                snippet=r["body"],
+                title=r["title"],
+                link=r["href"],
+                date=datetime.now(UTC),
+                source=urlsplit(r["href"]).netloc,
+            )
+            for r in ddgs.text(query, max_results=SEARCH_NUM_RESULTS)
+        ]
+
+
+def unique_queries(queries: list[str]) -> list[str]:
+    """
+    The non blank queries, without the ones that normalize to the same key as an earlier one.
+    """
+
+    by_key: dict[str, str] = {}
+    for query in queries:
+        if query.strip():
+            by_key.setdefault(normalize_query(query), query)
+    return list(by_key.values())
+
+
+def search_many(queries: list[str], what: Literal["news", "text"] = "news") -> list[SearchResult]:
+    """
+    Runs several queries concurrently and merges their results into one deduplicated list,
+    interleaved by rank so every query contributes its best results first.
+    Queries that normalize to the same key run once. A query that fails or times out contributes nothing.
+    """
+
+    unique = unique_queries(queries)
+
+    started = time.monotonic()
+    futures = [(query, search_pool.submit(cached_search, query, what)) for query in unique]
+
+    result_lists: list[list[SearchResult]] = []
+    for query, future in futures:
+        remaining = started + SEARCH_QUERY_TIMEOUT - time.monotonic()
+        try:
+            result_lists.append(future.result(timeout=max(remaining, 0)))
+        except FuturesTimeoutError:
+            future.cancel()
+            logger.warning(f"Timed out searching for {query!r}")
+        except Exception as e:
+            logger.error(f"Failed to search for {query!r}. Error: {e}")
+
+    results = collapse_duplicates(merge_results(*result_lists))[:SEARCH_MAX_RESULTS]
+    logger.debug(f"Searched {len(unique)} queries in {time.monotonic() - started:.2f}s, got {len(results)} results")
+    return results
+
+
+async def asearch_many(queries: list[str], what: Literal["news", "text"] = "news") -> list[SearchResult]:
+    """
+    Async `search_many`. The searches still run on the search pool, the event loop only awaits them.
+    """
+
+    unique = unique_queries(queries)
+    if not unique:
+        return []
+
+    loop = asyncio.get_running_loop()
+    started = time.monotonic()
+    futures = [(query, loop.run_in_executor(search_pool, cached_search, query, what)) for query in unique]
+    await asyncio.wait([future for _, future in futures], timeout=SEARCH_QUERY_TIMEOUT)
+
+    result_lists: list[list[SearchResult]] = []
+    for query, future in futures:
+        if not future.done():
+            future.cancel()
+            logger.warning(f"Timed out searching for {query!r}")
+        elif future.exception() is not None:
+            logger.error(f"Failed to search for {query!r}. Error: {future.exception()}")
+        else:
+            result_lists.append(future.result())
+
+    # clustering near duplicates compares every pair of results, kept off the event loop
+    results = (await asyncio.to_thread(collapse_duplicates, merge_results(*result_lists)))[:SEARCH_MAX_RESULTS]
+    logger.debug(f"Searched {len(unique)} queries in {time.monotonic() - started:.2f}s, got {len(results)} results")
+    return results
+
+
+def collapse_duplicates(results: list[SearchResult]) -> list[SearchResult]:
+    """
+    Collapses near duplicate results (the same story from several outlets) into their best ranked copy,
+    which lists the sources of every copy.
+    """
+
+    collapsed = []
+    for cluster in cluster_near_duplicates(results, lambda result: f"{result.title}\n{result.snippet}"):
+        representative = cluster[0]
+        if len(cluster) > 1:
+            sources = list(dict.fromkeys(source for result in cluster for source in result.sources or [result.source]))
+            representative = representative.model_copy(update={"sources": sources})
+        collapsed.append(representative)
+
+    if len(collapsed) < len(results):
+        logger.debug(f"Collapsed {len(results)} search results into {len(collapsed)} stories")
+    return collapsed
+
+
+def search_cache_stats() -> dict[str, dict[str, Any]]:
+    """
+    Returns the hit/miss counters of the news and text search caches, the local news index
+    and the search client pool.
+    """
+
+    return {what: cache.stats() for what, cache in search_cache.items()} | {
+        "index": news_index.stats(),
+        "clients": http_stats()["search"],
+    }
+
 
 if __name__ == "__main__":
-    query = input("Query> ").strip()
-    results = search_web(query)
-    print(results)
+    while True:
+        query = input("Query> ").strip()
+        results = search_web.invoke({"query": query, "what": "news"})
+        print(results)
+        print(search_cache_stats())
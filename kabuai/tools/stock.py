@@ -1,61 +1,222 @@
 import logging
-from datetime import datetime
-from typing import NamedTuple, cast
+import os
+import threading
+import time
+from collections.abc import Callable
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FuturesTimeoutError
+from datetime import UTC, datetime
+from typing import TYPE_CHECKING, Any, Literal, cast
 
-import yfinance as yf
 from curl_cffi.requests.exceptions import HTTPError
 from langchain_core.tools import tool
-from pandas import Timestamp
 from pydantic import BaseModel, Field
 
-from models.stock import CompanyDetails, CompanyOfficer, Financials, News, StockData, StockMetadata, StockPrice
+from models.search import SearchResult
+from models.stock import (
+    CompanyDetails,
+    CompanyOfficer,
+    Financials,
+    News,
+    PriceSeries,
+    StockBatch,
+    StockData,
+    StockMetadata,
+)
+from utils.bars import Coverage, bar_store, period_start
+from utils.cache import TTLCache
+from utils.cassette import cassette
+from utils.dedupe import cluster_near_duplicates
+from utils.http import yahoo_session
+from utils.news_index import news_index
+from utils.symbols import symbol_index
+
+if TYPE_CHECKING:
+    # yfinance and pandas take most of the import time of the backend, they are imported on the first fetch
+    import yfinance as yf
+    from pandas import DataFrame
+
+STOCK_CACHE_SIZE = int(os.getenv("STOCK_CACHE_SIZE") or 256)
+STOCK_PROFILE_TTL = float(os.getenv("STOCK_PROFILE_TTL") or 3 * 24 * 60 * 60)
+STOCK_PRICES_TTL = float(os.getenv("STOCK_PRICES_TTL") or 5 * 60)
+STOCK_NEWS_TTL = float(os.getenv("STOCK_NEWS_TTL") or 15 * 60)
+
+STOCK_HISTORY_PERIOD = os.getenv("STOCK_HISTORY_PERIOD") or "6mo"
+STOCK_HISTORY_INTERVAL = os.getenv("STOCK_HISTORY_INTERVAL") or "1d"
+
+STOCK_FETCH_WORKERS = int(os.getenv("STOCK_FETCH_WORKERS") or 16)
+STOCK_BATCH_CONCURRENCY = int(os.getenv("STOCK_BATCH_CONCURRENCY") or 4)
+STOCK_SECTION_TIMEOUT = float(os.getenv("STOCK_SECTION_TIMEOUT") or 10)
+SECTION_TIMEOUTS: dict[str, float] = {
+    "info": float(os.getenv("STOCK_INFO_TIMEOUT") or STOCK_SECTION_TIMEOUT),
+    "history": float(os.getenv("STOCK_HISTORY_TIMEOUT") or STOCK_SECTION_TIMEOUT),
+    "income_stmt": float(os.getenv("STOCK_FINANCIALS_TIMEOUT") or STOCK_SECTION_TIMEOUT),
+    "balance_sheet": float(os.getenv("STOCK_FINANCIALS_TIMEOUT") or STOCK_SECTION_TIMEOUT),
+    "news": float(os.getenv("STOCK_NEWS_TIMEOUT") or STOCK_SECTION_TIMEOUT / 2),
+}
+
+QUARTER_SECONDS = 91 * 24 * 60 * 60
+FINANCIALS_RECHECK_TTL = 6 * 60 * 60
+FINANCIALS_MAX_TTL = 30 * 24 * 60 * 60
 
 logger = logging.getLogger(__name__)
 
+# every section has its own freshness policy, all keyed by the resolved symbol
+stock_cache: dict[str, TTLCache[Any]] = {
+    "profile": TTLCache(maxsize=STOCK_CACHE_SIZE, ttl=STOCK_PROFILE_TTL),
+    "prices": TTLCache(maxsize=STOCK_CACHE_SIZE, ttl=STOCK_PRICES_TTL),
+    "financials": TTLCache(maxsize=STOCK_CACHE_SIZE, ttl=FINANCIALS_MAX_TTL),
+    "news": TTLCache(maxsize=STOCK_CACHE_SIZE, ttl=STOCK_NEWS_TTL),
+}
+# user input (ticker or company name) -> resolved symbol
+symbol_cache: TTLCache[str] = TTLCache(maxsize=STOCK_CACHE_SIZE * 4, ttl=STOCK_PROFILE_TTL)
+
+
+class SectionFetch:
+    """
+    A section fetch on the `FetchPool`, with the time it started running.
+    """
+
+    def __init__(self):
+        self.started = threading.Event()
+        self.started_at = 0.0
+        self.abandoned = False
+        self.finished = False
+        self.future: Future = Future()
+
+
+class FetchPool:
+    """
+    Bounded pool for the section fetches.
+    A fetch its caller stopped waiting for keeps its worker until Yahoo answers, cancelling only works while
+    it is queued. These are counted, a pool taken up by them is what makes later fetches time out in the queue.
+    """
+
+    def __init__(self, max_workers: int):
+        self.max_workers = max_workers
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="stock-fetch")
+        self._lock = threading.Lock()
+        self.submitted = 0
+        self.queue_timeouts = 0
+        self.abandoned = 0
+        self.abandoned_running = 0
+        self.peak_abandoned_running = 0
+
+    def submit(self, fetch: Callable[[], Any]) -> SectionFetch:
+        section = SectionFetch()
+
+        def run() -> Any:
+            section.started_at = time.monotonic()
+            section.started.set()
+            try:
+                return fetch()
+            finally:
+                with self._lock:
+                    section.finished = True
+                    if section.abandoned:
+                        self.abandoned_running -= 1
+
+        with self._lock:
+            self.submitted += 1
+        section.future = self._pool.submit(run)
+        return section
+
+    def cancel(self, section: SectionFetch) -> bool:
+        """
+        Cancels a fetch that has not started, returns False if it has.
+        """
+
+        if not section.future.cancel():
+            return False
+        with self._lock:
+            self.queue_timeouts += 1
+        return True
+
+    def abandon(self, section: SectionFetch) -> int:
+        """
+        Records that the caller stopped waiting for a running fetch, returns how many of those are still running.
+        """
+
+        with self._lock:
+            if not section.finished and not section.abandoned:
+                section.abandoned = True
+                self.abandoned += 1
+                self.abandoned_running += 1
+                self.peak_abandoned_running = max(self.peak_abandoned_running, self.abandoned_running)
+            return self.abandoned_running
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                "workers": self.max_workers,
+                "submitted": self.submitted,
+                "queue_timeouts": self.queue_timeouts,
+                "abandoned": self.abandoned,
+                "abandoned_running": self.abandoned_running,
+                "peak_abandoned_running": self.peak_abandoned_running,
+            }
+
+
+# bounded pool shared by all tool calls, so concurrent users can not open unbounded connections
+stock_fetch_pool = FetchPool(STOCK_FETCH_WORKERS)
+# batch fetches fan out per ticker here, each of them then fetches its sections on the pool above
+stock_batch_pool = ThreadPoolExecutor(max_workers=STOCK_BATCH_CONCURRENCY, thread_name_prefix="stock-batch")
 
-class HistoryRow(NamedTuple):
-    Index: Timestamp
-    Open: float
-    High: float
-    Low: float
-    Close: float
-    Volume: int
-    Dividends: float
-    Stock_Splits: float
 
+def search_stock(query: str) -> "yf.Ticker":
+    import yfinance as yf
 
-def search_stock(query: str) -> yf.Ticker:
     logger.debug(f"Search Stock called with query: {query}")
-    results = yf.Search(query)
-    if not results.quotes:
+    quotes = cassette.call("search", query, lambda: yf.Search(query, session=yahoo_session).quotes)
+    if not quotes:
         raise Exception(f"No stock found with the following query {query}")
-    data = yf.Ticker(results.quotes[0]["symbol"])
+    data = yf.Ticker(quotes[0]["symbol"], session=yahoo_session)
     return data
 
 
+def ticker_info(data: "yf.Ticker") -> dict:
+    """
+    Fetches the info of the ticker, the company profile and ratios.
+    """
+
+    return cassette.call("info", data.ticker, lambda: data.info)
+
+
 class FetchStockDetailsInput(BaseModel):
     ticker_or_name: str = Field(description="The ticker symbol of the stock or  name of the company")
 
 
-@tool("fetch_stock_details", args_schema=FetchStockDetailsInput)
-def fetch_stock_details(ticker_or_name: str) -> StockData | str:
+def resolve_stock(ticker_or_name: str, suggestion: str | None = None) -> "yf.Ticker":
     """
-    Fetches stock details for a given ticker symbol.
+    Resolves the given ticker or company name into a yfinance Ticker.
     If the given symbol is not a valid symbol, searches for the term and uses the first result.
-    Do not pass None or no Value
+    `suggestion` is the symbol index's guess for a misspelled name, only tried when nothing is found for the term.
+    """
 
-    Args:
-        ticker_or_name (str): The ticker symbol of the stock or name of the company.
+    try:
+        return resolve_upstream(ticker_or_name)
+    except Exception:
+        if not suggestion or suggestion == ticker_or_name:
+            raise
 
-    Returns:
-        StockData | str: An object containing the stock details or an error message.
-    """
+    logger.info(f"Nothing found for {ticker_or_name!r}, trying the suggested symbol {suggestion}")
+    return resolve_upstream(suggestion)
 
-    logger.debug(f"Fetch stock details tool used {ticker_or_name}")
+
+def resolve_upstream(ticker_or_name: str) -> "yf.Ticker":
+    import yfinance as yf
+
+    if " " in ticker_or_name.strip():
+        # can not be a ticker, skip the 404 round trip and search right away
+        try:
+            return search_stock(query=ticker_or_name)
+        except Exception as e:
+            logger.error(f"Failed to fetch stock details. Error: {e}")
+            raise
 
     try:
-        data = yf.Ticker(ticker_or_name)
-        _ = data.info
+        data = yf.Ticker(ticker_or_name, session=yahoo_session)
+        _ = ticker_info(data)
     except HTTPError as e:
         if "404" not in str(e):
             raise
@@ -69,8 +230,14 @@ def fetch_stock_details(ticker_or_name: str) -> StockData | str:
         logger.error(f"Failed to fetch stock details. Error: {e}")
         raise
 
-    # --- Metadata ---
-    info: dict[str, str] = data.info
+    return data
+
+
+def build_profile(info: dict) -> tuple[CompanyDetails, StockMetadata]:
+    """
+    Builds the company details and stock metadata from the ticker info.
+    """
+
     officers: list[CompanyOfficer] = []
 
     for officer in cast(list[dict], info.get("companyOfficers", [])):
@@ -125,61 +292,429 @@ def fetch_stock_details(ticker_or_name: str) -> StockData | str:
         pe_ratio=float(info.get("trailingPE", 0)) or None,
         dividend_yield=float(info.get("dividendYield", 0)) * 100,
         beta=float(info.get("beta", 0)),
+        exchange_timezone=info.get("exchangeTimezoneName"),
     )
 
-    # --- Price History ---
-    hist = data.history(period="6mo")
-    prices = [
-        StockPrice(
-            date=cast(Timestamp, index).to_pydatetime(),
-            open=cast(float, row.get("Open", 0)),
-            high=cast(float, row.get("High", 0)),
-            low=cast(float, row.get("Low", 0)),
-            close=cast(float, row.get("Close", 0)),
-            adjusted_close=cast(float, row.get("Adj Close", row.get("Close", 0))),
-            volume=cast(int, row.get("Volume", 0)),
-        )
-        for index, row in hist.iterrows()
-    ]
+    return company_details, metadata
 
-    # --- Financials ---
-    income = data.income_stmt
-    balance = data.balance_sheet
-    financials = Financials(
-        revenue=income.loc["Total Revenue"].dropna().iloc[0] if "Total Revenue" in income else None,
-        gross_profit=income.loc["Gross Profit"].dropna().iloc[0] if "Gross Profit" in income else None,
-        operating_income=income.loc["Operating Income"].dropna().iloc[0] if "Operating Income" in income else None,
-        net_income=income.loc["Net Income"].dropna().iloc[0] if "Net Income" in income else None,
-        total_assets=balance.loc["Total Assets"].dropna().iloc[0] if "Total Assets" in balance else None,
-        total_liabilities=balance.loc["Total Liab"].dropna().iloc[0] if "Total Liab" in balance else None,
-        shareholders_equity=balance.loc["Total Stockholder Equity"].dropna().iloc[0]
-        if "Total Stockholder Equity" in balance
-        else None,
+
+def fetch_prices(
+    data: "yf.Ticker",
+    period: str = STOCK_HISTORY_PERIOD,
+    interval: str = STOCK_HISTORY_INTERVAL,
+) -> PriceSeries:
+    """
+    Fetches the price history of the ticker through the on-disk bar store.
+    Only the bars after the last stored one are fetched when the store already covers the period.
+    """
+
+    symbol = cast(str, data.ticker)
+    start = period_start(period)
+    coverage = bar_store.coverage(symbol, interval)
+
+    if coverage and coverage.start <= start:
+        # the last stored bar may have been a partial one, fetch it again
+        last_stored = datetime.fromtimestamp(coverage.end, tz=UTC)
+        delta = data.history(start=last_stored, interval=interval)
+        corporate_actions = [col for col in ("Dividends", "Stock Splits") if col in delta]
+        if delta.empty:
+            # a holiday, a halted symbol or a failed request, the stored bars are all there is
+            logger.debug(f"No new {interval} bars for {symbol}")
+        # an action on the last stored bar was already in the history it was stored with
+        elif delta.loc[delta.index > last_stored, corporate_actions].to_numpy().any():
+            # adjusted prices before the action have changed, the stored bars are stale
+            logger.debug(f"Corporate action for {symbol}, refetching {period} of {interval} bars")
+            hist = data.history(period=period, interval=interval)
+            bar_store.drop(symbol, interval)
+            bar_store.upsert(symbol, interval, PriceSeries.from_dataframe(hist), start)
+        else:
+            logger.debug(f"Fetched {len(delta)} new {interval} bars for {symbol}")
+            bar_store.upsert(symbol, interval, PriceSeries.from_dataframe(delta))
+    else:
+        hist = data.history(period=period, interval=interval)
+        bar_store.upsert(symbol, interval, PriceSeries.from_dataframe(hist), start)
+
+    return bar_store.load(symbol, interval, start)
+
+
+def fetch_statement(data: "yf.Ticker", statement: Literal["income_stmt", "balance_sheet"]) -> "DataFrame":
+    """
+    Fetches a single financial statement of the ticker.
+    """
+
+    return cassette.call(statement, data.ticker, lambda: getattr(data, statement))
+
+
+def latest_value(statement: "DataFrame", row: str) -> float | None:
+    """
+    The latest reported value of a statement row, None if the row is missing or has no values.
+    """
+
+    if row not in statement.index:
+        return None
+
+    values = statement.loc[row].dropna()
+    return float(values.iloc[0]) if not values.empty else None
+
+
+def build_financials(income: "DataFrame | None", balance: "DataFrame | None", info: dict) -> Financials:
+    """
+    Builds the financials from the income statement, balance sheet and the ratios in ticker info.
+    A missing statement leaves its fields empty.
+    """
+
+    from pandas import DataFrame
+
+    income = income if income is not None else DataFrame()
+    balance = balance if balance is not None else DataFrame()
+    return Financials(
+        revenue=latest_value(income, "Total Revenue"),
+        gross_profit=latest_value(income, "Gross Profit"),
+        operating_income=latest_value(income, "Operating Income"),
+        net_income=latest_value(income, "Net Income"),
+        total_assets=latest_value(balance, "Total Assets"),
+        total_liabilities=latest_value(balance, "Total Liab"),
+        shareholders_equity=latest_value(balance, "Total Stockholder Equity"),
         current_ratio=float(info.get("currentRatio", 0)),
         quick_ratio=float(info.get("quickRatio", 0)),
         return_on_equity=float(info.get("returnOnEquity", 0)),
         return_on_assets=float(info.get("returnOnAssets", 0)),
     )
 
-    # --- News ---
-    news = [
-        News(
-            date=datetime.fromisoformat(n.get("content", {}).get("pubDate", "")),
-            headline=n.get("content", {}).get("title", ""),
-            # summary=n.get("content", {}).get("summary", ""),
-            content_type=n.get("content", {}).get("contentType", ""),
-            # url=n.get("content", {}).get("canonicalUrl", {}).get("url", ""),
-            region=n.get("content", {}).get("canonicalUrl", {}).get("region", ""),
-            provider=n.get("content", {}).get("provider", {}).get("displayName", ""),
+
+def fetch_news(data: "yf.Ticker") -> list[News]:
+    """
+    Fetches the latest news of the ticker.
+    Near duplicate articles are collapsed into the first copy, listing the providers of all copies.
+    """
+
+    articles = [n.get("content", {}) for n in cassette.call("news", data.ticker, lambda: data.news)]
+    clusters = cluster_near_duplicates(articles, lambda a: f"{a.get('title', '')}\n{a.get('summary', '')}")
+
+    # every article goes into the local index, so the analyzer can search them without a network call
+    news_index.ingest(
+        [
+            SearchResult(
+                title=a.get("title", ""),
+                snippet=a.get("summary", ""),
+                link=(a.get("canonicalUrl") or {}).get("url", ""),
+                date=datetime.fromisoformat(a.get("pubDate", "")),
+                source=(a.get("provider") or {}).get("displayName", ""),
+            )
+            for cluster in clusters
+            for a in cluster[:1]
+            if a.get("title") and a.get("pubDate")
+        ],
+        ticker=data.ticker,
+    )
+
+    news = []
+    for cluster in clusters[:5]:
+        n = cluster[0]
+        providers = [a.get("provider", {}).get("displayName", "") for a in cluster]
+        news.append(
+            News(
+                date=datetime.fromisoformat(n.get("pubDate", "")),
+                headline=n.get("title", ""),
+                # summary=n.get("summary", ""),
+                content_type=n.get("contentType", ""),
+                # url=n.get("canonicalUrl", {}).get("url", ""),
+                region=n.get("canonicalUrl", {}).get("region", ""),
+                provider=n.get("provider", {}).get("displayName", ""),
+                sources=list(dict.fromkeys(p for p in providers if p)) if len(cluster) > 1 else [],
+            )
+        )
+
+    return news
+
+
+def financials_expiry(company: CompanyDetails) -> float:
+    """
+    Financial statements only change once a new quarter is reported.
+    Keeps them until the end of the quarter following `mostRecentQuarter`, then rechecks periodically
+    while the new statements are not out yet.
+    """
+
+    now = time.time()
+    next_quarter = (company.mostRecentQuarter or 0) + QUARTER_SECONDS
+    if next_quarter <= now:
+        return now + FINANCIALS_RECHECK_TTL
+
+    return min(next_quarter, now + FINANCIALS_MAX_TTL)
+
+
+def stock_cache_stats() -> dict[str, dict]:
+    """
+    Returns the hit/miss counters of every section of the stock cache, and the Yahoo session counters.
+    """
+
+    return (
+        {"symbols": symbol_cache.stats()}
+        | {section: cache.stats() for section, cache in stock_cache.items()}
+        | {"http": yahoo_session.stats(), "fetch_pool": stock_fetch_pool.stats()}
+    )
+
+
+def fetch_sections(data: "yf.Ticker", sections: dict[str, Callable[[], Any]]) -> dict[str, Any]:
+    """
+    Runs the independent section fetches concurrently on the shared pool.
+    The timeout of a section starts when it starts running, it gets as long again to wait for a worker.
+    A section that fails or does not finish within its timeout comes back as None.
+    """
+
+    started = time.monotonic()
+    fetches = {name: stock_fetch_pool.submit(fetch) for name, fetch in sections.items()}
+
+    results: dict[str, Any] = {}
+    for name, section in fetches.items():
+        timeout = SECTION_TIMEOUTS.get(name, STOCK_SECTION_TIMEOUT)
+        if not section.started.wait(max(started + timeout - time.monotonic(), 0)):
+            if stock_fetch_pool.cancel(section):
+                logger.warning(f"Timed out waiting for a worker to fetch {name} for {data.ticker}")
+                results[name] = None
+                continue
+            # it got a worker just now
+            section.started.wait()
+
+        try:
+            results[name] = section.future.result(timeout=max(section.started_at + timeout - time.monotonic(), 0))
+        except FuturesTimeoutError:
+            running = stock_fetch_pool.abandon(section)
+            logger.warning(
+                f"Timed out fetching {name} for {data.ticker}, "
+                f"{running} timed out fetches still hold a worker of {stock_fetch_pool.max_workers}"
+            )
+            results[name] = None
+        except Exception as e:
+            logger.error(f"Failed to fetch {name} for {data.ticker}. Error: {e}")
+            results[name] = None
+
+    logger.debug(f"Fetched sections {list(sections)} for {data.ticker} in {time.monotonic() - started:.2f}s")
+    return results
+
+
+def lookup_symbol(ticker_or_name: str) -> str | None:
+    """
+    Resolves the ticker or company name without going upstream, if we have seen it before or it is in the index.
+    """
+
+    return symbol_cache.get(ticker_or_name.strip().upper()) or symbol_index.resolve(ticker_or_name)
+
+
+def get_stock_data(ticker_or_name: str) -> StockData:
+    """
+    Fetches the stock details for a ticker or company name, serving each section from the cache when fresh.
+    """
+
+    import yfinance as yf
+
+    # sections are cached by the resolved symbol, so first see if we have resolved this input before
+    symbol = lookup_symbol(ticker_or_name)
+    if symbol:
+        data = yf.Ticker(symbol, session=yahoo_session)
+    else:
+        # a fuzzy match in the index is only a suggestion, what Yahoo finds for the input comes first
+        data = resolve_stock(ticker_or_name, symbol_index.suggest(ticker_or_name))
+        resolved = ticker_info(data)
+        symbol = cast(str, resolved["symbol"])
+        symbol_index.add(
+            symbol,
+            name=resolved.get("longName") or resolved.get("shortName", ""),
+            aliases=[ticker_or_name],
         )
-        for n in data.news[:5]
-    ]
+
+    symbol_cache.set(ticker_or_name.strip().upper(), symbol)
+    symbol_cache.set(symbol.upper(), symbol)
+
+    info: dict | None = stock_cache["profile"].get(symbol)
+    prices: PriceSeries | None = stock_cache["prices"].get(symbol)
+    statements: "tuple[DataFrame | None, DataFrame | None] | None" = stock_cache["financials"].get(symbol)
+    news: list[News] | None = stock_cache["news"].get(symbol)
+    profile_cached = info is not None
+
+    # only go upstream for the sections we do not have fresh
+    sections: dict[str, Callable[[], Any]] = {}
+    if info is None:
+        sections["info"] = lambda: ticker_info(data)
+    if prices is None:
+        # recorded after the bar store, whose contents differ between machines and runs
+        sections["history"] = lambda: cassette.call(
+            "history", (symbol, STOCK_HISTORY_PERIOD, STOCK_HISTORY_INTERVAL), lambda: fetch_prices(data)
+        )
+    if statements is None:
+        sections["income_stmt"] = lambda: fetch_statement(data, "income_stmt")
+        sections["balance_sheet"] = lambda: fetch_statement(data, "balance_sheet")
+    if news is None:
+        sections["news"] = lambda: fetch_news(data)
+
+    results = fetch_sections(data, sections)
+
+    # --- Metadata ---
+    if info is None:
+        info = results["info"]
+        if not info or "symbol" not in info:
+            raise Exception(f"Unable to fetch the company profile for {symbol}")
+        stock_cache["profile"].set(symbol, info)
+
+    company_details, metadata = build_profile(info)
+
+    # --- Price History ---
+    if prices is None:
+        prices = results["history"]
+        if prices is not None:
+            stock_cache["prices"].set(symbol, prices)
+
+    if profile_cached and prices:
+        # the profile is days old, but the price must not be
+        company_details = company_details.model_copy(update={"currentPrice": prices[-1].close})
+
+    # --- Financials ---
+    if statements is None:
+        statements = (results["income_stmt"], results["balance_sheet"])
+        if all(statement is not None for statement in statements):
+            stock_cache["financials"].set(symbol, statements, expires_at=financials_expiry(company_details))
+
+    income, balance = statements
+    financials = build_financials(income, balance, info) if income is not None or balance is not None else None
+
+    # --- News ---
+    if news is None:
+        news = results["news"]
+        if news is not None:
+            stock_cache["news"].set(symbol, news)
 
     logger.debug("Stock details fetch complete")
 
-    return StockData(company=company_details, metadata=metadata, prices=prices, financials=financials, news=news)
+    return StockData(
+        company=company_details,
+        metadata=metadata,
+        prices=prices if prices is not None else PriceSeries.empty(),
+        financials=financials,
+        news=news or [],
+    )
+
+
+@tool("fetch_stock_details", args_schema=FetchStockDetailsInput)
+def fetch_stock_details(ticker_or_name: str) -> StockData | str:
+    """
+    Fetches stock details for a given ticker symbol.
+    If the given symbol is not a valid symbol, searches for the term and uses the first result.
+    Do not pass None or no Value
+
+    Args:
+        ticker_or_name (str): The ticker symbol of the stock or name of the company.
+
+    Returns:
+        StockData | str: An object containing the stock details or an error message.
+    """
+
+    logger.debug(f"Fetch stock details tool used {ticker_or_name}")
+
+    return get_stock_data(ticker_or_name)
+
+
+class FetchMultipleStockDetailsInput(BaseModel):
+    tickers_or_names: list[str] = Field(description="The ticker symbols of the stocks or names of the companies")
+
+
+def download_prices(symbols: list[str], period: str = STOCK_HISTORY_PERIOD, interval: str = STOCK_HISTORY_INTERVAL):
+    """
+    Pulls the price history of all the symbols in bulk `yf.download` calls and primes the price cache.
+    Symbols the bar store already covers only download the bars since the oldest last stored bar.
+    Symbols that can not be served this way are left for their own fetch.
+    """
+
+    import yfinance as yf
+    from pandas import MultiIndex
+
+    start = period_start(period)
+    coverages = {symbol: bar_store.coverage(symbol, interval) for symbol in symbols}
+    covered = [symbol for symbol, coverage in coverages.items() if coverage and coverage.start <= start]
+    uncovered = [symbol for symbol in symbols if symbol not in covered]
+
+    downloads: list[tuple[list[str], dict[str, Any]]] = []
+    if covered:
+        delta_start = min(cast(Coverage, coverages[symbol]).end for symbol in covered)
+        downloads.append((covered, {"start": datetime.fromtimestamp(delta_start, tz=UTC)}))
+    if uncovered:
+        downloads.append((uncovered, {"period": period}))
+
+    for group, kwargs in downloads:
+        try:
+            frame = yf.download(
+                group,
+                session=yahoo_session,
+                interval=interval,
+                group_by="ticker",
+                auto_adjust=True,
+                actions=True,
+                threads=True,
+                progress=False,
+                **kwargs,
+            )
+        except Exception as e:
+            logger.error(f"Failed to download prices for {group}. Error: {e}")
+            continue
+
+        if frame is None or frame.empty:
+            continue
+
+        for symbol in group:
+            if isinstance(frame.columns, MultiIndex):
+                if symbol not in frame.columns.get_level_values(0):
+                    continue
+                hist = frame[symbol].dropna(how="all")
+            else:
+                hist = frame.dropna(how="all")
+
+            corporate_actions = [col for col in ("Dividends", "Stock Splits") if col in hist]
+            if symbol in covered and hist[corporate_actions].to_numpy().any():
+                # adjusted prices changed, let the single ticker path refetch the whole period
+                continue
+
+            bar_store.upsert(symbol, interval, PriceSeries.from_dataframe(hist), None if symbol in covered else start)
+            stock_cache["prices"].set(symbol, bar_store.load(symbol, interval, start))
+
+
+@tool("fetch_multiple_stock_details", args_schema=FetchMultipleStockDetailsInput)
+def fetch_multiple_stock_details(tickers_or_names: list[str]) -> StockBatch:
+    """
+    Fetches stock details for several ticker symbols or company names at once.
+    Use this to compare stocks or to look at a watchlist, instead of fetching them one by one.
+
+    Args:
+        tickers_or_names (list[str]): The ticker symbols of the stocks or names of the companies.
+
+    Returns:
+        StockBatch: The stock details per symbol, and the error per input that could not be fetched.
+    """
+
+    logger.debug(f"Fetch multiple stock details tool used {tickers_or_names}")
+
+    # one bulk history download for everything we can resolve offline and do not have fresh prices for
+    symbols = {name: lookup_symbol(name) for name in tickers_or_names}
+    stale = sorted({s for s in symbols.values() if s and stock_cache["prices"].get(s) is None})
+    # with a cassette every history goes through its own recorded fetch, bulk downloads depend on the bar store
+    if stale and not cassette.active:
+        download_prices(stale)
+
+    batch = StockBatch()
+    futures = {name: stock_batch_pool.submit(get_stock_data, name) for name in dict.fromkeys(tickers_or_names)}
+    for name, future in futures.items():
+        try:
+            stock_data = future.result()
+            batch.data[stock_data.metadata.symbol] = stock_data
+        except Exception as e:
+            logger.error(f"Failed to fetch stock details for {name}. Error: {e}")
+            batch.errors[name] = str(e)
+
+    logger.debug(f"Fetched {len(batch.data)} stocks with {len(batch.errors)} errors")
+    return batch
 
 
 if __name__ == "__main__":
-    ticker = input("Ticker Or Company Name> ")
-    print(fetch_stock_details.invoke(ticker))
+    tickers = [t.strip() for t in input("Tickers Or Company Names (comma separated)> ").split(",") if t.strip()]
+    if len(tickers) == 1:
+        print(fetch_stock_details.invoke(tickers[0]))
+    else:
+        print(fetch_multiple_stock_details.invoke({"tickers_or_names": tickers}))
@@ -0,0 +1,158 @@
+import logging
+import os
+import time
+from datetime import UTC, datetime, timedelta
+from typing import NamedTuple
+
+import numpy as np
+
+from models.stock import PriceSeries
+from utils.storage import SQLiteStore
+
+BAR_STORE_PATH = os.getenv("BAR_STORE_PATH") or "bars.sqlite3"
+
+PERIOD_DAYS: dict[str, int] = {
+    "1d": 1,
+    "5d": 5,
+    "1mo": 31,
+    "3mo": 92,
+    "6mo": 183,
+    "1y": 366,
+    "2y": 731,
+    "5y": 1827,
+    "10y": 3653,
+}
+
+logger = logging.getLogger(__name__)
+
+
+class Coverage(NamedTuple):
+    start: int
+    end: int
+    fetched_at: float
+
+
+def period_start(period: str) -> int:
+    """
+    Returns the UTC epoch seconds a yfinance style period (6mo, 1y, ytd, max...) starts at.
+    `max` starts at 0.
+    """
+
+    now = datetime.now(UTC)
+    if period == "max":
+        return 0
+    if period == "ytd":
+        return int(datetime(now.year, 1, 1, tzinfo=UTC).timestamp())
+    if period not in PERIOD_DAYS:
+        raise ValueError(f"Unsupported period: {period}")
+
+    start = (now - timedelta(days=PERIOD_DAYS[period])).replace(hour=0, minute=0, second=0, microsecond=0)
+    return int(start.timestamp())
+
+
+class BarStore(SQLiteStore):
+    """
+    Persistent OHLCV bars, partitioned by symbol and interval.
+    Records which range has been fetched per partition, so callers only need to fetch what is missing.
+    Writes are idempotent, a bar fetched twice replaces itself.
+    """
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS bars (
+        symbol TEXT NOT NULL,
+        interval TEXT NOT NULL,
+        ts INTEGER NOT NULL,
+        open REAL,
+        high REAL,
+        low REAL,
+        close REAL,
+        adjusted_close REAL,
+        volume INTEGER,
+        PRIMARY KEY (symbol, interval, ts)
+    ) WITHOUT ROWID;
+
+    CREATE TABLE IF NOT EXISTS coverage (
+        symbol TEXT NOT NULL,
+        interval TEXT NOT NULL,
+        start_ts INTEGER NOT NULL,
+        end_ts INTEGER NOT NULL,
+        fetched_at REAL NOT NULL,
+        PRIMARY KEY (symbol, interval)
+    );
+    """
+
+    def coverage(self, symbol: str, interval: str) -> Coverage | None:
+        rows = self.query(
+            "SELECT start_ts, end_ts, fetched_at FROM coverage WHERE symbol = ? AND interval = ?",
+            (symbol, interval),
+        )
+        return Coverage(*rows[0]) if rows else None
+
+    def upsert(self, symbol: str, interval: str, series: PriceSeries, covered_from: int | None = None):
+        """
+        Merges the bars into the store.
+        `covered_from` is the start of the requested range, which may be earlier than the first bar returned.
+        An empty series changes nothing, not even the coverage: it does not tell which range was fetched.
+        """
+
+        if len(series) == 0:
+            return
+
+        rows = zip(
+            [symbol] * len(series),
+            [interval] * len(series),
+            series.date.tolist(),
+            series.open.tolist(),
+            series.high.tolist(),
+            series.low.tolist(),
+            series.close.tolist(),
+            series.adjusted_close.tolist(),
+            series.volume.tolist(),
+        )
+
+        with self.transaction() as conn:
+            conn.executemany("INSERT OR REPLACE INTO bars VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+
+            end = int(series.date[-1])
+            start = covered_from if covered_from is not None else int(series.date[0])
+            conn.execute(
+                """
+                INSERT INTO coverage VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT (symbol, interval) DO UPDATE SET
+                    start_ts = MIN(start_ts, excluded.start_ts),
+                    end_ts = MAX(end_ts, excluded.end_ts),
+                    fetched_at = excluded.fetched_at
+                """,
+                (symbol, interval, start, end, time.time()),
+            )
+
+    def load(self, symbol: str, interval: str, start: int = 0, end: int | None = None) -> PriceSeries:
+        rows = self.query(
+            """
+            SELECT ts, open, high, low, close, adjusted_close, volume FROM bars
+            WHERE symbol = ? AND interval = ? AND ts >= ? AND ts <= ?
+            ORDER BY ts
+            """,
+            (symbol, interval, start, end if end is not None else 2**62),
+        )
+        if not rows:
+            return PriceSeries.empty()
+
+        columns = np.array(rows, dtype=np.float64).T
+        return PriceSeries(
+            date=columns[0].astype(np.int64),
+            open=columns[1],
+            high=columns[2],
+            low=columns[3],
+            close=columns[4],
+            adjusted_close=columns[5],
+            volume=columns[6].astype(np.int64),
+        )
+
+    def drop(self, symbol: str, interval: str):
+        with self.transaction() as conn:
+            conn.execute("DELETE FROM bars WHERE symbol = ? AND interval = ?", (symbol, interval))
+            conn.execute("DELETE FROM coverage WHERE symbol = ? AND interval = ?", (symbol, interval))
+
+
+bar_store = BarStore(BAR_STORE_PATH)
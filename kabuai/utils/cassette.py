@@ -0,0 +1,152 @@
+import atexit
+import gzip
+import logging
+import os
+import pickle
+import threading
+import time
+from collections.abc import Callable, Hashable
+from typing import Any, Literal, TypeVar, cast
+
+CASSETTE_MODE = cast(Literal["off", "record", "replay"], os.getenv("CASSETTE_MODE") or "off")
+CASSETTE_PATH = os.getenv("CASSETTE_PATH") or "cassette.pkl.gz"
+# "recorded" sleeps for as long as the upstream call took when recording, a number sleeps that many seconds
+CASSETTE_LATENCY = os.getenv("CASSETTE_LATENCY") or "recorded"
+
+T = TypeVar("T")
+
+logger = logging.getLogger(__name__)
+
+
+class CassetteMiss(Exception):
+    """
+    Raised in replay mode for a call that was never recorded.
+    """
+
+
+class Cassette:
+    """
+    Records the upstream (Yahoo, DuckDuckGo) responses the tools see, and serves them back later
+    without any network access, so the whole graph can be profiled and load tested on identical inputs.
+
+    Every call is keyed by its kind and arguments, and stores the response (or the error raised)
+    together with how long it took. Recordings are kept in a gzipped pickle, written on exit.
+    Recording again into an existing cassette adds to it, replacing the calls made again.
+    """
+
+    def __init__(self, path: str, mode: Literal["off", "record", "replay"], latency: str = "recorded"):
+        self.path = path
+        self.mode = mode
+        self.latency = latency
+        self._lock = threading.Lock()
+        self._entries: dict[tuple[str, Hashable], tuple[bool, Any, float]] = {}
+        self._dirty = False
+        self.hits = 0
+        self.misses = 0
+        self.recorded = 0
+
+        if mode != "off" and os.path.exists(path):
+            self.load()
+        if mode == "replay" and not self._entries:
+            logger.warning(f"Replaying from an empty cassette, {path} has no recordings")
+        if mode == "record":
+            atexit.register(self.save)
+
+    @property
+    def active(self) -> bool:
+        return self.mode != "off"
+
+    def call(self, kind: str, key: Hashable, fetch: Callable[[], T]) -> T:
+        """
+        Runs the upstream fetch, recording its outcome in record mode.
+        In replay mode returns (or raises) the recorded outcome instead, after the simulated latency.
+        """
+
+        if self.mode == "off":
+            return fetch()
+
+        if self.mode == "replay":
+            return self._replay(kind, key)
+
+        started = time.monotonic()
+        try:
+            value = fetch()
+        except Exception as e:
+            self._record(kind, key, False, e, time.monotonic() - started)
+            raise
+
+        self._record(kind, key, True, value, time.monotonic() - started)
+        return value
+
+    def _record(self, kind: str, key: Hashable, ok: bool, value: Any, elapsed: float):
+        if not ok:
+            try:
+                pickle.loads(pickle.dumps(value))
+            except Exception:
+                # some client errors do not survive pickling, keep their message at least
+                value = Exception(str(value))
+
+        with self._lock:
+            self._entries[(kind, key)] = (ok, value, elapsed)
+            self._dirty = True
+            self.recorded += 1
+
+    def _replay(self, kind: str, key: Hashable) -> Any:
+        with self._lock:
+            entry = self._entries.get((kind, key))
+            if entry is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+
+        if entry is None:
+            raise CassetteMiss(f"No recorded {kind} call for {key!r} in {self.path}")
+
+        ok, value, elapsed = entry
+        delay = elapsed if self.latency == "recorded" else float(self.latency)
+        if delay > 0:
+            time.sleep(delay)
+
+        if not ok:
+            raise value
+        return value
+
+    def load(self):
+        with gzip.open(self.path, "rb") as f:
+            entries = pickle.load(f)
+        with self._lock:
+            self._entries.update(entries)
+        logger.info(f"Loaded {len(entries)} recorded calls from {self.path}")
+
+    def save(self):
+        """
+        Writes the recordings to the cassette file, through a temporary file so a crash leaves the old one intact.
+        """
+
+        with self._lock:
+            if not self._dirty:
+                return
+            entries = dict(self._entries)
+            self._dirty = False
+
+        tmp = f"{self.path}.tmp"
+        with gzip.open(tmp, "wb") as f:
+            pickle.dump(entries, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, self.path)
+        logger.info(f"Saved {len(entries)} recorded calls to {self.path}")
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                "mode": self.mode,
+                "entries": len(self._entries),
+                "recorded": self.recorded,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+cassette = Cassette(CASSETTE_PATH, CASSETTE_MODE, CASSETTE_LATENCY)
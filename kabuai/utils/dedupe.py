@@ -0,0 +1,61 @@
+import os
+import re
+from collections.abc import Callable
+from typing import TypeVar
+
+from utils.search import STOP_WORDS
+
+# share of distinct words two texts must have in common to be copies of the same story. rewrites of one
+# story by different outlets share 0.65 or more, different stories about the same company under 0.5
+NEWS_DUPLICATE_SIMILARITY = float(os.getenv("NEWS_DUPLICATE_SIMILARITY") or 0.6)
+
+T = TypeVar("T")
+
+
+def normalize_text(text: str) -> str:
+    return " ".join(re.sub(r"[^a-z0-9]+", " ", text.lower()).split())
+
+
+def features(text: str) -> set[str]:
+    """
+    Distinct words of the normalized text without stop words.
+    Single words are more robust than longer shingles for headline and snippet sized texts,
+    where outlets reword the same story.
+    """
+
+    return {word for word in normalize_text(text).split() if word not in STOP_WORDS}
+
+
+def jaccard_similarity(a: set[str], b: set[str]) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def cluster_near_duplicates(
+    items: list[T], text: Callable[[T], str], threshold: float = NEWS_DUPLICATE_SIMILARITY
+) -> list[list[T]]:
+    """
+    Groups near duplicate items, e.g. the same wire story from different outlets.
+    Items join the first cluster whose first item has the same normalized title, or shares at least
+    `threshold` of their words (Jaccard similarity). Clusters and their items keep the input order,
+    so the first item of every cluster is the best ranked copy.
+    """
+
+    clusters: list[list[T]] = []
+    keys: list[tuple[str, set[str]]] = []
+
+    for item in items:
+        content = text(item)
+        title = normalize_text(content.split("\n", 1)[0])
+        words = features(content)
+
+        for cluster, (cluster_title, cluster_words) in zip(clusters, keys):
+            if (title and title == cluster_title) or jaccard_similarity(words, cluster_words) >= threshold:
+                cluster.append(item)
+                break
+        else:
+            clusters.append([item])
+            keys.append((title, words))
+
+    return clusters
@@ -0,0 +1,233 @@
+import logging
+import math
+import os
+from datetime import UTC, datetime, timedelta, tzinfo
+from typing import NamedTuple, cast
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+import numpy as np
+from numpy.typing import NDArray
+
+from models.stock import PriceSeries
+from utils.cache import TTLCache
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+PRICE_DIGEST_TOKEN_BUDGET = int(os.getenv("PRICE_DIGEST_TOKEN_BUDGET") or 600)
+PRICE_DIGEST_RECENT_BARS = int(os.getenv("PRICE_DIGEST_RECENT_BARS") or 10)
+PRICE_DIGEST_CACHE_SIZE = int(os.getenv("PRICE_DIGEST_CACHE_SIZE") or 256)
+
+# rough average for english text and numbers when tiktoken is not installed
+CHARS_PER_TOKEN = 3.5
+DAY = 24 * 60 * 60
+
+logger = logging.getLogger(__name__)
+
+digest_cache: TTLCache["PriceDigest"] = TTLCache(maxsize=PRICE_DIGEST_CACHE_SIZE, ttl=24 * 60 * 60)
+
+_encoding = None
+
+
+class PriceDigest(NamedTuple):
+    text: str
+    tokens: int
+    full_tokens: int
+
+    @property
+    def tokens_saved(self) -> int:
+        return max(self.full_tokens - self.tokens, 0)
+
+
+def count_tokens(text: str) -> int:
+    """
+    Counts the tokens in the text with tiktoken if it is installed, otherwise estimates them from the length.
+    The count is only used for budgeting, so an estimate from a different tokenizer than the model's is fine.
+    """
+
+    global _encoding
+    if tiktoken is not None:
+        try:
+            if _encoding is None:
+                _encoding = tiktoken.get_encoding("cl100k_base")
+            return len(_encoding.encode(text))
+        except Exception as e:
+            logger.debug(f"tiktoken unavailable, estimating token count: {e}")
+
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def aggregate(prices: PriceSeries, keys: NDArray[np.int64]) -> PriceSeries:
+    """
+    Downsamples the bars into OHLCV aggregates, one per run of equal keys (e.g. week or month numbers).
+    """
+
+    if len(prices) == 0:
+        return prices
+
+    starts = np.flatnonzero(np.diff(keys, prepend=keys[0] - 1))
+    ends = np.append(starts[1:], len(prices)) - 1
+    return PriceSeries(
+        date=prices.date[starts],
+        open=prices.open[starts],
+        high=np.maximum.reduceat(prices.high, starts),
+        low=np.minimum.reduceat(prices.low, starts),
+        close=prices.close[ends],
+        adjusted_close=prices.adjusted_close[ends],
+        volume=np.add.reduceat(prices.volume, starts),
+    )
+
+
+def exchange_timezone(name: str | None) -> tzinfo:
+    """
+    The timezone bars are dated in, UTC when the exchange timezone is unknown.
+    """
+
+    if not name:
+        return UTC
+    try:
+        return ZoneInfo(name)
+    except (ZoneInfoNotFoundError, ValueError):
+        logger.warning(f"Unknown exchange timezone {name}, dating bars in UTC")
+        return UTC
+
+
+def local_times(dates: NDArray[np.int64], tz: tzinfo) -> NDArray[np.int64]:
+    """
+    Shifts UTC epoch seconds by the UTC offset of the timezone at each of them, so day boundaries are the exchange's.
+    """
+
+    if tz is UTC:
+        return dates
+
+    offsets = [cast(timedelta, datetime.fromtimestamp(ts, tz).utcoffset()).total_seconds() for ts in dates.tolist()]
+    return dates + np.asarray(offsets, dtype=np.int64)
+
+
+def is_intraday(prices: PriceSeries) -> bool:
+    # daily bars are stamped at the exchange's midnight, which is not midnight in UTC, so go by their spacing
+    return len(prices) > 1 and bool(np.median(np.diff(prices.date)) < DAY)
+
+
+def week_keys(local: NDArray[np.int64]) -> NDArray[np.int64]:
+    # epoch day 0 was a thursday, shift so weeks start on monday
+    return (local // DAY + 3) // 7
+
+
+def month_keys(local: NDArray[np.int64]) -> NDArray[np.int64]:
+    return local.astype("datetime64[s]").astype("datetime64[M]").astype(np.int64)
+
+
+def format_bars(prices: PriceSeries, date_format: str, tz: tzinfo = UTC) -> str:
+    rows = zip(prices.date.tolist(), prices.open, prices.high, prices.low, prices.close, prices.volume.tolist())
+    return "\n".join(
+        f"{datetime.fromtimestamp(ts, tz).strftime(date_format)},{o:.2f},{h:.2f},{low:.2f},{c:.2f},{v}"
+        for ts, o, h, low, c, v in rows
+    )
+
+
+def format_stats(prices: PriceSeries, date_format: str, tz: tzinfo = UTC) -> str:
+    close, high, low = prices.close, prices.high, prices.low
+    high_at, low_at = int(high.argmax()), int(low.argmin())
+    date = lambda i: datetime.fromtimestamp(int(prices.date[i]), tz).strftime(date_format)  # noqa: E731
+
+    return "\n".join(
+        [
+            f"bars: {len(prices)} from {date(0)} to {date(-1)}",
+            f"first close: {close[0]:.2f}, last close: {close[-1]:.2f}, "
+            f"change: {(close[-1] / close[0] - 1) * 100:.2f}%",
+            f"highest: {high[high_at]:.2f} on {date(high_at)}, lowest: {low[low_at]:.2f} on {date(low_at)}",
+            f"average volume: {int(prices.volume.mean())}, last volume: {int(prices.volume[-1])}",
+        ]
+    )
+
+
+def render_digest(
+    prices: PriceSeries,
+    recent_bars: int,
+    resolution: str | None,
+    max_aggregates: int = 0,
+    tz: tzinfo = UTC,
+) -> str:
+    """
+    Renders the stats, the older bars downsampled to `resolution` (week, month or None to leave them out)
+    and the last `recent_bars` bars in full. `max_aggregates` keeps only the latest aggregates, 0 keeps all.
+    Bars are dated, and grouped into weeks and months, in the exchange timezone `tz`.
+    """
+
+    date_format = "%Y-%m-%d %H:%M" if is_intraday(prices) else "%Y-%m-%d"
+    recent_bars = min(recent_bars, len(prices))
+    older, recent = prices[: len(prices) - recent_bars], prices[len(prices) - recent_bars :]
+
+    sections = [f"Statistics:\n{format_stats(prices, date_format, tz)}"]
+    if resolution and len(older):
+        local = local_times(older.date, tz)
+        keys = week_keys(local) if resolution == "week" else month_keys(local)
+        aggregates = aggregate(older, keys)
+        if max_aggregates:
+            aggregates = aggregates[-max_aggregates:]
+        sections.append(
+            f"Older bars, {len(aggregates)} aggregates of one {resolution} each, dated by their first bar (date,open,high,low,close,volume):\n"
+            f"{format_bars(aggregates, '%Y-%m-%d', tz)}"
+        )
+    if len(recent):
+        sections.append(
+            f"Most recent {len(recent)} bars (date,open,high,low,close,volume):\n{format_bars(recent, date_format, tz)}"
+        )
+
+    return "\n\n".join(sections)
+
+
+def build_price_digest(
+    symbol: str,
+    prices: PriceSeries,
+    budget: int | None = None,
+    timezone: str | None = None,
+) -> PriceDigest:
+    """
+    Builds a price history digest that fits in `budget` tokens (PRICE_DIGEST_TOKEN_BUDGET by default).
+    Starts from recent bars in full with weekly aggregates before them, then falls back to monthly aggregates,
+    fewer recent bars and finally the statistics alone until the digest fits.
+    Dates are in the exchange `timezone` (StockMetadata.exchange_timezone), UTC if not given.
+    Digests are cached per (symbol, last bar, budget, timezone).
+    """
+
+    budget = budget or PRICE_DIGEST_TOKEN_BUDGET
+    if len(prices) == 0:
+        return PriceDigest("No price history available", 0, 0)
+
+    key = (symbol, int(prices.date[-1]), len(prices), budget, timezone)
+    digest = digest_cache.get(key)
+    if digest is None:
+        digest = fit_digest(symbol, prices, budget, exchange_timezone(timezone))
+        digest_cache.set(key, digest)
+
+    logger.info(
+        f"Price digest for {symbol}: {digest.tokens} tokens instead of {digest.full_tokens} "
+        f"for the full history ({digest.tokens_saved} saved)"
+    )
+    return digest
+
+
+def fit_digest(symbol: str, prices: PriceSeries, budget: int, tz: tzinfo = UTC) -> PriceDigest:
+    levels = [
+        (PRICE_DIGEST_RECENT_BARS, "week", 0),
+        (PRICE_DIGEST_RECENT_BARS, "month", 0),
+        (PRICE_DIGEST_RECENT_BARS // 2, "month", 0),
+        (PRICE_DIGEST_RECENT_BARS // 2, "month", 24),
+        (PRICE_DIGEST_RECENT_BARS // 2, "month", 12),
+        (PRICE_DIGEST_RECENT_BARS // 2, None, 0),
+        (0, None, 0),
+    ]
+    for recent_bars, resolution, max_aggregates in levels:
+        text = render_digest(prices, recent_bars, resolution, max_aggregates, tz)
+        tokens = count_tokens(text)
+        if tokens <= budget:
+            break
+    else:
+        logger.warning(f"Price digest for {symbol} is {tokens} tokens, over the budget of {budget}")
+
+    logger.debug(f"Price digest for {symbol} uses {recent_bars} recent bars and {resolution or 'no'} aggregates")
+    return PriceDigest(text, tokens, count_tokens(prices.to_json()))
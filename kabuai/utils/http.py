@@ -0,0 +1,210 @@
+import logging
+import os
+import queue
+import threading
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from functools import cache
+from importlib.metadata import PackageNotFoundError, version
+from typing import TYPE_CHECKING, Any
+
+from curl_cffi import CurlInfo
+from curl_cffi.requests import Session
+
+if TYPE_CHECKING:
+    from duckduckgo_search import DDGS
+
+HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE") or 16)
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT") or 30)
+HTTP_CRUMB_MAX_AGE = float(os.getenv("HTTP_CRUMB_MAX_AGE") or 6 * 60 * 60)
+SEARCH_CLIENT_POOL_SIZE = int(os.getenv("SEARCH_CLIENT_POOL_SIZE") or 4)
+SEARCH_CLIENT_TIMEOUT = int(os.getenv("SEARCH_CLIENT_TIMEOUT") or 10)
+
+# refresh_yahoo_auth resets private yfinance state, as laid out in this release (pinned in pyproject.toml)
+YFINANCE_AUTH_VERSION = "0.2.61"
+
+logger = logging.getLogger(__name__)
+
+
+def refresh_yahoo_auth(session: Session | None = None):
+    """
+    Drops the cookie and crumb yfinance negotiated with Yahoo, so the next request negotiates fresh ones.
+    yfinance only retries once with the other cookie strategy, a crumb that went stale keeps failing otherwise.
+    The cookie and crumb are private yfinance state. On a yfinance release other than the one this was checked
+    against, or if they are gone, only the cookies of `session` are dropped, which also makes Yahoo reject the
+    stale crumb and yfinance negotiate both again on its retry.
+    """
+
+    # imported here, importing yfinance is slow and the session is created before anything is fetched
+    from yfinance.data import YfData
+
+    data = YfData()
+    lock = getattr(data, "_cookie_lock", None)
+    if yfinance_version() != YFINANCE_AUTH_VERSION or lock is None or not hasattr(data, "_crumb"):
+        logger.info(f"Refreshing the Yahoo cookie by clearing the session cookies (yfinance {yfinance_version()})")
+        if session is not None:
+            session.cookies.clear()
+        return
+
+    # yfinance requests the cookie and crumb while holding this lock, if it is taken they are being renewed already
+    if not lock.acquire(blocking=False):
+        return
+    try:
+        data._cookie = None
+        data._crumb = None
+    finally:
+        lock.release()
+    logger.info("Refreshing the Yahoo cookie and crumb")
+
+
+@cache
+def yfinance_version() -> str:
+    try:
+        return version("yfinance")
+    except PackageNotFoundError:
+        return ""
+
+
+class PooledSession(Session):
+    """
+    Process wide curl_cffi session for Yahoo. Every worker thread keeps its own curl handle,
+    so connections stay alive between calls, and at most `pool_size` requests are in flight at once.
+    Counts requests, new connections and waits for a free slot, and refreshes the Yahoo crumb
+    when it is rejected or gets old.
+    """
+
+    def __init__(self, pool_size: int, **kwargs: Any):
+        super().__init__(**kwargs)
+        self.pool_size = pool_size
+        self._slots = threading.BoundedSemaphore(pool_size)
+        self._stats_lock = threading.Lock()
+        self._auth_at = time.time()
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.requests = 0
+        self.connects = 0
+        self.errors = 0
+        self.waits = 0
+        self.auth_refreshes = 0
+
+    def request(self, method, url, *args, **kwargs):  # type: ignore[override]
+        if not self._slots.acquire(blocking=False):
+            with self._stats_lock:
+                self.waits += 1
+            self._slots.acquire()
+
+        yahoo = "yahoo" in url
+        if yahoo and time.time() - self._auth_at > HTTP_CRUMB_MAX_AGE:
+            self._refresh_auth()
+
+        with self._stats_lock:
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+
+        try:
+            response = super().request(method, url, *args, **kwargs)
+            try:
+                # zero when the request went over a kept alive connection
+                connects = int(self.curl.getinfo(CurlInfo.NUM_CONNECTS))
+            except Exception:
+                connects = 0
+            with self._stats_lock:
+                self.requests += 1
+                self.connects += connects
+            if yahoo and response.status_code == 401:
+                self._refresh_auth()
+            return response
+        except Exception:
+            with self._stats_lock:
+                self.requests += 1
+                self.errors += 1
+            raise
+        finally:
+            with self._stats_lock:
+                self.in_flight -= 1
+            self._slots.release()
+
+    def _refresh_auth(self):
+        with self._stats_lock:
+            self._auth_at = time.time()
+            self.auth_refreshes += 1
+        refresh_yahoo_auth(self)
+
+    def stats(self) -> dict[str, Any]:
+        with self._stats_lock:
+            return {
+                "pool_size": self.pool_size,
+                "in_flight": self.in_flight,
+                "peak_in_flight": self.peak_in_flight,
+                "utilization": self.in_flight / self.pool_size,
+                "requests": self.requests,
+                "connects": self.connects,
+                "connection_reuse": 1 - self.connects / self.requests if self.requests else 0.0,
+                "errors": self.errors,
+                "waits": self.waits,
+                "auth_refreshes": self.auth_refreshes,
+            }
+
+
+class SearchClientPool:
+    """
+    Fixed pool of DuckDuckGo clients. A client keeps its cookies and connections between searches,
+    and is checked out by one search at a time.
+    """
+
+    def __init__(self, size: int):
+        self.size = size
+        self._clients: "queue.LifoQueue[DDGS]" = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.waits = 0
+
+    @contextmanager
+    def client(self) -> Iterator["DDGS"]:
+        ddgs = self._checkout()
+        try:
+            yield ddgs
+        finally:
+            self._clients.put(ddgs)
+
+    def _checkout(self) -> "DDGS":
+        from duckduckgo_search import DDGS
+
+        with self._lock:
+            self.checkouts += 1
+            try:
+                return self._clients.get_nowait()
+            except queue.Empty:
+                pass
+            if self._created < self.size:
+                self._created += 1
+                return DDGS(timeout=SEARCH_CLIENT_TIMEOUT)
+            self.waits += 1
+
+        return self._clients.get()
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            idle = self._clients.qsize()
+            return {
+                "pool_size": self.size,
+                "created": self._created,
+                "in_use": self._created - idle,
+                "utilization": (self._created - idle) / self.size,
+                "checkouts": self.checkouts,
+                "waits": self.waits,
+            }
+
+
+yahoo_session = PooledSession(pool_size=HTTP_POOL_SIZE, impersonate="chrome", timeout=HTTP_TIMEOUT)
+search_clients = SearchClientPool(SEARCH_CLIENT_POOL_SIZE)
+
+
+def http_stats() -> dict[str, dict[str, Any]]:
+    """
+    Returns the utilization and reuse counters of the Yahoo session and the search client pool.
+    """
+
+    return {"yahoo": yahoo_session.stats(), "search": search_clients.stats()}
@@ -0,0 +1,212 @@
+import logging
+import os
+
+import numpy as np
+from numpy.typing import NDArray
+
+from models.stock import PriceSeries, TechnicalIndicators
+from utils.cache import TTLCache
+
+INDICATORS_CACHE_SIZE = int(os.getenv("INDICATORS_CACHE_SIZE") or 512)
+
+TRADING_DAYS = 252
+# keeps decay ** -block well inside the float64 range
+EMA_BLOCK_EXPONENT = 300.0
+
+logger = logging.getLogger(__name__)
+
+# computed once per (symbol, last bar), a new bar gives a new key
+indicators_cache: TTLCache[TechnicalIndicators] = TTLCache(maxsize=INDICATORS_CACHE_SIZE, ttl=24 * 60 * 60)
+
+
+def ema(values: NDArray[np.float64], span: int | None = None, alpha: float | None = None) -> NDArray[np.float64]:
+    """
+    Exponential moving average seeded with the first value, without a python loop.
+    `alpha` overrides the span, e.g. 1 / n for Wilder smoothing.
+    Unrolls the recursion into a scaled cumulative sum, in blocks so the scaling never overflows.
+    """
+
+    if alpha is None:
+        if span is None:
+            raise ValueError("Either span or alpha is required")
+        alpha = 2 / (span + 1)
+
+    decay = 1 - alpha
+    if len(values) == 0 or decay <= 0:
+        return np.array(values, dtype=np.float64)
+
+    out = np.empty(len(values))
+    block = max(1, int(EMA_BLOCK_EXPONENT / -np.log(decay)))
+    previous = values[0]
+    for start in range(0, len(values), block):
+        chunk = values[start : start + block]
+        powers = decay ** np.arange(1, len(chunk) + 1)
+        out[start : start + len(chunk)] = powers * (previous + alpha * np.cumsum(chunk / powers))
+        previous = out[start + len(chunk) - 1]
+
+    return out
+
+
+def rsi(close: NDArray[np.float64], window: int = 14) -> float | None:
+    if len(close) <= window:
+        return None
+
+    delta = np.diff(close)
+    gain = ema(np.clip(delta, 0, None), alpha=1 / window)[-1]
+    loss = ema(np.clip(-delta, 0, None), alpha=1 / window)[-1]
+    if loss == 0:
+        return 100.0
+    return float(100 - 100 / (1 + gain / loss))
+
+
+def atr(
+    high: NDArray[np.float64], low: NDArray[np.float64], close: NDArray[np.float64], window: int = 14
+) -> float | None:
+    if len(close) <= window:
+        return None
+
+    previous_close = close[:-1]
+    true_range = np.maximum.reduce(
+        [high[1:] - low[1:], np.abs(high[1:] - previous_close), np.abs(low[1:] - previous_close)]
+    )
+    return float(ema(true_range, alpha=1 / window)[-1])
+
+
+def realized_volatility(close: NDArray[np.float64], window: int | None = None) -> float | None:
+    """
+    Annualized standard deviation of daily log returns over the last `window` bars (all bars if None).
+    """
+
+    returns = np.diff(np.log(close))
+    if window is not None:
+        returns = returns[-window:]
+    if len(returns) < 2:
+        return None
+    return float(returns.std(ddof=1) * np.sqrt(TRADING_DAYS))
+
+
+def max_drawdown(close: NDArray[np.float64]) -> float | None:
+    if len(close) == 0:
+        return None
+    peaks = np.maximum.accumulate(close)
+    return float(((close - peaks) / peaks).min())
+
+
+def period_return(close: NDArray[np.float64], bars: int) -> float | None:
+    if len(close) <= bars:
+        return None
+    return float(close[-1] / close[-1 - bars] - 1)
+
+
+def compute_indicators(prices: PriceSeries) -> TechnicalIndicators:
+    """
+    Computes the technical indicators over the whole price history.
+    """
+
+    close, high, low, volume = prices.close, prices.high, prices.low, prices.volume.astype(np.float64)
+    last = float(close[-1])
+
+    ema_12, ema_26 = ema(close, span=12), ema(close, span=26)
+    macd_line = ema_12 - ema_26
+    macd_signal = ema(macd_line, span=9)
+
+    year = slice(-TRADING_DAYS, None)
+    range_high, range_low = float(high[year].max()), float(low[year].min())
+
+    recent_volume = volume[-21:-1]
+    volume_std = recent_volume.std(ddof=1) if len(recent_volume) > 1 else 0.0
+
+    atr_14 = atr(high, low, close)
+    # only the latest value of each SMA is needed
+    sma_20, sma_50, sma_200 = (
+        float(close[-window:].mean()) if len(close) >= window else None for window in (20, 50, 200)
+    )
+
+    return TechnicalIndicators(
+        bars=len(prices),
+        last_close=last,
+        return_1d=period_return(close, 1),
+        return_5d=period_return(close, 5),
+        return_1mo=period_return(close, 21),
+        return_3mo=period_return(close, 63),
+        return_period=float(close[-1] / close[0] - 1),
+        sma_20=sma_20,
+        sma_50=sma_50,
+        sma_200=sma_200,
+        price_vs_sma_20=last / sma_20 - 1 if sma_20 else None,
+        price_vs_sma_50=last / sma_50 - 1 if sma_50 else None,
+        price_vs_sma_200=last / sma_200 - 1 if sma_200 else None,
+        ema_12=float(ema_12[-1]),
+        ema_26=float(ema_26[-1]),
+        rsi_14=rsi(close),
+        macd=float(macd_line[-1]),
+        macd_signal=float(macd_signal[-1]),
+        macd_histogram=float(macd_line[-1] - macd_signal[-1]),
+        atr_14=atr_14,
+        atr_14_pct=atr_14 / last if atr_14 is not None else None,
+        volatility_20d=realized_volatility(close, 20),
+        volatility_period=realized_volatility(close),
+        max_drawdown=max_drawdown(close),
+        range_high=range_high,
+        range_low=range_low,
+        range_position=(last - range_low) / (range_high - range_low) if range_high > range_low else None,
+        range_bars=len(close[year]),
+        volume_zscore=float((volume[-1] - recent_volume.mean()) / volume_std) if volume_std else None,
+    )
+
+
+def get_indicators(symbol: str, prices: PriceSeries) -> TechnicalIndicators | None:
+    """
+    Returns the cached indicators for the symbol's last bar, computing them on a miss.
+    """
+
+    if len(prices) < 2:
+        return None
+
+    key = (symbol, int(prices.date[-1]), len(prices))
+    indicators = indicators_cache.get(key)
+    if indicators is None:
+        indicators = compute_indicators(prices)
+        indicators_cache.set(key, indicators)
+        logger.debug(f"Computed technical indicators for {symbol}")
+
+    return indicators
+
+
+def format_indicators(indicators: TechnicalIndicators | None) -> str:
+    """
+    Formats the indicators as a compact feature block for the prompts.
+    Ratios are shown as percentages, missing values are left out.
+    """
+
+    if indicators is None:
+        return "Not available"
+
+    percentages = {
+        "return_1d",
+        "return_5d",
+        "return_1mo",
+        "return_3mo",
+        "return_period",
+        "price_vs_sma_20",
+        "price_vs_sma_50",
+        "price_vs_sma_200",
+        "atr_14_pct",
+        "volatility_20d",
+        "volatility_period",
+        "max_drawdown",
+        "range_position",
+    }
+
+    lines = []
+    for name, value in indicators.model_dump().items():
+        if value is None:
+            continue
+        if name in percentages:
+            lines.append(f"{name}: {value * 100:.2f}%")
+        elif isinstance(value, float):
+            lines.append(f"{name}: {value:.2f}")
+        else:
+            lines.append(f"{name}: {value}")
+
+    return "\n".join(lines)
@@ -0,0 +1,312 @@
+import logging
+import os
+import threading
+import time
+from typing import Any
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.messages import BaseMessage
+from langchain_core.outputs import ChatGeneration, LLMResult
+
+# USD per million tokens, per model tier, 0 when unknown
+COST_LIGHT_INPUT_PER_MTOK = float(os.getenv("COST_LIGHT_INPUT_PER_MTOK") or 0)
+COST_LIGHT_OUTPUT_PER_MTOK = float(os.getenv("COST_LIGHT_OUTPUT_PER_MTOK") or 0)
+COST_INPUT_PER_MTOK = float(os.getenv("COST_INPUT_PER_MTOK") or 0)
+COST_OUTPUT_PER_MTOK = float(os.getenv("COST_OUTPUT_PER_MTOK") or 0)
+COST_HEAVY_INPUT_PER_MTOK = float(os.getenv("COST_HEAVY_INPUT_PER_MTOK") or 0)
+COST_HEAVY_OUTPUT_PER_MTOK = float(os.getenv("COST_HEAVY_OUTPUT_PER_MTOK") or 0)
+
+MODEL_COSTS: dict[str, tuple[float, float]] = {
+    "light": (COST_LIGHT_INPUT_PER_MTOK, COST_LIGHT_OUTPUT_PER_MTOK),
+    "default": (COST_INPUT_PER_MTOK, COST_OUTPUT_PER_MTOK),
+    "heavy": (COST_HEAVY_INPUT_PER_MTOK, COST_HEAVY_OUTPUT_PER_MTOK),
+}
+
+# used when the provider does not report token usage
+CHARS_PER_TOKEN = 4
+
+UNKNOWN = "unknown"
+
+logger = logging.getLogger(__name__)
+
+
+def empty_totals() -> dict[str, Any]:
+    return {
+        "calls": 0,
+        "errors": 0,
+        "cached": 0,
+        "input_tokens": 0,
+        "output_tokens": 0,
+        "estimated_tokens": 0,
+        "cost": 0.0,
+        "latency": 0.0,
+        "max_latency": 0.0,
+        "ttft": 0.0,
+        "streamed": 0,
+    }
+
+
+def summarize(totals: dict[str, Any]) -> dict[str, Any]:
+    calls = totals["calls"]
+    return {
+        "calls": calls,
+        "errors": totals["errors"],
+        "cached": totals["cached"],
+        "input_tokens": totals["input_tokens"],
+        "output_tokens": totals["output_tokens"],
+        "estimated_tokens": totals["estimated_tokens"],
+        "cost": round(totals["cost"], 6),
+        "total_latency": round(totals["latency"], 3),
+        "mean_latency": round(totals["latency"] / calls, 3) if calls else 0.0,
+        "max_latency": round(totals["max_latency"], 3),
+        "mean_ttft": round(totals["ttft"] / totals["streamed"], 3) if totals["streamed"] else None,
+    }
+
+
+class UsageAggregate:
+    """
+    Totals of model and tool calls, overall and per graph node, model tier and tool.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self._models = empty_totals()
+        self._tools = empty_totals()
+        self._nodes: dict[str, dict[str, Any]] = {}
+        self._tiers: dict[str, dict[str, Any]] = {}
+        self._tool_names: dict[str, dict[str, Any]] = {}
+
+    def count_request(self):
+        with self._lock:
+            self.requests += 1
+
+    def add(self, call: dict[str, Any]):
+        with self._lock:
+            groups = [
+                self._models if call["kind"] == "model" else self._tools,
+                self._nodes.setdefault(call["node"], empty_totals()),
+            ]
+            if call["kind"] == "model":
+                groups.append(self._tiers.setdefault(call["tier"], empty_totals()))
+            else:
+                groups.append(self._tool_names.setdefault(call["name"], empty_totals()))
+
+            for totals in groups:
+                totals["calls"] += 1
+                totals["errors"] += call["error"]
+                totals["cached"] += call["cached"]
+                totals["input_tokens"] += call["input_tokens"]
+                totals["output_tokens"] += call["output_tokens"]
+                totals["estimated_tokens"] += call["estimated"] * (call["input_tokens"] + call["output_tokens"])
+                totals["cost"] += call["cost"]
+                totals["latency"] += call["latency"]
+                totals["max_latency"] = max(totals["max_latency"], call["latency"])
+                if call["ttft"] is not None:
+                    totals["ttft"] += call["ttft"]
+                    totals["streamed"] += 1
+
+    def summary(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "models": summarize(self._models),
+                "tools": summarize(self._tools),
+                "nodes": {node: summarize(totals) for node, totals in self._nodes.items()},
+                "tiers": {tier: summarize(totals) for tier, totals in self._tiers.items()},
+                "tool_names": {name: summarize(totals) for name, totals in self._tool_names.items()},
+            }
+
+
+process_usage = UsageAggregate()
+
+
+def token_usage(response: LLMResult, prompt_chars: int) -> tuple[int, int, bool]:
+    """
+    Input and output tokens of the response as reported by the provider,
+    or estimated from the characters when it did not report them (the last value is then True).
+    """
+
+    input_tokens = output_tokens = 0
+    for batch in response.generations:
+        for generation in batch:
+            if isinstance(generation, ChatGeneration):
+                usage = getattr(generation.message, "usage_metadata", None) or {}
+                input_tokens += usage.get("input_tokens", 0)
+                output_tokens += usage.get("output_tokens", 0)
+    if input_tokens or output_tokens:
+        return input_tokens, output_tokens, False
+
+    llm_output = response.llm_output or {}
+    usage = llm_output.get("token_usage") or llm_output.get("usage_metadata") or {}
+    input_tokens = int(usage.get("prompt_tokens") or usage.get("input_tokens") or 0)
+    output_tokens = int(usage.get("completion_tokens") or usage.get("output_tokens") or 0)
+    if input_tokens or output_tokens:
+        return input_tokens, output_tokens, False
+
+    completion_chars = sum(len(generation.text) for batch in response.generations for generation in batch)
+    return prompt_chars // CHARS_PER_TOKEN, completion_chars // CHARS_PER_TOKEN, True
+
+
+def is_cached(response: LLMResult) -> bool:
+    generations = [generation for batch in response.generations for generation in batch]
+    return bool(generations) and all(
+        generation.message.response_metadata.get("cached")
+        if isinstance(generation, ChatGeneration)
+        else (generation.generation_info or {}).get("cached")
+        for generation in generations
+    )
+
+
+class UsageCallback(BaseCallbackHandler):
+    """
+    Records every model and tool call of one request: the graph node it ran in, the model tier,
+    input/output tokens, cost, time to first token (for streamed calls), total latency and whether
+    the response came from the response cache. Calls are added to the request totals and the process totals.
+    Pass a new one in the `callbacks` of every graph run, nested agents and tools inherit it.
+    LLM (not chat) prompts answered by the cache never start a run, so they are not counted.
+    """
+
+    # cheap and thread safe, async runs call it on the event loop instead of a worker thread per event
+    run_inline = True
+
+    def __init__(self):
+        self.usage = UsageAggregate()
+        self._lock = threading.Lock()
+        self._runs: dict[UUID, dict[str, Any]] = {}
+        self.usage.count_request()
+        process_usage.count_request()
+
+    def _start(self, run_id: UUID, kind: str, name: str, metadata: dict[str, Any] | None, prompt_chars: int = 0):
+        metadata = metadata or {}
+        with self._lock:
+            self._runs[run_id] = {
+                "kind": kind,
+                "name": name,
+                "node": metadata.get("langgraph_node") or UNKNOWN,
+                "tier": metadata.get("model_tier") or UNKNOWN,
+                "prompt_chars": prompt_chars,
+                "started": time.perf_counter(),
+                "first_token": None,
+            }
+
+    def _finish(
+        self,
+        run_id: UUID,
+        *,
+        error: bool = False,
+        cached: bool = False,
+        input_tokens: int = 0,
+        output_tokens: int = 0,
+        estimated: bool = False,
+    ):
+        with self._lock:
+            run = self._runs.pop(run_id, None)
+        if run is None:
+            return
+
+        now = time.perf_counter()
+        cost = 0.0
+        if run["kind"] == "model" and not cached:
+            input_cost, output_cost = MODEL_COSTS.get(run["tier"], (0.0, 0.0))
+            cost = (input_tokens * input_cost + output_tokens * output_cost) / 1_000_000
+
+        call = {
+            "kind": run["kind"],
+            "name": run["name"],
+            "node": run["node"],
+            "tier": run["tier"],
+            "error": error,
+            "cached": cached,
+            # cached responses carry the usage of the call that produced them, nothing was used now
+            "input_tokens": 0 if cached else input_tokens,
+            "output_tokens": 0 if cached else output_tokens,
+            "estimated": estimated,
+            "cost": cost,
+            "latency": now - run["started"],
+            "ttft": run["first_token"] - run["started"] if run["first_token"] is not None else None,
+        }
+        self.usage.add(call)
+        process_usage.add(call)
+        logger.debug(
+            f"{call['kind']} {call['name']} in {call['node']} took {call['latency']:.3f}s "
+            f"({call['input_tokens']} in, {call['output_tokens']} out{', cached' if cached else ''})"
+        )
+
+    def on_chat_model_start(
+        self,
+        serialized: dict[str, Any],
+        messages: list[list[BaseMessage]],
+        *,
+        run_id: UUID,
+        metadata: dict[str, Any] | None = None,
+        **kwargs: Any,
+    ):
+        chars = sum(len(str(message.content)) for batch in messages for message in batch)
+        self._start(run_id, "model", model_name(serialized, metadata), metadata, chars)
+
+    def on_llm_start(
+        self,
+        serialized: dict[str, Any],
+        prompts: list[str],
+        *,
+        run_id: UUID,
+        metadata: dict[str, Any] | None = None,
+        **kwargs: Any,
+    ):
+        self._start(run_id, "model", model_name(serialized, metadata), metadata, sum(len(prompt) for prompt in prompts))
+
+    def on_llm_new_token(self, token: str, *, run_id: UUID, **kwargs: Any):
+        with self._lock:
+            run = self._runs.get(run_id)
+            if run is not None and run["first_token"] is None:
+                run["first_token"] = time.perf_counter()
+
+    def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs: Any):
+        with self._lock:
+            run = self._runs.get(run_id)
+        prompt_chars = run["prompt_chars"] if run else 0
+        input_tokens, output_tokens, estimated = token_usage(response, prompt_chars)
+        self._finish(
+            run_id,
+            cached=is_cached(response),
+            input_tokens=input_tokens,
+            output_tokens=output_tokens,
+            estimated=estimated,
+        )
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any):
+        self._finish(run_id, error=True)
+
+    def on_tool_start(
+        self,
+        serialized: dict[str, Any],
+        input_str: str,
+        *,
+        run_id: UUID,
+        metadata: dict[str, Any] | None = None,
+        **kwargs: Any,
+    ):
+        self._start(run_id, "tool", (serialized or {}).get("name") or UNKNOWN, metadata)
+
+    def on_tool_end(self, output: Any, *, run_id: UUID, **kwargs: Any):
+        self._finish(run_id)
+
+    def on_tool_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any):
+        self._finish(run_id, error=True)
+
+    def summary(self) -> dict[str, Any]:
+        return self.usage.summary()
+
+
+def model_name(serialized: dict[str, Any] | None, metadata: dict[str, Any] | None) -> str:
+    return (metadata or {}).get("ls_model_name") or ((serialized or {}).get("id") or [UNKNOWN])[-1]
+
+
+def usage_stats() -> dict[str, Any]:
+    """
+    Returns the model and tool usage of all the requests served by this process.
+    """
+
+    return process_usage.summary()
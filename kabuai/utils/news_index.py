@@ -0,0 +1,179 @@
+import logging
+import math
+import os
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+
+from models.search import SearchResult
+from utils.dedupe import normalize_text
+from utils.search import STOP_WORDS, normalize_link
+from utils.symbols import normalize_ticker
+
+NEWS_INDEX_MAX_AGE = float(os.getenv("NEWS_INDEX_MAX_AGE") or 60 * 60)
+NEWS_INDEX_RETENTION = float(os.getenv("NEWS_INDEX_RETENTION") or 24 * 60 * 60)
+NEWS_INDEX_MIN_RESULTS = int(os.getenv("NEWS_INDEX_MIN_RESULTS") or 3)
+NEWS_INDEX_MIN_COVERAGE = float(os.getenv("NEWS_INDEX_MIN_COVERAGE") or 0.5)
+
+# partitions are per ticker and per hour of ingestion
+PARTITION_SECONDS = 60 * 60
+GENERAL = "*"
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+logger = logging.getLogger(__name__)
+
+
+def terms(text: str) -> list[str]:
+    """
+    Index terms of the text, lowercased words without stop words and with plural s stripped.
+    """
+
+    words = (word for word in normalize_text(text).split() if word not in STOP_WORDS)
+    return [word[:-1] if len(word) > 3 and word.endswith("s") and not word.endswith("ss") else word for word in words]
+
+
+@dataclass
+class Partition:
+    docs: dict[str, SearchResult] = field(default_factory=dict)
+    lengths: dict[str, int] = field(default_factory=dict)
+    postings: dict[str, dict[str, int]] = field(default_factory=dict)
+    total_length: int = 0
+
+
+class NewsIndex:
+    """
+    In-process inverted index over the ingested search results and news, ranked with BM25.
+    Partitioned by ticker and by hour of ingestion, so a query only scans the recent news of its ticker
+    and old news is dropped a partition at a time.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._partitions: dict[tuple[str, int], Partition] = {}
+        self.queries = 0
+        self.local_answers = 0
+
+    def ingest(self, results: list[SearchResult], ticker: str | None = None):
+        """
+        Adds the results to the partition of the ticker (or the general one) for the current hour.
+        Results already in any partition of that ticker are skipped.
+        """
+
+        ticker = normalize_ticker(ticker) if ticker else GENERAL
+        now = time.time()
+        bucket = int(now // PARTITION_SECONDS)
+
+        with self._lock:
+            self._evict(now)
+            partition = self._partitions.setdefault((ticker, bucket), Partition())
+            known = {doc_id for (t, _), p in self._partitions.items() if t == ticker for doc_id in p.docs}
+
+            added = 0
+            for result in results:
+                doc_id = normalize_link(result.link) or normalize_text(result.title)
+                if not doc_id or doc_id in known:
+                    continue
+
+                counts = Counter(terms(f"{result.title} {result.title} {result.snippet}"))
+                partition.docs[doc_id] = result
+                partition.lengths[doc_id] = sum(counts.values())
+                partition.total_length += partition.lengths[doc_id]
+                for term, count in counts.items():
+                    partition.postings.setdefault(term, {})[doc_id] = count
+                known.add(doc_id)
+                added += 1
+
+        if added:
+            logger.debug(f"Indexed {added} news items for {ticker}")
+
+    def _evict(self, now: float):
+        oldest = int((now - NEWS_INDEX_RETENTION) // PARTITION_SECONDS)
+        for key in [key for key in self._partitions if key[1] < oldest]:
+            del self._partitions[key]
+
+    def search(
+        self, query: str, ticker: str | None = None, max_age: float = NEWS_INDEX_MAX_AGE, limit: int = 5
+    ) -> tuple[list[SearchResult], float]:
+        """
+        Ranks the news of the ticker and the general news ingested within `max_age` seconds against the query.
+        Returns the top results and the share of query terms they cover, as a measure of recall.
+        """
+
+        tickers = {normalize_ticker(ticker), GENERAL} if ticker else {GENERAL}
+        # the ticker is implied by the partition, searching for it would only favour items that repeat it
+        query_terms = [term for term in dict.fromkeys(terms(query)) if ticker is None or term.upper() != ticker.upper()]
+        oldest = int((time.time() - max_age) // PARTITION_SECONDS)
+
+        with self._lock:
+            # the ticker's own partitions first, newest first, so a document found in several is taken from them
+            keys = sorted(
+                (key for key in self._partitions if key[0] in tickers and key[1] >= oldest),
+                key=lambda key: (key[0] == GENERAL, -key[1]),
+            )
+            partitions = [self._partitions[key] for key in keys]
+            # a document ingested both as general news and as news of the ticker is counted and scored once
+            owners: dict[str, Partition] = {}
+            for partition in partitions:
+                for doc_id in partition.docs:
+                    owners.setdefault(doc_id, partition)
+
+            total_docs = len(owners)
+            if not query_terms or not total_docs:
+                return [], 0.0
+
+            average_length = sum(owner.lengths[doc_id] for doc_id, owner in owners.items()) / total_docs
+            frequencies = {
+                term: sum(owners[doc_id] is p for p in partitions for doc_id in p.postings.get(term, {}))
+                for term in query_terms
+            }
+
+            scores: dict[str, float] = {}
+            matched: dict[str, set[str]] = {}
+            documents: dict[str, SearchResult] = {}
+            for partition in partitions:
+                for term in query_terms:
+                    idf = math.log(1 + (total_docs - frequencies[term] + 0.5) / (frequencies[term] + 0.5))
+                    for doc_id, count in partition.postings.get(term, {}).items():
+                        if owners[doc_id] is not partition:
+                            continue
+                        norm = 1 - BM25_B + BM25_B * partition.lengths[doc_id] / average_length
+                        weight = idf * count * (BM25_K1 + 1) / (count + BM25_K1 * norm)
+                        scores[doc_id] = scores.get(doc_id, 0.0) + weight
+                        matched.setdefault(doc_id, set()).add(term)
+                        documents[doc_id] = partition.docs[doc_id]
+
+        ranked = sorted(scores, key=scores.__getitem__, reverse=True)[:limit]
+        covered = set().union(*(matched[doc_id] for doc_id in ranked)) if ranked else set()
+        return [documents[doc_id] for doc_id in ranked], len(covered) / len(query_terms)
+
+    def answer(self, query: str, ticker: str | None = None) -> list[SearchResult] | None:
+        """
+        Answers a search locally if recall looks good enough, at least NEWS_INDEX_MIN_RESULTS results
+        covering NEWS_INDEX_MIN_COVERAGE of the query terms. Returns None otherwise.
+        """
+
+        results, coverage = self.search(query, ticker)
+        with self._lock:
+            self.queries += 1
+            if len(results) >= NEWS_INDEX_MIN_RESULTS and coverage >= NEWS_INDEX_MIN_COVERAGE:
+                self.local_answers += 1
+                return results
+
+        logger.debug(f"Poor local recall for {query!r} ({len(results)} results, {coverage:.0%} of terms)")
+        return None
+
+    def stats(self) -> dict[str, float | int]:
+        with self._lock:
+            return {
+                "partitions": len(self._partitions),
+                "documents": sum(len(p.docs) for p in self._partitions.values()),
+                "queries": self.queries,
+                "local_answers": self.local_answers,
+                "local_rate": self.local_answers / self.queries if self.queries else 0.0,
+            }
+
+
+news_index = NewsIndex()
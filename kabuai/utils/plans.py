@@ -0,0 +1,168 @@
+import logging
+import os
+import re
+from typing import Any, NamedTuple
+
+from langchain_core.messages import AnyMessage, HumanMessage
+
+from graph.boss_state import PlanStep
+from utils.cache import TTLCache
+from utils.tickers import TickerMatch, extract_ticker, find_mentions
+
+PLAN_CACHE_SIZE = int(os.getenv("PLAN_CACHE_SIZE") or 256)
+PLAN_CACHE_TTL = float(os.getenv("PLAN_CACHE_TTL") or 6 * 60 * 60)
+# stricter than the ticker fast path, a wrong mask would replay a plan for the wrong question
+PLAN_CACHE_CONFIDENCE = float(os.getenv("PLAN_CACHE_CONFIDENCE") or 0.85)
+
+SYMBOL_SLOT = "{symbol}"
+MENTION_SLOT = "{mention}"
+ENTITY = "\x00"
+
+# words that do not change what is being asked
+FILLER_WORDS = {
+    "a",
+    "an",
+    "can",
+    "could",
+    "give",
+    "hey",
+    "hi",
+    "i",
+    "me",
+    "please",
+    "show",
+    "tell",
+    "the",
+    "would",
+    "you",
+}
+
+logger = logging.getLogger(__name__)
+
+
+class PlanTemplate(NamedTuple):
+    key: str
+    match: TickerMatch
+
+
+def query_template(query: str) -> PlanTemplate | None:
+    """
+    The shape of the query, with the stock it is about masked and the wording normalized,
+    e.g. "What's the price of Apple?" and "whats the price of $MSFT" both become "whats price of {stock}".
+    Returns None unless the query is about exactly one stock, recognized confidently.
+    """
+
+    match = extract_ticker(query)
+    if not match or match.confidence < PLAN_CACHE_CONFIDENCE:
+        return None
+
+    masked = query
+    for mention in sorted(
+        {m.text for m in find_mentions(query) if m.symbol == match.symbol}, key=len, reverse=True
+    ):
+        masked = re.sub(rf"(?<![\w$]){re.escape(mention)}(?!\w)", ENTITY, masked)
+
+    words = re.sub(r"[^a-z0-9\x00]+", " ", masked.lower().replace("'", "")).split()
+    key = " ".join(word for word in words if word not in FILLER_WORDS).replace(ENTITY, "{stock}")
+    return PlanTemplate(key, match) if "{stock}" in key else None
+
+
+def mask_text(text: str, match: TickerMatch) -> str:
+    text = re.sub(rf"(?<![\w$])\$?{re.escape(match.symbol)}(?!\w)", SYMBOL_SLOT, text)
+    mention = match.text.lstrip("$")
+    if mention.upper() != match.symbol:
+        text = re.sub(rf"(?<!\w){re.escape(mention)}(?!\w)", MENTION_SLOT, text, flags=re.IGNORECASE)
+    return text
+
+
+def fill_text(text: str, match: TickerMatch) -> str:
+    return text.replace(SYMBOL_SLOT, match.symbol).replace(MENTION_SLOT, match.text.lstrip("$"))
+
+
+def opening_request(messages: list[AnyMessage]) -> str | None:
+    """
+    The request that opens the conversation, None once the user asked anything before.
+    A follow up ("what about Tesla?") depends on the turns before it,
+    its plan does not carry over to other conversations.
+    """
+
+    requests = [m.content for m in messages if isinstance(m, HumanMessage)]
+    if len(requests) != 1 or not isinstance(requests[0], str):
+        return None
+    return requests[0]
+
+
+class PlanCache:
+    """
+    Supervisor plans keyed by the shape of the request (see `query_template`) and whether the data
+    of its stock is already loaded. Plans are stored with the stock replaced by slots, and filled
+    with the stock of the new request on a hit.
+    Only the first request of a conversation is cached, later ones may depend on what was said before.
+    """
+
+    def __init__(self, maxsize: int = PLAN_CACHE_SIZE, ttl: float = PLAN_CACHE_TTL):
+        self._plans: TTLCache[list[PlanStep]] = TTLCache(maxsize=maxsize, ttl=ttl)
+        self.rejected = 0
+
+    @staticmethod
+    def _key(template: PlanTemplate, loaded_ticker: str | None) -> tuple[str, bool]:
+        return template.key, loaded_ticker == template.match.symbol
+
+    def get(self, messages: list[AnyMessage], loaded_ticker: str | None = None) -> list[PlanStep] | None:
+        query = opening_request(messages)
+        template = query_template(query) if query else None
+        if template is None:
+            return None
+
+        plan = self._plans.get(self._key(template, loaded_ticker))
+        if plan is None:
+            return None
+
+        logger.debug(f"Plan cache hit for {template.key!r} with {template.match.symbol}")
+        return [
+            step.model_copy(
+                update={
+                    "request": fill_text(step.request, template.match),
+                    "message": fill_text(step.message, template.match),
+                    "system_instruction": fill_text(step.system_instruction, template.match),
+                }
+            )
+            for step in plan
+        ]
+
+    def put(self, messages: list[AnyMessage], plan: list[PlanStep], loaded_ticker: str | None = None) -> bool:
+        """
+        Stores the plan the model made for the opening request, if it generalizes to the same request about
+        another stock: once the stock is masked, no step may still mention it, or any other stock.
+        """
+
+        query = opening_request(messages)
+        template = query_template(query) if query else None
+        if template is None or not plan:
+            return False
+
+        masked = [
+            step.model_copy(
+                update={
+                    "request": mask_text(step.request, template.match),
+                    "message": mask_text(step.message, template.match),
+                    "system_instruction": mask_text(step.system_instruction, template.match),
+                }
+            )
+            for step in plan
+        ]
+        for step in masked:
+            for text in (step.request, step.message, step.system_instruction):
+                if any(mention.confidence >= 0.8 for mention in find_mentions(text)):
+                    logger.debug(f"Not caching the plan for {template.key!r}, it names a stock in {text!r}")
+                    self.rejected += 1
+                    return False
+
+        self._plans.set(self._key(template, loaded_ticker), masked)
+        return True
+
+    def stats(self) -> dict[str, Any]:
+        return self._plans.stats() | {"rejected": self.rejected}
+
+
+plan_cache = PlanCache()
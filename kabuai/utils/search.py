@@ -1,4 +1,46 @@
+import re
+from urllib.parse import urlsplit
+
 from models.search import SearchResult
+from utils.symbols import normalize_ticker, symbol_index
+
+STOP_WORDS = {
+    "a",
+    "about",
+    "an",
+    "and",
+    "any",
+    "are",
+    "as",
+    "at",
+    "by",
+    "current",
+    "for",
+    "from",
+    "how",
+    "in",
+    "is",
+    "it",
+    "its",
+    "latest",
+    "new",
+    "news",
+    "of",
+    "on",
+    "or",
+    "recent",
+    "the",
+    "to",
+    "today",
+    "update",
+    "updates",
+    "what",
+    "whats",
+    "with",
+}
+
+# longest company name (in words) tried when mapping query words to tickers
+MAX_NAME_WORDS = 3
 
 
 def calculate_overall_sentiment_score(search_results: list[SearchResult]) -> float:
@@ -7,3 +49,91 @@ def calculate_overall_sentiment_score(search_results: list[SearchResult]) -> flo
         score += s.sentiment_score * s.confidence
 
     return score
+
+
+def normalize_query(query: str) -> str:
+    """
+    Normalizes a search query into a cache key.
+    Lowercases, drops punctuation and stop words, maps tickers and company names to their symbol,
+    and sorts the remaining terms so word order does not matter.
+    e.g. "Latest Apple news" and "AAPL news" both become "AAPL"
+    Only words written like a ticker ($aapl, AAPL) map to one, "is now a good time to buy" is not about ServiceNow.
+    """
+
+    words = re.sub(r"[^A-Za-z0-9$.\-]+", " ", query).split()
+    words = [word.strip(".-") for word in words]
+    words = [word for word in words if word]
+    # in a query written all in capitals, capitals do not mark tickers
+    letters = [c for c in query if c.isalpha()]
+    shouting = len(letters) > 12 and sum(c.isupper() for c in letters) / len(letters) > 0.8
+
+    terms: set[str] = set()
+    i = 0
+    while i < len(words):
+        for size in range(min(MAX_NAME_WORDS, len(words) - i), 0, -1):
+            span = words[i : i + size]
+            # names come first, a name may start with a stop word ("ON Semiconductor")
+            symbol = symbol_index.lookup_name(" ".join(span)) if size > 1 or span[0].lower() not in STOP_WORDS else None
+            if size == 1 and not symbol and written_as_ticker(span[0], shouting):
+                symbol = symbol_index.lookup(span[0])
+            if symbol:
+                terms.add(symbol)
+                i += size
+                break
+        else:
+            word = words[i]
+            if written_as_ticker(word, shouting):
+                # a ticker we do not list, still not the same as the word
+                terms.add(normalize_ticker(word))
+            elif word.lower() not in STOP_WORDS:
+                terms.add(word.lower().lstrip("$"))
+            i += 1
+
+    return " ".join(sorted(terms)) or query.strip().lower()
+
+
+def written_as_ticker(word: str, shouting: bool = False) -> bool:
+    """
+    $-prefixed, or in capitals unless the whole query is. Single capital letters ("I") are only tickers with a $.
+    """
+
+    if word.startswith("$"):
+        return len(word) > 1
+    return not shouting and len(word) > 1 and word.isupper()
+
+
+def normalize_link(link: str) -> str:
+    """
+    Normalizes a result link for deduplication, ignoring the scheme, www, query string, fragment and trailing slash.
+    """
+
+    parts = urlsplit(link.strip().lower())
+    host = parts.netloc.removeprefix("www.")
+    return f"{host}{parts.path.rstrip('/')}"
+
+
+def merge_results(*result_lists: list[SearchResult]) -> list[SearchResult]:
+    """
+    Merges search results from overlapping queries, dropping repeats of the same link or title.
+    The first occurrence wins, so results keep the rank of the list they first appeared in.
+    Returns the results ordered by rank, then newest first.
+    """
+
+    seen_links: set[str] = set()
+    seen_titles: set[str] = set()
+    merged: list[tuple[int, SearchResult]] = []
+
+    for results in result_lists:
+        for rank, result in enumerate(results):
+            link = normalize_link(result.link)
+            title = " ".join(re.sub(r"[^a-z0-9]+", " ", result.title.lower()).split())
+            if link in seen_links or (title and title in seen_titles):
+                continue
+
+            seen_links.add(link)
+            if title:
+                seen_titles.add(title)
+            merged.append((rank, result))
+
+    merged.sort(key=lambda item: (item[0], -item[1].date.timestamp()))
+    return [result for _, result in merged]
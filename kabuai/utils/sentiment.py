@@ -0,0 +1,428 @@
+import hashlib
+import logging
+import math
+import os
+import re
+import time
+from typing import Literal, NamedTuple, cast
+
+from models.search import SearchResult
+from utils.storage import SQLiteStore
+
+SENTIMENT_STORE_PATH = os.getenv("SENTIMENT_STORE_PATH") or "sentiment.sqlite3"
+SENTIMENT_MODE = cast(Literal["local", "hybrid", "llm"], os.getenv("SENTIMENT_MODE") or "hybrid")
+SENTIMENT_CONFIDENCE_THRESHOLD = float(os.getenv("SENTIMENT_CONFIDENCE_THRESHOLD") or 0.6)
+SENTIMENT_STORE_MAX_AGE = float(os.getenv("SENTIMENT_STORE_MAX_AGE") or 30 * 24 * 60 * 60)
+
+# finance flavoured valences on a -3 to 3 scale, loosely after the Loughran-McDonald word lists
+LEXICON: dict[str, float] = {
+    # positive
+    "beat": 2.0,
+    "beats": 2.0,
+    "topped": 1.8,
+    "tops": 1.8,
+    "surge": 2.5,
+    "surged": 2.5,
+    "surges": 2.5,
+    "soar": 2.8,
+    "soared": 2.8,
+    "soars": 2.8,
+    "jump": 2.0,
+    "jumped": 2.0,
+    "jumps": 2.0,
+    "rally": 2.0,
+    "rallied": 2.0,
+    "rallies": 2.0,
+    "rise": 1.2,
+    "rises": 1.2,
+    "rose": 1.2,
+    "gain": 1.5,
+    "gains": 1.5,
+    "gained": 1.5,
+    "climb": 1.5,
+    "climbs": 1.5,
+    "climbed": 1.5,
+    "rebound": 1.5,
+    "rebounds": 1.5,
+    "upgrade": 2.2,
+    "upgraded": 2.2,
+    "upgrades": 2.2,
+    "outperform": 2.0,
+    "outperformed": 2.0,
+    "overweight": 1.5,
+    "buy": 1.0,
+    "bullish": 2.2,
+    "record": 1.5,
+    "strong": 1.8,
+    "stronger": 1.8,
+    "robust": 1.8,
+    "growth": 1.5,
+    "grows": 1.5,
+    "grew": 1.5,
+    "profit": 1.2,
+    "profitable": 1.8,
+    "profitability": 1.2,
+    "exceeded": 2.0,
+    "exceeds": 2.0,
+    "raises": 1.5,
+    "raised": 1.5,
+    "boost": 1.8,
+    "boosts": 1.8,
+    "boosted": 1.8,
+    "expands": 1.2,
+    "expansion": 1.2,
+    "buyback": 1.5,
+    "repurchase": 1.2,
+    "dividend": 0.8,
+    "approval": 1.8,
+    "approved": 1.8,
+    "wins": 1.8,
+    "won": 1.5,
+    "partnership": 1.2,
+    "breakthrough": 2.2,
+    "optimistic": 1.8,
+    "optimism": 1.8,
+    "upbeat": 1.8,
+    "momentum": 1.0,
+    "accelerate": 1.2,
+    "accelerates": 1.2,
+    "recovery": 1.2,
+    "recovers": 1.2,
+    "recovered": 1.2,
+    "high": 0.8,
+    "highs": 1.0,
+    "best": 1.5,
+    "success": 1.8,
+    "successful": 1.8,
+    "positive": 1.5,
+    "innovative": 1.2,
+    "dominant": 1.2,
+    "tailwind": 1.5,
+    "tailwinds": 1.5,
+    # negative
+    "miss": -2.0,
+    "misses": -2.0,
+    "missed": -2.0,
+    "plunge": -2.8,
+    "plunged": -2.8,
+    "plunges": -2.8,
+    "plummet": -3.0,
+    "plummeted": -3.0,
+    "plummets": -3.0,
+    "tumble": -2.5,
+    "tumbled": -2.5,
+    "tumbles": -2.5,
+    "sink": -2.0,
+    "sinks": -2.0,
+    "sank": -2.0,
+    "slump": -2.2,
+    "slumped": -2.2,
+    "slumps": -2.2,
+    "drop": -1.5,
+    "drops": -1.5,
+    "dropped": -1.5,
+    "fall": -1.5,
+    "falls": -1.5,
+    "fell": -1.5,
+    "decline": -1.5,
+    "declined": -1.5,
+    "declines": -1.5,
+    "slide": -1.5,
+    "slides": -1.5,
+    "slid": -1.5,
+    "selloff": -2.2,
+    "downgrade": -2.2,
+    "downgraded": -2.2,
+    "downgrades": -2.2,
+    "underperform": -2.0,
+    "underweight": -1.5,
+    "sell": -1.0,
+    "bearish": -2.2,
+    "weak": -1.8,
+    "weaker": -1.8,
+    "weakness": -1.8,
+    "loss": -1.8,
+    "losses": -1.8,
+    "lose": -1.5,
+    "lost": -1.5,
+    "cut": -1.5,
+    "cuts": -1.5,
+    "slash": -2.0,
+    "slashes": -2.0,
+    "slashed": -2.0,
+    "lawsuit": -2.0,
+    "lawsuits": -2.0,
+    "sued": -2.0,
+    "sues": -1.8,
+    "probe": -2.0,
+    "investigation": -2.0,
+    "subpoena": -2.2,
+    "fraud": -3.0,
+    "scandal": -2.8,
+    "fine": -1.5,
+    "fined": -2.0,
+    "penalty": -2.0,
+    "antitrust": -1.5,
+    "recall": -2.0,
+    "recalls": -2.0,
+    "recalled": -2.0,
+    "bankruptcy": -3.0,
+    "bankrupt": -3.0,
+    "default": -2.5,
+    "layoffs": -2.0,
+    "layoff": -2.0,
+    "lays": -1.0,
+    "warning": -1.8,
+    "warns": -1.8,
+    "warned": -1.8,
+    "halt": -2.0,
+    "halted": -2.0,
+    "halts": -2.0,
+    "delay": -1.5,
+    "delayed": -1.5,
+    "delays": -1.5,
+    "concern": -1.5,
+    "concerns": -1.5,
+    "risk": -1.0,
+    "risks": -1.0,
+    "uncertainty": -1.5,
+    "volatile": -1.0,
+    "volatility": -0.8,
+    "pressure": -1.2,
+    "headwind": -1.5,
+    "headwinds": -1.5,
+    "crisis": -2.5,
+    "crash": -3.0,
+    "crashed": -3.0,
+    "resigns": -1.5,
+    "resigned": -1.5,
+    "ousted": -2.0,
+    "shortfall": -2.0,
+    "disappointing": -2.2,
+    "disappoints": -2.2,
+    "disappointed": -2.0,
+    "negative": -1.5,
+    "low": -0.8,
+    "lows": -1.2,
+    "worst": -2.2,
+    "breach": -2.2,
+    "hack": -2.0,
+    "outage": -1.8,
+    "ban": -1.8,
+    "banned": -1.8,
+    "tariff": -1.0,
+    "tariffs": -1.0,
+    "dilution": -1.5,
+    "downturn": -2.0,
+    "recession": -2.0,
+    "struggle": -1.8,
+    "struggles": -1.8,
+    "struggling": -1.8,
+    "fear": -1.8,
+    "fears": -1.8,
+}
+
+# multi word expressions, matched before the single words
+PHRASES: dict[str, float] = {
+    "all time high": 2.2,
+    "record high": 2.2,
+    "beat expectations": 2.5,
+    "beats expectations": 2.5,
+    "beat estimates": 2.5,
+    "beats estimates": 2.5,
+    "raises guidance": 2.5,
+    "raised guidance": 2.5,
+    "raises outlook": 2.5,
+    "price target raised": 2.0,
+    "raises price target": 2.0,
+    "share buyback": 1.8,
+    "missed expectations": -2.5,
+    "misses expectations": -2.5,
+    "missed estimates": -2.5,
+    "misses estimates": -2.5,
+    "cuts guidance": -2.5,
+    "cut guidance": -2.5,
+    "lowers guidance": -2.5,
+    "lowered guidance": -2.5,
+    "guidance cut": -2.5,
+    "profit warning": -2.8,
+    "price target cut": -2.0,
+    "cuts price target": -2.0,
+    "lowers price target": -2.0,
+    "short seller": -1.8,
+    "class action": -2.0,
+    "job cuts": -2.0,
+    "record low": -2.2,
+    "all time low": -2.2,
+    "52 week low": -1.8,
+    "52 week high": 1.8,
+}
+
+NEGATIONS = {"not", "no", "never", "without", "nor", "cannot", "isnt", "wasnt", "dont", "doesnt", "didnt", "fails"}
+INTENSIFIERS: dict[str, float] = {
+    "sharply": 1.5,
+    "significantly": 1.4,
+    "strongly": 1.4,
+    "massive": 1.5,
+    "huge": 1.4,
+    "biggest": 1.4,
+    "steep": 1.4,
+    "steeply": 1.4,
+    "deeply": 1.4,
+    "major": 1.3,
+    "very": 1.3,
+    "slightly": 0.5,
+    "modestly": 0.6,
+    "marginally": 0.5,
+    "somewhat": 0.6,
+    "mildly": 0.6,
+}
+NEGATION_WINDOW = 3
+NEGATION_FACTOR = -0.75
+TITLE_WEIGHT = 1.5
+# normalization constant of the score, as in VADER
+SCORE_ALPHA = 15.0
+MAX_PHRASE_WORDS = 3
+PHRASE_STARTS = {phrase.split()[0] for phrase in PHRASES}
+
+logger = logging.getLogger(__name__)
+
+
+class Sentiment(NamedTuple):
+    sentiment_score: float
+    confidence: float
+    model: str
+    scored_at: float
+
+
+def article_key(result: SearchResult) -> str:
+    """
+    Content hash of an article. The same article found again, by any query or user, gets the same key.
+    """
+
+    content = "\x1f".join([result.link.strip(), result.title.strip(), result.snippet.strip()])
+    return hashlib.sha256(content.encode()).hexdigest()
+
+
+def tokenize(text: str) -> list[str]:
+    return re.sub(r"[^a-z0-9 ]+", " ", text.lower().replace("'", "").replace("-", " ")).split()
+
+
+def score_words(words: list[str], weight: float) -> list[float]:
+    """
+    Valences of the sentiment bearing words and phrases, after negations and intensifiers.
+    """
+
+    valences = []
+    i = 0
+    while i < len(words):
+        valence, size = LEXICON.get(words[i], 0.0), 1
+        if words[i] in PHRASE_STARTS:
+            for n in range(min(MAX_PHRASE_WORDS, len(words) - i), 1, -1):
+                if (phrase := " ".join(words[i : i + n])) in PHRASES:
+                    valence, size = PHRASES[phrase], n
+                    break
+
+        if valence:
+            window = words[max(0, i - NEGATION_WINDOW) : i]
+            if any(word in NEGATIONS for word in window):
+                valence *= NEGATION_FACTOR
+            if i > 0 and words[i - 1] in INTENSIFIERS:
+                valence *= INTENSIFIERS[words[i - 1]]
+            elif i + size < len(words) and words[i + size] in INTENSIFIERS:
+                valence *= INTENSIFIERS[words[i + size]]
+            valences.append(valence * weight)
+
+        i += size
+
+    return valences
+
+
+def score_sentiment(title: str, snippet: str) -> tuple[float, float]:
+    """
+    Scores a headline and snippet with the finance lexicon, in a few microseconds.
+    Returns the sentiment score between -1.0 and 1.0 and a confidence between 0.0 and 1.0.
+    Confidence grows with the number of sentiment bearing words and drops when they disagree,
+    so neutral or mixed texts come back with low confidence.
+    """
+
+    valences = score_words(tokenize(title), TITLE_WEIGHT) + score_words(tokenize(snippet), 1.0)
+    if not valences:
+        return 0.0, 0.0
+
+    total = sum(valences)
+    score = total / math.sqrt(total * total + SCORE_ALPHA)
+
+    positive = sum(v for v in valences if v > 0)
+    negative = -sum(v for v in valences if v < 0)
+    agreement = abs(positive - negative) / (positive + negative)
+    confidence = agreement * (1 - math.exp(-len(valences) / 2))
+
+    return round(score, 3), round(min(confidence, 0.95), 3)
+
+
+class SentimentStore(SQLiteStore):
+    """
+    Persistent sentiment scores per article, keyed by `article_key`.
+    Keeps the title and snippet next to the scores so the store doubles as a labelled corpus.
+    Scores are only served for the model that made them and for `max_age` seconds. Older rows stay in the corpus.
+    """
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS sentiments (
+        key TEXT PRIMARY KEY,
+        sentiment_score REAL NOT NULL,
+        confidence REAL NOT NULL,
+        model TEXT NOT NULL,
+        scored_at REAL NOT NULL,
+        title TEXT,
+        snippet TEXT
+    );
+    """
+
+    def __init__(self, path: str, max_age: float = SENTIMENT_STORE_MAX_AGE):
+        super().__init__(path)
+        self.max_age = max_age
+
+    def get_many(self, keys: list[str], model: str) -> dict[str, Sentiment]:
+        """
+        Returns the stored scores of the articles scored by `model` within max_age seconds.
+        """
+
+        if not keys:
+            return {}
+
+        rows = self.query(
+            f"""
+            SELECT key, sentiment_score, confidence, model, scored_at FROM sentiments
+            WHERE key IN ({", ".join("?" * len(keys))}) AND model = ? AND scored_at > ?
+            """,
+            (*keys, model, time.time() - self.max_age),
+        )
+        return {key: Sentiment(*values) for key, *values in rows}
+
+    def put_many(self, results: list[SearchResult], model: str):
+        """
+        Stores the sentiment scores carried by the results.
+        """
+
+        now = time.time()
+        rows = [
+            (article_key(result), result.sentiment_score, result.confidence, model, now, result.title, result.snippet)
+            for result in results
+        ]
+        with self.transaction() as conn:
+            conn.executemany("INSERT OR REPLACE INTO sentiments VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+
+    def labelled(self) -> list[tuple[str, str, float, float, str]]:
+        """
+        Returns (title, snippet, sentiment_score, confidence, model) of every stored article.
+        """
+
+        return self.query("SELECT title, snippet, sentiment_score, confidence, model FROM sentiments ORDER BY scored_at")
+
+    def __len__(self) -> int:
+        return self.query("SELECT COUNT(*) FROM sentiments")[0][0]
+
+
+sentiment_store = SentimentStore(SENTIMENT_STORE_PATH)
@@ -0,0 +1,302 @@
+import bisect
+import csv
+import logging
+import os
+import re
+import threading
+import time
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+BUNDLED_LISTING_PATH = Path(__file__).parent.parent / "data" / "symbols.csv"
+SYMBOL_LISTING_PATH = os.getenv("SYMBOL_LISTING_PATH") or str(BUNDLED_LISTING_PATH)
+SYMBOL_LISTING_REFRESH = float(os.getenv("SYMBOL_LISTING_REFRESH") or 60 * 60)
+SYMBOL_INDEX_LEARNED_PATH = os.getenv("SYMBOL_INDEX_LEARNED_PATH") or ""
+
+MIN_PREFIX_LENGTH = 4
+
+TICKER_PATTERN = re.compile(r"^[A-Z0-9]{1,10}([.-][A-Z0-9]{1,3})?$")
+# too short to tell a ticker from a name, and too short for an edit distance of 1 to mean a typo
+SHORT_WORD_PATTERN = re.compile(r"^[A-Za-z0-9]{1,4}$")
+
+CORPORATE_SUFFIXES = {
+    "inc",
+    "incorporated",
+    "corp",
+    "corporation",
+    "co",
+    "company",
+    "companies",
+    "ltd",
+    "limited",
+    "plc",
+    "llc",
+    "lp",
+    "holdings",
+    "holding",
+    "group",
+    "sa",
+    "se",
+    "ag",
+    "nv",
+    "ab",
+    "as",
+    "the",
+    "class",
+    "common",
+    "stock",
+    "shares",
+}
+
+
+def normalize_name(name: str) -> str:
+    """
+    Normalizes a company name for lookups.
+    Lowercases, drops punctuation and corporate suffixes like Inc., Corp. or plc.
+    """
+
+    name = name.lower().replace("&", " and ").replace("'", "")
+    words = re.sub(r"[^a-z0-9]+", " ", name).split()
+    while len(words) > 1 and words[-1] in CORPORATE_SUFFIXES | {"a", "b", "c"}:
+        words.pop()
+    if len(words) > 1 and words[0] == "the":
+        words.pop(0)
+    return " ".join(words)
+
+
+def normalize_ticker(ticker: str) -> str:
+    """
+    Normalizes a ticker to the yahoo form, e.g. brk.b -> BRK-B
+    """
+
+    ticker = ticker.strip().upper().lstrip("$")
+    # yahoo uses dashes for share classes, but keeps dots for exchange suffixes like RELIANCE.NS
+    return re.sub(r"\.([A-Z])$", r"-\1", ticker)
+
+
+def looks_like_ticker(term: str) -> bool:
+    """
+    Whether the term is written like a ticker: $ prefixed, an upper case symbol like AMC, BRK.B or 7203.T,
+    or a single short word.
+    """
+
+    term = term.strip()
+    return term.startswith("$") or bool(TICKER_PATTERN.match(term) or SHORT_WORD_PATTERN.match(term))
+
+
+def edit_distance(a: str, b: str, limit: int) -> int:
+    """
+    Levenshtein distance between a and b, giving up as soon as it exceeds limit.
+    """
+
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, start=1):
+        current = [i]
+        for j, cb in enumerate(b, start=1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb)))
+        if min(current) > limit:
+            return limit + 1
+        previous = current
+
+    return previous[-1]
+
+
+class SymbolIndex:
+    """
+    Offline index mapping tickers, company names, aliases and their normalized variants to symbols.
+    Built from a listing file (symbol,name,aliases) and refreshed when the file changes.
+    """
+
+    def __init__(self, listing_path: str, learned_path: str = ""):
+        self.listing_path = listing_path
+        self.learned_path = learned_path
+        self._lock = threading.Lock()
+        self._symbols: dict[str, str] = {}
+        self._names: dict[str, str] = {}
+        self._keys: list[str] = []
+        self._by_length: dict[int, list[str]] = {}
+        self._listing_mtime = 0.0
+        self._checked_at = 0.0
+        self.load()
+
+    def load(self):
+        """
+        (Re)builds the index from the listing and the learned answers.
+        """
+
+        symbols: dict[str, str] = {}
+        names: dict[str, str] = {}
+
+        for path in (self.listing_path, self.learned_path):
+            if not path or not os.path.exists(path):
+                continue
+            with open(path, newline="") as fp:
+                for row in csv.DictReader(fp):
+                    self._index_row(symbols, names, row["symbol"], row.get("name") or "", row.get("aliases") or "")
+
+        with self._lock:
+            self._symbols = symbols
+            self._names = names
+            self._keys = sorted(names)
+            self._by_length = self._bucket_by_length(names)
+            self._listing_mtime = os.path.getmtime(self.listing_path) if os.path.exists(self.listing_path) else 0.0
+            self._checked_at = time.time()
+
+        logger.debug(f"Symbol index loaded with {len(symbols)} symbols and {len(names)} names")
+
+    @staticmethod
+    def _index_row(symbols: dict[str, str], names: dict[str, str], symbol: str, name: str, aliases: str):
+        symbol = normalize_ticker(symbol)
+        if not symbol:
+            return
+
+        symbols[symbol] = symbol
+        for term in [name, *aliases.split("|")]:
+            key = normalize_name(term)
+            if not key:
+                continue
+            # first listing wins, so the bundled file stays authoritative over learned answers
+            names.setdefault(key, symbol)
+            names.setdefault(key.replace(" ", ""), symbol)
+
+    @staticmethod
+    def _bucket_by_length(names: dict[str, str]) -> dict[int, list[str]]:
+        buckets: dict[int, list[str]] = {}
+        for key in names:
+            buckets.setdefault(len(key), []).append(key)
+        return buckets
+
+    def _maybe_refresh(self):
+        if time.time() - self._checked_at < SYMBOL_LISTING_REFRESH:
+            return
+
+        self._checked_at = time.time()
+        if os.path.exists(self.listing_path) and os.path.getmtime(self.listing_path) != self._listing_mtime:
+            logger.info(f"Symbol listing {self.listing_path} changed, reloading the index")
+            self.load()
+
+    def is_symbol(self, ticker: str) -> bool:
+        return normalize_ticker(ticker) in self._symbols
+
+    def lookup(self, term: str) -> str | None:
+        """
+        Exact lookup of a ticker, company name or alias.
+        """
+
+        ticker = normalize_ticker(term)
+        if ticker in self._symbols:
+            return ticker
+
+        return self.lookup_name(term)
+
+    def lookup_name(self, name: str) -> str | None:
+        """
+        Exact lookup of a company name or alias only, so common words that happen to be tickers do not match.
+        """
+
+        key = normalize_name(name)
+        return self._names.get(key) or self._names.get(key.replace(" ", ""))
+
+    def resolve(self, term: str) -> str | None:
+        """
+        Resolves a ticker or company name to a symbol, exact matches only.
+        Returns None if the term is not in the index, `suggest` then gives a guess to confirm upstream.
+        """
+
+        self._maybe_refresh()
+        return self.lookup(term)
+
+    def suggest(self, term: str) -> str | None:
+        """
+        Guesses the symbol of a misspelled or partial company name, by unique prefix, then unique closest edit distance.
+        Ticker shaped terms get no guess: a real ticker missing from the listing is usually a near miss
+        of another one (AMC and AMD, GME and GM), so it has to be looked up upstream.
+        The guess is only a hint, it is not checked against the company the user meant.
+        """
+
+        self._maybe_refresh()
+
+        if looks_like_ticker(term):
+            return None
+
+        key = normalize_name(term)
+        if not key:
+            return None
+
+        if len(key) >= MIN_PREFIX_LENGTH:
+            start = bisect.bisect_left(self._keys, key)
+            matches: set[str] = set()
+            for candidate in self._keys[start:]:
+                if not candidate.startswith(key):
+                    break
+                matches.add(self._names[candidate])
+            if len(matches) == 1:
+                return matches.pop()
+            if matches:
+                logger.debug(f"Ambiguous prefix {key} for symbols {matches}")
+                return None
+
+        limit = 1 if len(key) <= 5 else 2
+        best_distance = limit + 1
+        best: set[str] = set()
+        candidates = (
+            candidate
+            for length in range(len(key) - limit, len(key) + limit + 1)
+            for candidate in self._by_length.get(length, [])
+        )
+        for candidate in candidates:
+            symbol = self._names[candidate]
+            distance = edit_distance(key, candidate, limit)
+            if distance < best_distance:
+                best_distance, best = distance, {symbol}
+            elif distance == best_distance and distance <= limit:
+                best.add(symbol)
+
+        if len(best) == 1:
+            return best.pop()
+
+        return None
+
+    def add(self, symbol: str, name: str = "", aliases: list[str] | None = None):
+        """
+        Writes a resolved answer back to the index, and to the learned listing if configured.
+        """
+
+        aliases = [alias for alias in aliases or [] if alias and normalize_ticker(alias) != normalize_ticker(symbol)]
+        if self.lookup(symbol) == normalize_ticker(symbol) and all(self.lookup(a) for a in [name, *aliases] if a):
+            return
+
+        with self._lock:
+            self._index_row(self._symbols, self._names, symbol, name, "|".join(aliases))
+            self._keys = sorted(self._names)
+            self._by_length = self._bucket_by_length(self._names)
+
+        if self.learned_path:
+            try:
+                new_file = not os.path.exists(self.learned_path)
+                with open(self.learned_path, "a", newline="") as fp:
+                    writer = csv.writer(fp)
+                    if new_file:
+                        writer.writerow(["symbol", "name", "aliases"])
+                    writer.writerow([symbol, name, "|".join(aliases)])
+            except OSError as e:
+                logger.warning(f"Unable to persist learned symbol {symbol}: {e}")
+
+        logger.debug(f"Learned symbol {symbol} for {name or ''} {aliases}")
+
+
+symbol_index = SymbolIndex(SYMBOL_LISTING_PATH, SYMBOL_INDEX_LEARNED_PATH)
+
+
+if __name__ == "__main__":
+    while True:
+        query = input("Ticker Or Company Name> ").strip()
+        started = time.perf_counter()
+        result = symbol_index.resolve(query)
+        if result is None and (suggestion := symbol_index.suggest(query)):
+            result = f"{suggestion}?"
+        print(f"{result} ({(time.perf_counter() - started) * 1e6:.1f}us)")
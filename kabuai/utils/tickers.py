@@ -0,0 +1,228 @@
+import logging
+import os
+import re
+from typing import NamedTuple
+
+from utils.search import STOP_WORDS
+from utils.symbols import normalize_ticker, symbol_index
+
+TICKER_CONFIDENCE_THRESHOLD = float(os.getenv("TICKER_CONFIDENCE_THRESHOLD") or 0.8)
+
+NAME_MAX_WORDS = 4
+
+# words people write in capitals, or use in plain text, that are also tickers or single word company names
+COMMON_WORDS = {
+    "ai",
+    "all",
+    "am",
+    "american",
+    "are",
+    "arm",
+    "ath",
+    "block",
+    "cat",
+    "ceo",
+    "cfo",
+    "coin",
+    "cost",
+    "dd",
+    "de",
+    "delta",
+    "eps",
+    "etf",
+    "eu",
+    "general",
+    "gdp",
+    "hood",
+    "imo",
+    "ipo",
+    "it",
+    "low",
+    "ma",
+    "mo",
+    "net",
+    "now",
+    "on",
+    "or",
+    "pe",
+    "pins",
+    "pm",
+    "sec",
+    "shell",
+    "shop",
+    "snap",
+    "snow",
+    "spot",
+    "target",
+    "team",
+    "uk",
+    "united",
+    "unity",
+    "ups",
+    "us",
+    "usa",
+    "usd",
+    "visa",
+    "ytd",
+    "yum",
+    "zoom",
+}
+
+CASHTAG = re.compile(r"\$([A-Za-z]{1,6}(?:[.\-][A-Za-z]{1,3})?)\b")
+# not part of a longer word, so T-Mobile or AT&T do not yield T
+TICKER_TOKEN = re.compile(r"(?<![\w$&'.\-])([A-Za-z][A-Za-z0-9]{0,11}(?:[.\-][A-Za-z]{1,3})?)(?![\w&'\-])")
+WORD = re.compile(r"[A-Za-z0-9][A-Za-z0-9&'’.\-]*")
+
+logger = logging.getLogger(__name__)
+
+
+class TickerMatch(NamedTuple):
+    text: str
+    symbol: str
+    confidence: float
+    source: str
+
+
+def cashtag_candidates(text: str) -> list[TickerMatch]:
+    """
+    Explicit $TICKER mentions. They are meant as tickers even when we do not list them.
+    """
+
+    candidates = []
+    for match in CASHTAG.finditer(text):
+        symbol = normalize_ticker(match.group(1))
+        confidence = 0.99 if symbol_index.is_symbol(symbol) else 0.9
+        candidates.append(TickerMatch(match.group(0), symbol, confidence, "cashtag"))
+    return candidates
+
+
+def ticker_candidates(text: str) -> list[TickerMatch]:
+    """
+    Tokens that are listed symbols. Upper case ones are the strongest evidence, lower case ones
+    ("msft") count too when they are not words. Single letters and common words (CEO, NOW, IT)
+    are only weak evidence, and so is everything when the whole message is in capitals.
+    """
+
+    letters = [c for c in text if c.isalpha()]
+    shouting = len(letters) > 12 and sum(c.isupper() for c in letters) / len(letters) > 0.8
+
+    candidates = []
+    for match in TICKER_TOKEN.finditer(text):
+        token = match.group(1)
+        symbol = normalize_ticker(token)
+        if not symbol_index.is_symbol(symbol):
+            continue
+
+        word = token.lower()
+        if len(token) == 1 or word in COMMON_WORDS or word in STOP_WORDS:
+            confidence = 0.5 if token.isupper() else 0.0
+        elif token.isupper():
+            confidence = 0.95 if len(token) >= 3 else 0.85
+        else:
+            confidence = 0.8 if len(token) >= 3 else 0.0
+        if shouting:
+            confidence *= 0.8
+        if confidence:
+            candidates.append(TickerMatch(token, symbol, confidence, "ticker"))
+    return candidates
+
+
+def name_candidates(text: str) -> list[TickerMatch]:
+    """
+    Company names and aliases, matched greedily on up to NAME_MAX_WORDS consecutive words.
+    Matches neither start nor end with a stop word, they are part of the sentence, not the name.
+    Names made of a common word ("target", "visa") only count when capitalized, and even then weakly.
+    """
+
+    words = [re.sub(r"['’]s$", "", word.rstrip(".")) for word in WORD.findall(text)]
+
+    candidates = []
+    i = 0
+    while i < len(words):
+        for size in range(min(NAME_MAX_WORDS, len(words) - i), 0, -1):
+            span = words[i : i + size]
+            # the lookup ignores articles and share classes, so spans ending in one would match too ("Coca-Cola a")
+            if span[0].lower() in STOP_WORDS or span[-1].lower() in STOP_WORDS:
+                continue
+            phrase = " ".join(span)
+            lowered = phrase.lower()
+            symbol = symbol_index.lookup_name(phrase)
+            if not symbol:
+                continue
+
+            capitalized = phrase[:1].isupper()
+            if size > 1:
+                confidence = 0.9
+            elif lowered in COMMON_WORDS:
+                confidence = 0.7 if capitalized else 0.4
+            else:
+                confidence = 0.9 if capitalized else 0.85
+            candidates.append(TickerMatch(phrase, symbol, confidence, "name"))
+            i += size
+            break
+        else:
+            i += 1
+    return candidates
+
+
+def find_mentions(text: str) -> list[TickerMatch]:
+    """
+    Every cashtag, listed ticker and company name in the text, with the confidence of each mention.
+    """
+
+    return cashtag_candidates(text) + ticker_candidates(text) + name_candidates(text)
+
+
+def rank_mentions(candidates: list[TickerMatch]) -> list[TickerMatch]:
+    """
+    One match per symbol, best supported first. Its confidence is raised when several mentions agree (AAPL and Apple).
+    """
+
+    by_symbol: dict[str, list[TickerMatch]] = {}
+    for candidate in candidates:
+        by_symbol.setdefault(candidate.symbol, []).append(candidate)
+
+    return sorted(
+        (
+            max(matches, key=lambda m: m.confidence)._replace(
+                confidence=min(max(m.confidence for m in matches) + 0.05 * (len(matches) - 1), 0.99)
+            )
+            for matches in by_symbol.values()
+        ),
+        key=lambda m: m.confidence,
+        reverse=True,
+    )
+
+
+def extract_ticker(text: str) -> TickerMatch | None:
+    """
+    Finds the stock the text is about without a model call.
+    Collects cashtags, listed tickers and company names, and returns the best supported symbol.
+    Its confidence is capped at 0.5 when mentions point to different stocks, `extract_tickers` then finds them all.
+    Returns None when nothing in the text looks like a stock.
+    """
+
+    ranked = rank_mentions(find_mentions(text))
+    if not ranked:
+        return None
+
+    best = ranked[0]
+    if any(other.confidence >= 0.6 for other in ranked[1:]):
+        best = best._replace(confidence=min(best.confidence, 0.5))
+
+    return best
+
+
+def extract_tickers(text: str, threshold: float = TICKER_CONFIDENCE_THRESHOLD) -> list[TickerMatch]:
+    """
+    Finds every stock the text is about without a model call, e.g. the stocks to compare.
+    Returns the symbols mentioned with at least `threshold` confidence, in the order they are first mentioned.
+    """
+
+    confident = [match for match in rank_mentions(find_mentions(text)) if match.confidence >= threshold]
+    return sorted(confident, key=lambda match: position(text, match.text))
+
+
+def position(text: str, mention: str) -> int:
+    index = text.find(mention)
+    return index if index >= 0 else len(text)
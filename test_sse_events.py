@@ -7,7 +7,7 @@ from requests_sse import EventSource, InvalidContentTypeError, InvalidStatusCode
 
 
 class Response(BaseModel):
-    type: Literal["handoff", "tool", "chunk", "update", "task"]
+    type: Literal["handoff", "tool", "chunk", "update", "task", "usage"]
     # type = "handoff" | "tool"
     arguments: dict[str, Any] | None = Field(default=None)
     # type = "tool" | "task"
@@ -18,6 +18,8 @@ class Response(BaseModel):
     state: dict[str, Any] | None = Field(default=None)
     # type = "task"
     direction: Literal["enter", "leave"] | None = Field(default=None)
+    # type = "usage"
+    usage: dict[str, Any] | None = Field(default=None)
 
 
 def test_chat():
@@ -76,6 +78,9 @@ def test_chat():
                     print("Task Change".center(50, "="))
                     print(f"To: {data.name}")
                     print(f"Direction: {data.direction}")
+                elif data.type == "usage":
+                    print("Usage".center(50, "="))
+                    print(f"Usage: {data.usage}")
                 else:
                     print(f"Unknown: {event, data}")
 
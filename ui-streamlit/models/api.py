@@ -44,7 +44,7 @@ class Request(BaseModel):
 
 
 class Response(BaseModel):
-    type: Literal["handoff", "tool", "chunk", "update", "task"]
+    type: Literal["handoff", "tool", "chunk", "update", "task", "usage"]
     # type = "handoff" | "tool"
     arguments: dict[str, Any] | None = Field(default=None)
     # type = "tool" | "task"
@@ -55,3 +55,5 @@ class Response(BaseModel):
     state: APIState | None = Field(default=None)
     # type = "task"
     direction: Literal["enter", "leave"] | None = Field(default=None)
+    # type = "usage"
+    usage: dict[str, Any] | None = Field(default=None)
@@ -17,3 +17,7 @@ class SearchResult(BaseModel):
         default=0.0,
         description="Confidence score for the sentiment analysis. Ranges from 0.0 (least confident) to 1.0 (most confident)",
     )
+    sources: list[str] = Field(
+        default=[],
+        description="Sources of every near duplicate copy of this item, including this one. Empty if it has none",
+    )
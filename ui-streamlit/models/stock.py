@@ -1,4 +1,4 @@
-from datetime import datetime
+from datetime import UTC, datetime
 
 from pydantic import BaseModel, Field
 
@@ -52,6 +52,7 @@ class StockMetadata(BaseModel):
     pe_ratio: float | None = Field(None, description="Price to earnings ratio")
     dividend_yield: float | None = Field(None, description="Annual dividend yield percentage")
     beta: float | None = Field(None, description="Measure of stock volatility relative to market")
+    exchange_timezone: str | None = Field(None, description="Timezone of the exchange, e.g. America/New_York")
 
 
 class StockPrice(BaseModel):
@@ -64,6 +65,35 @@ class StockPrice(BaseModel):
     volume: int = Field(description="Number of shares traded")
 
 
+class PriceSeries(BaseModel):
+    """
+    Columnar price history as sent by the backend. Dates are UTC epoch seconds.
+    Indexing returns a single StockPrice row.
+    """
+
+    date: list[int] = Field(default=[], description="Dates of the stock price data")
+    open: list[float] = Field(default=[], description="Opening prices of the stock")
+    high: list[float] = Field(default=[], description="Highest prices during trading sessions")
+    low: list[float] = Field(default=[], description="Lowest prices during trading sessions")
+    close: list[float] = Field(default=[], description="Closing prices of the stock")
+    adjusted_close: list[float] = Field(default=[], description="Closing prices adjusted for corporate actions")
+    volume: list[int] = Field(default=[], description="Number of shares traded")
+
+    def __len__(self) -> int:
+        return len(self.date)
+
+    def __getitem__(self, i: int) -> StockPrice:
+        return StockPrice(
+            date=datetime.fromtimestamp(self.date[i], tz=UTC),
+            open=self.open[i],
+            high=self.high[i],
+            low=self.low[i],
+            close=self.close[i],
+            adjusted_close=self.adjusted_close[i],
+            volume=self.volume[i],
+        )
+
+
 class Financials(BaseModel):
     revenue: float | None = Field(None, description="Total revenue from sales")
     gross_profit: float | None = Field(None, description="Revenue minus cost of goods sold")
@@ -86,11 +116,14 @@ class News(BaseModel):
     # url: str = Field(description="URL of the news article")
     region: str | None = Field(None, description="Region where the news originated")
     provider: str | None = Field(None, description="Provider of the news")
+    sources: list[str] = Field(
+        default=[], description="Providers of every near duplicate copy of this article. Empty if it has none"
+    )
 
 
 class StockData(BaseModel):
     company: CompanyDetails = Field(description="Company details", repr=False)
     metadata: StockMetadata = Field(description="General information about the stock")
-    prices: list[StockPrice] = Field(description="Historical price data", repr=False)
-    financials: Financials = Field(description="Financial metrics and ratios", repr=False)
+    prices: PriceSeries = Field(description="Historical price data", repr=False)
+    financials: Financials | None = Field(None, description="Financial metrics and ratios", repr=False)
     news: list[News] = Field(description="Related news articles", repr=False)
@@ -133,7 +133,8 @@ def draw_news_sources(news_sources: list[SearchResult], container: DeltaGenerato
             elif res.sentiment_score <= -0.25 and res.confidence >= 0.25:
                 color = "orange"
 
-            st.badge(f"{res.source} ({res.link})", icon="🌐", color=color)
+            source = ", ".join(res.sources) if res.sources else res.source
+            st.badge(f"{source} ({res.link})", icon="🌐", color=color)
 
 
 initial_state = APIState(